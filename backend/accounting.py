@@ -0,0 +1,116 @@
+# accounting.py
+# Running energy and cost totals, rendered as Prometheus text (/metrics).
+#
+# record() is called once per simulation tick with that tick's figures and
+# only adds them to fixed-size accumulators: the totals since start, the
+# current simulated day and its 24 price hours. Nothing is kept per tick,
+# so rendering /metrics costs the same after a minute or a year of
+# simulation.
+
+import numpy as np
+
+STOP_REASONS = ("overtemp", "full")
+
+# name, type, help (all counters/gauges below are floats)
+TOTALS = (
+    ("ev_energy_charged_kwh_total", "counter", "Energy charged into the batteries (kWh)"),
+    ("ev_charging_cost_ore_total", "counter", "Cost of the charged energy (öre)"),
+    ("ev_charging_seconds_total", "counter",
+     "Simulated time spent charging, summed over vehicles (s)"),
+    ("ev_peak_load_kw", "gauge", "Highest building load since start (kW)"),
+)
+DAY = (
+    ("ev_day_energy_charged_kwh", "gauge", "Energy charged on the current simulated day (kWh)"),
+    ("ev_day_charging_cost_ore", "gauge", "Cost of the energy charged today (öre)"),
+    ("ev_day_charging_seconds", "gauge", "Simulated vehicle-seconds spent charging today"),
+    ("ev_day_peak_load_kw", "gauge", "Highest building load today (kW)"),
+)
+HOURLY = (
+    ("ev_hour_energy_charged_kwh", "gauge", "Energy charged per price hour today (kWh)"),
+    ("ev_hour_charging_cost_ore", "gauge", "Cost per price hour today (öre)"),
+)
+ENERGY, COST, SECONDS, PEAK = range(4)
+
+
+class Accounting:
+    """Energy, cost, charging time, peak load and stop counts."""
+
+    def __init__(self):
+        self.totals = np.zeros(len(TOTALS))
+        self.stops = np.zeros(len(STOP_REASONS), dtype=np.int64)
+        self.day = None
+        self.date = ""
+        self.today = np.zeros(len(DAY))
+        self.day_stops = np.zeros(len(STOP_REASONS), dtype=np.int64)
+        self.hourly = np.zeros((len(HOURLY), 24))  # energy, cost per hour
+        self.load = 0.0
+
+    def record(self, day, date, hour, energy, price, charging_seconds, load, stops):
+        """
+        Add one tick: `energy` kWh charged at `price` öre/kWh during `hour`
+        of `day`, `charging_seconds` vehicle-seconds of charging, the
+        building `load` (kW) and stop counts per STOP_REASONS.
+        """
+        if day != self.day:
+            # New simulated day (or the clock was reset): start over
+            self.day, self.date = day, date
+            self.today.fill(0.0)
+            self.day_stops.fill(0)
+            self.hourly.fill(0.0)
+
+        cost = energy * price
+        for values in (self.totals, self.today):
+            values[ENERGY] += energy
+            values[COST] += cost
+            values[SECONDS] += charging_seconds
+            values[PEAK] = max(values[PEAK], load)
+        self.hourly[0, hour] += energy
+        self.hourly[1, hour] += cost
+        self.stops += stops
+        self.day_stops += stops
+        self.load = load
+
+    def copy(self):
+        """Consistent copy for rendering outside the caller's lock."""
+        other = Accounting.__new__(Accounting)
+        other.__dict__.update({
+            key: value.copy() if isinstance(value, np.ndarray) else value
+            for key, value in self.__dict__.items()
+        })
+        return other
+
+    def render(self, extra=()):
+        """
+        Prometheus text exposition format. `extra`: (name, type, help,
+        value) gauges added by the caller.
+        """
+        lines = []
+
+        def metric(name, kind, text, samples):
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {float(value):.10g}")
+
+        for (name, kind, text), value in zip(TOTALS, self.totals):
+            metric(name, kind, text, [("", value)])
+        metric("ev_stops_total", "counter", "Charging stopped by the simulation", [
+            (f'{{reason="{reason}"}}', count)
+            for reason, count in zip(STOP_REASONS, self.stops)
+        ])
+        metric("ev_building_load_kw", "gauge", "Current building load (kW)", [("", self.load)])
+        for name, kind, text, value in extra:
+            metric(name, kind, text, [("", value)])
+
+        date = f'date="{self.date}"'
+        for (name, kind, text), value in zip(DAY, self.today):
+            metric(name, kind, text, [(f"{{{date}}}", value)])
+        metric("ev_day_stops", "gauge", "Charging stops today", [
+            (f'{{{date},reason="{reason}"}}', count)
+            for reason, count in zip(STOP_REASONS, self.day_stops)
+        ])
+        for (name, kind, text), values in zip(HOURLY, self.hourly):
+            metric(name, kind, text, [
+                (f'{{{date},hour="{hour}"}}', value) for hour, value in enumerate(values)
+            ])
+        return "\n".join(lines) + "\n"
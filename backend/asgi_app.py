@@ -0,0 +1,377 @@
+# asgi_app.py
+# ASGI variant of the simulation server.
+#
+# Same state, commands and JSON as charging_simulation.py, but main_prg
+# runs as an asyncio task on the server's event loop and every connection
+# is a coroutine instead of a worker thread, so one process can hold tens
+# of thousands of idle keep-alive or /stream connections.
+#
+# Endpoints: /info, /charge, /override, /discharge, /baseload,
+# /priceperhour, /metrics, /clock and /stream (Server-Sent Events). The Flask server
+# (python charging_simulation.py, gunicorn) is unchanged and still serves
+# the full API.
+#
+# Usage (one process: the simulation lives in it):
+#   uvicorn asgi_app:app --port 5000
+#   python asgi_app.py
+
+import os
+import json
+import time
+import asyncio
+from urllib.parse import parse_qs
+
+# Set up charging_simulation without its simulation thread (see create_app)
+os.environ["EV_SIM_ROLE"] = "asgi"
+import charging_simulation as sim  # noqa: E402
+from fleet import OVERRIDE_MODES  # noqa: E402
+from response_cache import VersionedBody  # noqa: E402
+
+# /info body as bytes, encoded once per published state
+info_bytes = VersionedBody()
+
+simulation = None  # asyncio task running the simulation
+
+cors_headers = [(b"access-control-allow-origin", b"*")]
+
+
+class Request:
+    """The parts of an ASGI HTTP request the handlers need."""
+
+    def __init__(self, scope, receive):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = {
+            key: values[0]
+            for key, values in parse_qs(scope["query_string"].decode("latin-1")).items()
+        }
+        self.headers = {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope["headers"]
+        }
+        self.receive = receive
+
+    async def json(self):
+        """Request body as JSON (None if empty or invalid)."""
+        chunks = []
+        while True:
+            message = await self.receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        try:
+            return json.loads(b"".join(chunks) or b"null")
+        except ValueError:
+            return None
+
+    async def json_object(self):
+        """
+        Body as a dict ({} when empty or not JSON); None when it is valid
+        JSON but not an object (the handler answers 400).
+        """
+        data = await self.json()
+        if data is None:
+            return {}
+        return data if isinstance(data, dict) else None
+
+
+# ---- responses ----
+async def respond(send, status, body, content_type=b"application/json", headers=()):
+    if isinstance(body, str):
+        body = body.encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type),
+            (b"content-length", str(len(body)).encode()),
+            *cors_headers,
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def respond_json(send, data, status=200):
+    await respond(send, status, json.dumps(data))
+
+
+async def not_an_object(send):
+    await respond_json(send, {"error": "Body must be a JSON object"}, 400)
+
+
+async def respond_static(send, request, response):
+    """A response_cache.StaticResponse: 304, gzip or plain."""
+    headers = [(b"etag", f'"{response.etag}"'.encode()), (b"vary", b"Accept-Encoding")]
+    if response.etag in request.headers.get("if-none-match", ""):
+        await send({
+            "type": "http.response.start",
+            "status": 304,
+            "headers": [*cors_headers, *headers],
+        })
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    body = response.body
+    if response.gzipped is not None and "gzip" in request.headers.get("accept-encoding", ""):
+        body = response.gzipped
+        headers.append((b"content-encoding", b"gzip"))
+    await respond(send, 200, body, headers=headers)
+
+
+# ---- handlers ----
+async def station_info(request, send):
+    if "since" in request.args:
+        # Long poll (see charging_simulation.station_info)
+        try:
+            since, wait = sim.long_poll_args(request.args)
+        except ValueError as e:
+            await respond_json(send, {"error": str(e)}, 400)
+            return
+        if sim.long_poll_waits(since):
+            await sim.stream_hub.await_newer(since, wait)
+        await respond_json(send, sim.info_changes(since))
+        return
+
+    body = info_bytes.get(
+        sim.snapshot, lambda: sim.cached_json(sim.info_body, sim.info_view).encode()
+    )
+    await respond(send, 200, body)
+
+
+async def charge_battery(request, send):
+    if request.method != "POST":
+        # GET returns battery % only
+        await respond_json(send, sim.read_state(lambda s: float(s.fleet.percent[0])))
+        return
+
+    data = await request.json_object()
+    if data is None:
+        await not_an_object(send)
+        return
+    try:
+        await respond_json(send, sim.run_command("charge", 0, data.get("charging", 0)))
+    except Exception as e:
+        await respond_json(send, {"error": str(e)}, 500)
+
+
+async def discharge_battery(request, send):
+    if request.method == "POST":
+        data = await request.json_object()
+        if data is None:
+            await not_an_object(send)
+            return
+        if data.get("discharging", 0) == "on":
+            await respond_json(send, sim.run_command("discharge"))
+            return
+    await respond_json(send, {"message": "Use POST to reset battery."})
+
+
+async def override(request, send):
+    if request.method != "POST":
+        await respond_json(send, sim.read_state(lambda s: {
+            "override": s.fleet.override_mode(0),
+            "charging": bool(s.fleet.charging[0]),
+        }))
+        return
+
+    data = await request.json_object()
+    if data is None:
+        await not_an_object(send)
+        return
+    mode = data.get("mode")
+    if mode not in OVERRIDE_MODES:
+        await respond_json(send, {"error": "Invalid mode"}, 400)
+        return
+    await respond_json(send, sim.run_command("override", 0, mode))
+
+
+def day_list(kind):
+    async def handler(request, send):
+        try:
+            response = sim.day_response(
+                kind,
+                request.args.get("date"),
+                request.args.get("zone"),
+                request.args.get("resolution", "hourly"),
+            )
+        except ValueError as e:
+            await respond_json(send, {"error": str(e)}, 400)
+            return
+        await respond_static(send, request, response)
+    return handler
+
+
+async def clock_info(request, send):
+    await respond_json(send, sim.run_command("clock_info"))
+
+
+def clock_control(action):
+    """POST /clock/<action>, see charging_simulation.clock_control."""
+    async def handler(request, send):
+        if request.method != "POST":
+            await respond_json(send, {"error": "Use POST"}, 405)
+            return
+        data = await request.json_object()
+        if data is None:
+            await not_an_object(send)
+            return
+        value = data.get("steps") if action == "step" else data.get("speed")
+        if action == "speed" and value is None:
+            await respond_json(send, {"error": "speed is required"}, 400)
+            return
+        try:
+            await respond_json(send, sim.run_command("clock", action, value))
+        except (TypeError, ValueError) as e:
+            await respond_json(send, {"error": str(e)}, 400)
+    return handler
+
+
+async def metrics(request, send):
+    body = sim.run_command("metrics") + sim.instruments.render_requests()
+    await respond(send, 200, body, b"text/plain; version=0.0.4; charset=utf-8")
+
+
+async def stream(request, send):
+    """Server-Sent Events: full state first, then only changed fields."""
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+            *cors_headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": b"retry: 2000\n\n", "more_body": True})
+
+    async def pump():
+        async for message in sim.stream_hub.amessages():
+            frame = b": keepalive\n\n" if message is None else message.sse
+            await send({"type": "http.response.body", "body": frame, "more_body": True})
+
+    # Send until the client goes away
+    task = asyncio.ensure_future(pump())
+    try:
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+    finally:
+        task.cancel()
+
+
+ROUTES = {
+    "/info": station_info,
+    "/charge": charge_battery,
+    "/discharge": discharge_battery,
+    "/override": override,
+    "/baseload": day_list("load"),
+    "/priceperhour": day_list("price"),
+    "/metrics": metrics,
+    "/clock": clock_info,
+    **{f"/clock/{action}": clock_control(action) for action in ("pause", "resume", "step", "speed")},
+    "/stream": stream,
+}
+
+
+# ---- simulation task ----
+async def simulation_task():
+    """main_prg on the event loop; commands run inline between ticks."""
+    sim.writer_queue.bind()
+    changed = asyncio.Event()  # set by /clock commands (run on this loop)
+    sim.clock.listeners.append(changed.set)
+
+    while True:
+        # Wait for the clock (scheduled from its anchor, so no drift)
+        delay = sim.clock.delay()
+        while delay is None or delay > 0:
+            changed.clear()
+            try:
+                await asyncio.wait_for(changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = sim.clock.delay()
+
+        sim.advance()
+        await asyncio.sleep(0)  # let requests in even when behind schedule
+
+
+def start():
+    """Start the simulation on the running loop (once)."""
+    global simulation
+    if simulation is None:
+        sim.create_app("asgi")
+        simulation = asyncio.get_running_loop().create_task(simulation_task())
+
+
+async def stop():
+    global simulation
+    if simulation is not None:
+        simulation.cancel()
+        simulation = None
+    if sim.checkpointer is not None:
+        sim.checkpointer.stop()  # final checkpoint for the next start
+    if sim.telemetry is not None:
+        sim.telemetry.flush()
+    sim.log_writer.stop()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point."""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return  # no WebSocket endpoint here; the server closes the socket
+
+    # Servers without lifespan support: start on the first request
+    start()
+
+    request = Request(scope, receive)
+    if request.method == "OPTIONS":
+        # CORS preflight
+        await send({
+            "type": "http.response.start",
+            "status": 204,
+            "headers": [
+                *cors_headers,
+                (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+                (b"access-control-allow-headers", b"Content-Type"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    handler = ROUTES.get(request.path)
+    if handler is None:
+        await respond_json(send, {"error": "Not found"}, 404)
+        return
+    if not sim.instruments.enabled:
+        await handler(request, send)
+        return
+
+    started = time.perf_counter()
+    try:
+        await handler(request, send)
+    finally:
+        sim.instruments.requests.observe(time.perf_counter() - started, request.path)
+
+
+if __name__ == "__main__":
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("Install an ASGI server first: pip install uvicorn")
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
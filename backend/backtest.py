@@ -0,0 +1,321 @@
+# backtest.py
+# Vectorized backtest of charging strategy families over long histories.
+#
+# The price and base-load history is a (days, 24) matrix each. A strategy
+# is a boolean (days, 24) mask "charge in this hour"; a whole family of
+# them is built at once as a (strategies, days, 24) array:
+#   "cheapest"  -> the N cheapest hours of each day, N = 1..24 (price mode)
+#   "headroom"  -> every hour with more than `min_headroom` kW left under
+#                  the fuse (load mode)
+#   "threshold" -> every hour priced at or below a threshold (öre/kWh)
+# Like StrategyController.wants_charging, the cheapest and threshold rules
+# never charge in hours without headroom (min_headroom, default 0 kW).
+#
+# Every day the vehicle plugs in at `plug_hour` with `start_percent` and
+# charges at constant power until the target SoC; the energy per hour is a
+# cumulative sum over the mask, capped at the need. One pass gives, per
+# strategy and target: total cost, the share of days the target was
+# reached, and the hours (and days) in which charging pushed the building
+# over the fuse.
+#
+# The hourly energy model has no CC-CV taper and no thermal model, so it
+# ranks strategies quickly; check the winners with sweep.py / fast_forward.
+#
+# Usage:
+#   python backtest.py                              # built-in profiles + noise, 365 days
+#   EV_DATA_DIR=data python backtest.py --days 730  # real history
+#   python backtest.py --targets 80 100 --plug-hour 17 --json backtest.json
+
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+
+from sim_model import (
+    ev_batt_max_capacity,
+    ev_batt_start_percent,
+    charging_power,
+    max_power_residential_building,
+)
+from data_sources import DataSources
+
+RULES = ("cheapest", "headroom", "threshold")
+
+# Default strategy families
+default_cheap_hours = range(1, 25)
+default_headrooms = [0.0, 0.5, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0]       # kW
+default_threshold_percentiles = range(5, 100, 5)                    # of all prices
+default_targets = [80.0, 100.0]                                     # percent
+
+# Strategies evaluated per NumPy pass (bounds memory use)
+strategy_chunk = 256
+
+# Energy short of the need still counted as "target reached" (kWh)
+reach_tolerance = 1e-6
+
+
+# ------------------------------
+# HISTORY
+# ------------------------------
+
+def history(data, days, zone=None, plug_hour=0):
+    """
+    (prices, loads) matrices of shape (days, 24) from a DataSources: row d
+    holds the 24 hours from `plug_hour` on simulated day d.
+    """
+    extra = 1 if plug_hour else 0
+    matrices = []
+    for kind in ("price", "load"):
+        values = np.array(
+            [data.day_values(kind, day, zone) for day in range(days + extra)],
+            dtype=np.float64,
+        )
+        matrices.append(values.ravel()[plug_hour:plug_hour + days * 24].reshape(days, 24))
+    return tuple(matrices)
+
+
+def add_noise(prices, loads, seed=0, price_sigma=0.0, load_sigma=0.0):
+    """Scale every hour by lognormal noise (as sweep.profiles does)."""
+    rng = np.random.default_rng(seed)
+    prices = prices * rng.lognormal(0.0, price_sigma, prices.shape)
+    loads = loads * rng.lognormal(0.0, load_sigma, loads.shape)
+    return prices.round(2), loads.round(2)
+
+
+# ------------------------------
+# STRATEGY FAMILIES
+# ------------------------------
+
+def strategy_family(prices, loads, rule, values, min_headrooms=(0.0,),
+                    fuse=max_power_residential_building):
+    """
+    Masks of one family: (params, masks) with masks of shape
+    (strategies, days, 24) and one params dict per strategy.
+
+    values: cheap-hour counts, headrooms (kW) or price thresholds, by rule.
+    The cheapest and threshold rules are crossed with `min_headrooms`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    headroom = fuse - loads
+
+    if rule == "headroom":
+        masks = headroom > values[:, None, None]
+        return [{"rule": rule, "min_headroom": float(v)} for v in values], masks
+    if rule == "cheapest":
+        # Rank of every hour within its day; stable, so ties go to the
+        # earlier hour like strategy.cheapest_hours
+        order = np.argsort(prices, axis=1, kind="stable")
+        ranks = np.empty_like(order)
+        np.put_along_axis(ranks, order, np.arange(24), axis=1)
+        selected = ranks < values[:, None, None]
+        key = "cheap_hours"
+    elif rule == "threshold":
+        selected = prices <= values[:, None, None]
+        key = "max_price"
+    else:
+        raise ValueError(f"Unknown rule {rule!r} (use one of {', '.join(RULES)})")
+
+    guards = headroom > np.asarray(min_headrooms, dtype=np.float64)[:, None, None]
+    masks = (selected[:, None] & guards[None]).reshape(-1, *prices.shape)
+    params = [
+        {"rule": rule, key: int(v) if rule == "cheapest" else float(v), "min_headroom": float(h)}
+        for v in values for h in min_headrooms
+    ]
+    return params, masks
+
+
+# ------------------------------
+# BACKTEST
+# ------------------------------
+
+def evaluate(masks, prices, loads, needs, power=charging_power,
+             fuse=max_power_residential_building):
+    """
+    Metrics of every (strategy, need) pair in one pass. masks: (S, days, 24),
+    needs: energy per day to the target (kWh), shape (T,). Returns a dict of
+    (S, T) arrays.
+    """
+    needs = np.asarray(needs, dtype=np.float64)[None, :, None]
+    energy = np.cumsum(masks, axis=2, dtype=np.float64) * power   # (S, days, 24)
+    charged = np.minimum(energy[:, None], needs[..., None])       # (S, T, days, 24)
+    hourly = np.diff(charged, axis=3, prepend=0.0)
+
+    # Hours where the charger runs while base load + charger power > fuse
+    over = (hourly > 0) & (loads + power > fuse)
+    day_energy = charged[..., -1]
+    return {
+        "cost_ore": np.einsum("stdh,dh->st", hourly, prices),
+        "energy_kWh": day_energy.sum(axis=2),
+        "target_reached_share": (day_energy >= needs - reach_tolerance).mean(axis=2),
+        "fuse_violation_hours": over.sum(axis=(2, 3)),
+        "fuse_violation_days": over.any(axis=3).sum(axis=2),
+    }
+
+
+def backtest(prices, loads, cheap_hours=default_cheap_hours, headrooms=default_headrooms,
+             thresholds=(), min_headrooms=(0.0,), targets=default_targets,
+             power=charging_power, capacity=ev_batt_max_capacity,
+             start_percent=ev_batt_start_percent, fuse=max_power_residential_building):
+    """
+    Backtest every strategy of the families against the (days, 24) price
+    and load matrices, for every target SoC. Returns one result dict per
+    (strategy, target), in family order.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    loads = np.asarray(loads, dtype=np.float64)
+    days = prices.shape[0]
+    needs = [max(0.0, capacity * (t - start_percent) / 100) for t in targets]
+
+    families = [
+        ("cheapest", cheap_hours),
+        ("headroom", headrooms),
+        ("threshold", thresholds),
+    ]
+    results = []
+    for rule, values in families:
+        if len(values) == 0:
+            continue
+        params, masks = strategy_family(prices, loads, rule, values, min_headrooms, fuse)
+        for first in range(0, len(params), strategy_chunk):
+            chunk = slice(first, first + strategy_chunk)
+            metrics = evaluate(masks[chunk], prices, loads, needs, power, fuse)
+            for s, strategy in enumerate(params[chunk]):
+                for t, target in enumerate(targets):
+                    cost = float(metrics["cost_ore"][s, t])
+                    results.append({
+                        **strategy,
+                        "target_percent": float(target),
+                        "cost_ore": round(cost, 2),
+                        "cost_per_day_ore": round(cost / days, 2),
+                        "energy_kWh": round(float(metrics["energy_kWh"][s, t]), 3),
+                        "target_reached_share": round(float(metrics["target_reached_share"][s, t]), 4),
+                        "fuse_violation_hours": int(metrics["fuse_violation_hours"][s, t]),
+                        "fuse_violation_days": int(metrics["fuse_violation_days"][s, t]),
+                    })
+    return results
+
+
+def rank(results, min_reached=1.0, allow_violations=False):
+    """
+    Results meeting the constraints, cheapest per kWh first (strategies
+    that charge less are cheaper in total but do not reach the target).
+    """
+    def per_kwh(result):
+        return result["cost_ore"] / result["energy_kWh"] if result["energy_kWh"] else np.inf
+
+    return sorted(
+        (
+            r for r in results
+            if r["target_reached_share"] >= min_reached
+            and (allow_violations or r["fuse_violation_hours"] == 0)
+        ),
+        key=per_kwh,
+    )
+
+
+def describe(result):
+    rule = result["rule"]
+    if rule == "cheapest":
+        text = f"cheapest {result['cheap_hours']} h"
+    elif rule == "threshold":
+        text = f"price <= {result['max_price']:.1f}"
+    else:
+        return f"headroom > {result['min_headroom']:g} kW"
+    if result["min_headroom"]:
+        text += f", headroom > {result['min_headroom']:g} kW"
+    return text
+
+
+def print_table(results):
+    print(f"{'strategy':>36}  {'target':>6}  {'cost/day':>9}  {'öre/kWh':>8}  "
+          f"{'reached':>7}  {'fuse h':>6}  {'fuse d':>6}")
+    for r in results:
+        per_kwh = r["cost_ore"] / r["energy_kWh"] if r["energy_kWh"] else 0.0
+        print(f"{describe(r):>36}  {r['target_percent']:>6.0f}  {r['cost_per_day_ore']:>9.1f}  "
+              f"{per_kwh:>8.1f}  {r['target_reached_share']:>7.1%}  "
+              f"{r['fuse_violation_hours']:>6}  {r['fuse_violation_days']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized EV charging strategy backtest")
+    parser.add_argument("--days", type=int, default=365, help="days of history")
+    parser.add_argument("--zone", default=None, help="price zone (EV_DATA_DIR data)")
+    parser.add_argument("--plug-hour", type=int, default=0,
+                        help="hour the vehicle is plugged in; each window is 24 h")
+    parser.add_argument("--cheap-hours", nargs="*", type=int, default=list(default_cheap_hours))
+    parser.add_argument("--headrooms", nargs="*", type=float, default=default_headrooms,
+                        help="headroom rules: charge above this many kW under the fuse")
+    parser.add_argument("--thresholds", nargs="*", type=float, default=None,
+                        help="price thresholds in öre/kWh (default: 5th..95th price percentile)")
+    parser.add_argument("--min-headrooms", nargs="+", type=float, default=None,
+                        help="headroom guards crossed with the cheapest/threshold rules "
+                             "(default: 0 and the charger power)")
+    parser.add_argument("--targets", nargs="+", type=float, default=default_targets,
+                        help="target SoC in percent")
+    parser.add_argument("--power", type=float, default=charging_power, help="charger power in kW")
+    parser.add_argument("--capacity", type=float, default=ev_batt_max_capacity,
+                        help="usable battery capacity in kWh")
+    parser.add_argument("--start", type=float, default=ev_batt_start_percent,
+                        help="SoC at plug-in in percent")
+    parser.add_argument("--fuse", type=float, default=max_power_residential_building,
+                        help="building fuse in kW")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--price-sigma", type=float, default=None,
+                        help="lognormal sigma of the hourly price noise "
+                             "(default 0.3 for the built-in profiles, 0 for EV_DATA_DIR)")
+    parser.add_argument("--load-sigma", type=float, default=None,
+                        help="lognormal sigma of the hourly base-load noise (default 0.2 / 0)")
+    parser.add_argument("--min-reached", type=float, default=1.0,
+                        help="share of days the target must be reached to be ranked")
+    parser.add_argument("--allow-violations", action="store_true",
+                        help="rank strategies that overload the fuse too")
+    parser.add_argument("--top", type=int, default=20, help="rows to print")
+    parser.add_argument("--json", help="write every result to this file")
+    args = parser.parse_args()
+
+    if not 0 <= args.plug_hour <= 23:
+        parser.error("--plug-hour must be between 0 and 23")
+
+    data = DataSources.from_env()
+    prices, loads = history(data, args.days, args.zone, args.plug_hour)
+
+    # The built-in profile repeats every day: vary it unless told otherwise
+    builtin = not os.environ.get("EV_DATA_DIR")
+    price_sigma = args.price_sigma if args.price_sigma is not None else (0.3 if builtin else 0.0)
+    load_sigma = args.load_sigma if args.load_sigma is not None else (0.2 if builtin else 0.0)
+    if price_sigma or load_sigma:
+        prices, loads = add_noise(prices, loads, args.seed, price_sigma, load_sigma)
+
+    thresholds = args.thresholds
+    if thresholds is None:
+        thresholds = np.percentile(prices, default_threshold_percentiles).round(2).tolist()
+
+    min_headrooms = args.min_headrooms
+    if min_headrooms is None:
+        # No guard (like price mode) and "only where the charger fits"
+        min_headrooms = [0.0, args.power]
+
+    started = time.perf_counter()
+    results = backtest(
+        prices, loads,
+        cheap_hours=args.cheap_hours, headrooms=args.headrooms, thresholds=thresholds,
+        min_headrooms=min_headrooms, targets=args.targets,
+        power=args.power, capacity=args.capacity, start_percent=args.start, fuse=args.fuse,
+    )
+    elapsed = time.perf_counter() - started
+
+    ranked = rank(results, args.min_reached, args.allow_violations)
+    print_table(ranked[:args.top])
+    print(f"\n{len(results)} strategy/target combinations over {args.days} days, "
+          f"{len(ranked)} meet the constraints, {elapsed:.2f} s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"days": args.days, "elapsed_s": round(elapsed, 3), "results": results},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
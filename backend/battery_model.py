@@ -0,0 +1,197 @@
+# battery_model.py
+# Stateful CC-CV battery + lumped thermal model, vectorized over a fleet.
+#
+# Charging:
+#   below the knee SoC  -> constant power: min(charger power, scheduler cap)
+#   above the knee      -> power tapers linearly to 0 at 100% (CV phase);
+#                          charging ends ("full") once it falls below
+#                          cv_cutoff of the constant-power level
+# Heat:
+#   I = P / V(SoC), losses = I² · R(SoC), with V rising linearly with SoC and
+#   R higher at low and high SoC. The pack is one thermal mass cooled
+#   towards ambient: C · dT/dt = losses - k · (T - T_ambient).
+#   Temperature therefore accumulates while charging and decays afterwards.
+#
+# The integrator splits a tick into sub-steps: at most `max_step` seconds
+# each and (adaptive) small enough that no vehicle's SoC moves more than
+# `max_dsoc` percent per sub-step. The thermal update is the exact
+# exponential solution over a sub-step, so it is stable at any step size.
+
+import math
+
+import numpy as np
+
+from sim_model import (
+    ambient_temperature,
+    max_safe_temperature,
+    pack_voltage_empty,
+    pack_voltage_full,
+    pack_resistance,
+    resistance_soc_factor,
+    thermal_mass,
+    cooling_coefficient,
+    cc_cv_knee_percent,
+    cv_cutoff,
+)
+
+# Upper bound of sub-steps per tick (keeps a huge fast-forward step bounded)
+max_substeps = 1000
+
+
+class BatteryModel:
+    """Parameters of the model; step() advances a Fleet in place."""
+
+    def __init__(self, knee_percent=cc_cv_knee_percent, cutoff=cv_cutoff,
+                 voltage_empty=pack_voltage_empty, voltage_full=pack_voltage_full,
+                 resistance=pack_resistance, resistance_factor=resistance_soc_factor,
+                 heat_capacity=thermal_mass, cooling=cooling_coefficient,
+                 ambient=ambient_temperature, max_temperature=max_safe_temperature,
+                 resume_margin=5.0, max_step=60.0, max_dsoc=0.5):
+        if not 0 < knee_percent <= 100:
+            raise ValueError("knee_percent must be in (0, 100]")
+        self.knee = knee_percent / 100
+        self.cutoff = cutoff
+        self.voltage_empty = voltage_empty
+        self.voltage_full = voltage_full
+        self.resistance_mid = resistance
+        self.resistance_factor = resistance_factor
+        self.heat_capacity = heat_capacity
+        self.cooling = cooling
+        self.ambient = ambient
+        self.max_temperature = max_temperature
+        # After an overtemperature stop, wait until the pack is this much cooler
+        self.resume_temperature = max_temperature - resume_margin
+        self.max_step = max_step      # seconds per sub-step (None: no limit)
+        self.max_dsoc = max_dsoc      # % SoC per sub-step (None: not adaptive)
+
+    # ---- model curves ----
+    def voltage(self, soc):
+        """Pack voltage (V) at state of charge soc (0..1)."""
+        return self.voltage_empty + (self.voltage_full - self.voltage_empty) * soc
+
+    def resistance(self, soc):
+        """Internal resistance (ohm): lowest at 50% SoC."""
+        return self.resistance_mid * (1 + self.resistance_factor * (2 * soc - 1) ** 2)
+
+    def taper(self, soc):
+        """Fraction of the constant power accepted at soc (CC-CV)."""
+        if self.knee >= 1:
+            return np.ones_like(soc)
+        return np.clip((1 - soc) / (1 - self.knee), 0.0, 1.0)
+
+    def accepted_power(self, soc, power):
+        """Power (kW) the battery takes at soc from a charger offering power."""
+        return power * self.taper(soc)
+
+    # ---- integrator ----
+    def substeps(self, fleet, dt):
+        """Number of sub-steps for a tick of dt seconds."""
+        n = 1
+        if self.max_step:
+            n = math.ceil(dt / self.max_step)
+        if self.max_dsoc and fleet.charging.any():
+            rate = fleet.rate()[fleet.charging] / fleet.capacity[fleet.charging]
+            dsoc = float(rate.max()) * dt / 3600 * 100
+            n = max(n, math.ceil(dsoc / self.max_dsoc))
+        return max(1, min(n, max_substeps))
+
+    def step(self, fleet, dt):
+        """
+        Advance every vehicle of `fleet` by dt seconds.
+
+        Returns (overtemp, full): boolean masks of the vehicles that stopped
+        charging for overtemperature or because they were full.
+        """
+        overtemp = np.zeros(fleet.size, dtype=bool)
+        full = np.zeros(fleet.size, dtype=bool)
+        charging = fleet.charging
+        temp = fleet.temp
+
+        if not charging.any():
+            # Only cooling: exact for any dt
+            decay = math.exp(-dt * self.cooling / self.heat_capacity)
+            temp -= self.ambient
+            temp *= decay
+            temp += self.ambient
+            return overtemp, full
+
+        n = self.substeps(fleet, dt)
+        h = dt / n
+        decay = math.exp(-h * self.cooling / self.heat_capacity)
+        offered = fleet.rate()
+
+        for _ in range(n):
+            active = charging & (fleet.kwh < fleet.capacity)
+            soc = fleet.kwh / fleet.capacity
+            taper = self.taper(soc)
+            power = np.where(active, offered * taper, 0.0)   # kW
+
+            # Energy
+            fleet.kwh += power * (h / 3600)
+
+            # Heat: losses at the pack terminals, exact exponential update
+            current = power * 1000 / self.voltage(soc)
+            losses = current ** 2 * self.resistance(soc)   # W
+            target = self.ambient + losses / self.cooling
+            temp -= target
+            temp *= decay
+            temp += target
+
+            # End of CV phase, or physically full
+            done = active & ((taper < self.cutoff) | (fleet.kwh >= fleet.capacity))
+            np.copyto(fleet.kwh, fleet.capacity, where=done)
+            full |= done
+
+            hot = active & ~done & (temp > self.max_temperature)
+            overtemp |= hot
+            charging &= ~(done | hot)
+
+        np.round(fleet.kwh / fleet.capacity * 100, 2, out=fleet.percent)
+        return overtemp, full
+
+    # ---- single vehicle, plain floats (fast_forward) ----
+    def cool(self, temp, dt):
+        """Temperature after dt seconds without charging (exact for any dt)."""
+        decay = math.exp(-dt * self.cooling / self.heat_capacity)
+        return (temp - self.ambient) * decay + self.ambient
+
+    def charge(self, kwh, temp, capacity, power, dt):
+        """
+        step() for one charging vehicle, without the array overhead: same
+        sub-steps and arithmetic. Returns (kwh, temp, event), event being
+        "overtemp", "full" or None (still charging).
+        """
+        n = math.ceil(dt / self.max_step) if self.max_step else 1
+        if self.max_dsoc:
+            dsoc = power / capacity * dt / 3600 * 100
+            n = max(n, math.ceil(dsoc / self.max_dsoc))
+        n = max(1, min(n, max_substeps))
+        h = dt / n
+        decay = math.exp(-h * self.cooling / self.heat_capacity)
+
+        event = None
+        for _ in range(n):
+            if event is not None or kwh >= capacity:
+                # Stopped: the rest of the tick only cools
+                temp = (temp - self.ambient) * decay + self.ambient
+                continue
+
+            soc = kwh / capacity
+            taper = 1.0 if self.knee >= 1 else min(max((1 - soc) / (1 - self.knee), 0.0), 1.0)
+            accepted = power * taper
+            kwh += accepted * (h / 3600)
+
+            current = accepted * 1000 / self.voltage(soc)
+            target = self.ambient + current ** 2 * self.resistance(soc) / self.cooling
+            temp = (temp - target) * decay + target
+
+            if taper < self.cutoff or kwh >= capacity:
+                kwh = capacity
+                event = "full"
+            elif temp > self.max_temperature:
+                event = "overtemp"
+        return kwh, temp, event
+
+
+# Model used by Fleet.tick() unless another one is passed
+default_model = BatteryModel()
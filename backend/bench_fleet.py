@@ -0,0 +1,52 @@
+# bench_fleet.py
+# Benchmark of the vectorized fleet tick.
+#
+# Usage:
+#   python bench_fleet.py                 # 1k, 100k and 1M vehicles
+#   python bench_fleet.py 5000 250000     # custom fleet sizes
+
+import sys
+import time
+
+import numpy as np
+
+from fleet import Fleet
+
+default_sizes = [1_000, 100_000, 1_000_000]
+
+
+def bench(size, seconds=2.0):
+    """Return ticks/sec for a fleet of `size` vehicles, all charging."""
+    fleet = Fleet(size)
+
+    # Spread SoC so some vehicles hit the clamp during the run
+    fleet.percent[:] = np.linspace(0, 99, size)
+    fleet.kwh[:] = fleet.percent / 100 * fleet.capacity
+    fleet.charging[:] = True
+
+    ticks = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        fleet.tick()
+        ticks += 1
+
+        # Keep the fleet busy: restart anyone that finished
+        if ticks % 50 == 0:
+            fleet.reset(0)
+            fleet.charging[:] = True
+
+    elapsed = time.perf_counter() - started
+    return ticks / elapsed
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or default_sizes
+
+    print(f"{'vehicles':>10}  {'ticks/sec':>12}  {'vehicle-steps/sec':>18}")
+    for size in sizes:
+        rate = bench(size)
+        print(f"{size:>10}  {rate:>12.1f}  {rate * size:>18.3e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# bench_readers.py
+# Benchmark: /info latency and tick jitter under concurrent readers.
+#
+# Starts charging_simulation.py in a subprocess, runs N clients that call
+# /info back to back, and meanwhile times the state updates on
+# /stream: one event per simulation tick, so the spread of the intervals
+# around 1 s is the tick jitter seen by clients.
+#
+# Usage:
+#   python bench_readers.py                # 1, 8 and 64 readers
+#   python bench_readers.py 16 256         # custom reader counts
+#   EV_FLEET_SIZE=200000 BENCH_PATH=/vehicles python bench_readers.py
+
+import os
+import sys
+import time
+import asyncio
+import subprocess
+
+import numpy as np
+
+from bench_stream import wait_for_server, port, server_env
+
+default_counts = [1, 8, 64]
+path = os.environ.get("BENCH_PATH", "/info")
+window = 10.0  # seconds measured per reader count
+
+
+async def reader(latencies, stop):
+    """Call `path` back to back (one connection per request, like the
+    Flask dev server expects)."""
+    request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nConnection: close\r\n\r\n".encode()
+    while not stop.is_set():
+        started = time.perf_counter()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            writer.write(request)
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        if response.startswith(b"HTTP/1.1 200") or response.startswith(b"HTTP/1.0 200"):
+            latencies.append(time.perf_counter() - started)
+
+
+async def tick_watcher(intervals, stop):
+    """Arrival times of /stream events (one per tick)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET /stream HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+        "Accept: text/event-stream\r\n\r\n".encode()
+    )
+    await writer.drain()
+    last = None
+    try:
+        while not stop.is_set():
+            line = await reader.readline()
+            if not line:
+                break
+            if line.startswith(b"event:"):
+                now = time.perf_counter()
+                if last is not None:
+                    intervals.append(now - last)
+                last = now
+    finally:
+        writer.close()
+
+
+async def measure(count):
+    latencies, intervals = [], []
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(tick_watcher(intervals, stop))]
+    tasks += [asyncio.create_task(reader(latencies, stop)) for _ in range(count)]
+
+    await asyncio.sleep(window)
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return np.array(latencies), np.array(intervals)
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or default_counts
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen(
+        [sys.executable, "charging_simulation.py"],
+        cwd=here,
+        env=dict(os.environ, PORT=str(port), **server_env),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server()
+        print(f"{'readers':>8}  {'req/s':>9}  {'p50 ms':>8}  {'p99 ms':>8}  "
+              f"{'tick p50 ms':>12}  {'tick jitter p99 ms':>19}")
+        for count in counts:
+            latencies, intervals = asyncio.run(measure(count))
+            # Jitter: deviation of the tick interval from the nominal 1 s
+            jitter = np.abs(intervals - 1.0) * 1000 if intervals.size else np.zeros(1)
+            print(f"{count:>8}  {latencies.size / window:>9.0f}  "
+                  f"{np.percentile(latencies, 50) * 1000:>8.2f}  "
+                  f"{np.percentile(latencies, 99) * 1000:>8.2f}  "
+                  f"{np.percentile(intervals, 50) * 1000 if intervals.size else 0:>12.1f}  "
+                  f"{np.percentile(jitter, 99):>19.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
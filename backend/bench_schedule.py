@@ -0,0 +1,43 @@
+# bench_schedule.py
+# Benchmark of the charge schedule solver (one re-plan of a whole fleet).
+#
+# Usage:
+#   python bench_schedule.py                  # 1, 10k and 100k vehicles
+#   python bench_schedule.py 500 1000000      # custom fleet sizes
+
+import sys
+import time
+
+import numpy as np
+
+from fleet import Fleet
+from strategy import StrategyController
+
+default_sizes = [1, 10_000, 100_000]
+
+
+def bench(size, repeats=20):
+    """Return the mean re-plan time in milliseconds for `size` vehicles."""
+    fleet = Fleet(size)
+    fleet.percent[:] = np.linspace(0, 99, size)
+    fleet.kwh[:] = fleet.percent / 100 * fleet.capacity
+
+    controller = StrategyController(mode="schedule", target_percent=80, deadline_hour=7)
+
+    started = time.perf_counter()
+    for r in range(repeats):
+        controller.apply(r % 24, fleet)
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or default_sizes
+
+    print(f"{'vehicles':>10}  {'re-plan ms':>12}  {'us/vehicle':>12}")
+    for size in sizes:
+        ms = bench(size)
+        print(f"{size:>10}  {ms:>12.2f}  {ms * 1000 / size:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
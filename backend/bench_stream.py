@@ -0,0 +1,120 @@
+# bench_stream.py
+# Benchmark: sustained /stream (SSE) subscribers versus server CPU.
+#
+# Starts charging_simulation.py in a subprocess, holds N streaming
+# connections open for a while and reports the server's CPU usage
+# (read from /proc, so Linux only) and the events delivered.
+#
+# Usage:
+#   python bench_stream.py                 # 10, 100, 500, 1000 subscribers
+#   python bench_stream.py 50 2000         # custom subscriber counts
+
+import os
+import sys
+import time
+import socket
+import asyncio
+import subprocess
+
+default_counts = [10, 100, 500, 1000]
+port = int(os.environ.get("BENCH_PORT", 5099))
+window = 10.0  # seconds measured per subscriber count
+
+# Environment of the benchmarked server: never restore or overwrite the
+# developer's checkpoint, no log file or telemetry on disk, and the clock
+# at 1x (one tick per second is what the jitter numbers are measured
+# against)
+server_env = {
+    "EV_CHECKPOINT_FILE": "",
+    "EV_LOG_FILE": "",
+    "EV_TELEMETRY_DIR": "",
+    "EV_CLOCK_SPEED": "1",
+    "EV_CLOCK_PAUSED": "0",
+}
+
+
+def cpu_seconds(pid):
+    """User + system CPU time of a process (Linux /proc)."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    return (int(fields[11]) + int(fields[12])) / ticks
+
+
+def wait_for_server(timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def subscriber(counter, stop):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET /stream HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+        "Accept: text/event-stream\r\n\r\n".encode()
+    )
+    await writer.drain()
+    try:
+        while not stop.is_set():
+            line = await reader.readline()
+            if not line:
+                break
+            if line.startswith(b"event:"):
+                counter[0] += 1
+    finally:
+        writer.close()
+
+
+async def measure(pid, count):
+    counter = [0]
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(subscriber(counter, stop)) for _ in range(count)]
+
+    # Let every connection settle before measuring
+    await asyncio.sleep(2.0)
+    events_before = counter[0]
+    cpu_before = cpu_seconds(pid)
+    started = time.monotonic()
+
+    await asyncio.sleep(window)
+
+    elapsed = time.monotonic() - started
+    cpu = cpu_seconds(pid) - cpu_before
+    events = counter[0] - events_before
+
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return cpu / elapsed * 100, events / elapsed
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or default_counts
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen(
+        [sys.executable, "charging_simulation.py"],
+        cwd=here,
+        env=dict(os.environ, PORT=str(port), **server_env),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server()
+        print(f"{'subscribers':>12}  {'server CPU %':>12}  {'events/sec':>12}")
+        for count in counts:
+            cpu, rate = asyncio.run(measure(server.pid, count))
+            print(f"{count:>12}  {cpu:>12.1f}  {rate:>12.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
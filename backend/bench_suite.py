@@ -0,0 +1,353 @@
+# bench_suite.py
+# Benchmark and load-test suite for the simulation server (standard
+# library + NumPy only).
+#
+# Parts:
+#   http   asyncio load generator against charging_simulation.py started
+#          in a subprocess: /info, /charge, /override and a mixed
+#          read/write workload. Latency p50/p95/p99 and requests/sec.
+#   clock  tick jitter of the simulated clock: arrival times of /stream
+#          events (one per tick), idle and during every HTTP workload.
+#   step   microbenchmark of one main_prg step (charging_simulation.
+#          simulation_step) in this process: ticks/sec.
+#
+# Results are printed and written as JSON (bench_results/ by default);
+# --compare prints the change against an earlier results file.
+#
+# Usage:
+#   python bench_suite.py
+#   python bench_suite.py --only http --concurrency 32 --duration 10
+#   python bench_suite.py --compare bench_results/bench-20250101-120000.json
+#   EV_FLEET_SIZE=100000 python bench_suite.py --only step
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import numpy as np
+
+from bench_stream import wait_for_server, port, server_env
+
+WORKLOADS = ("info", "charge", "override", "mixed")
+PARTS = ("http", "clock", "step")
+
+results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results")
+
+# Share of writes in the mixed workload (the rest are GET /info)
+mixed_write_ratio = 0.1
+
+override_modes = ("force_on", "force_off", "auto")
+
+
+def percentiles(samples, scale=1000.0):
+    """p50/p95/p99/max of `samples` (seconds) in milliseconds."""
+    if len(samples) == 0:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    values = np.asarray(samples) * scale
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+# ---- HTTP ----
+def http_request(method, path, body=None):
+    """Raw HTTP/1.1 request (one connection per request, as Werkzeug expects)."""
+    head = f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nConnection: close\r\n"
+    if body is None:
+        return (head + "\r\n").encode()
+    payload = json.dumps(body).encode()
+    head += f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+    return head.encode() + payload
+
+
+def next_request(workload, rng, counter):
+    """Request bytes for one call of `workload`."""
+    if workload == "mixed":
+        if rng.random() >= mixed_write_ratio:
+            workload = "info"
+        else:
+            workload = rng.choice(("charge", "override"))
+
+    counter[0] += 1
+    if workload == "info":
+        return http_request("GET", "/info")
+    if workload == "charge":
+        return http_request("POST", "/charge", {"charging": ("on", "off")[counter[0] % 2]})
+    mode = override_modes[counter[0] % len(override_modes)]
+    return http_request("POST", "/override", {"mode": mode})
+
+
+async def client(workload, latencies, errors, stop, seed):
+    rng = random.Random(seed)
+    counter = [0]
+    while not stop.is_set():
+        request = next_request(workload, rng, counter)
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            try:
+                writer.write(request)
+                await writer.drain()
+                response = await reader.read()
+            finally:
+                writer.close()
+        except OSError:
+            errors[0] += 1
+            continue
+        if response[9:10] == b"2":
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors[0] += 1
+
+
+async def tick_watcher(intervals, stop):
+    """Intervals between the /stream events of simulation ticks."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET /stream HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+        "Accept: text/event-stream\r\n\r\n".encode()
+    )
+    await writer.drain()
+    last = None
+    try:
+        while not stop.is_set():
+            line = await reader.readline()
+            if not line:
+                break
+            # Commands publish events too; a tick is the one moving the clock
+            if line.startswith(b"data:") and (b'"sim_time_min"' in line
+                                              or b'"sim_time_hour"' in line):
+                now = time.perf_counter()
+                if last is not None:
+                    intervals.append(now - last)
+                last = now
+    finally:
+        writer.close()
+
+
+async def run_window(workload, concurrency, duration):
+    """Run `workload` (or nothing if None) while watching the clock."""
+    latencies, intervals, errors = [], [], [0]
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(tick_watcher(intervals, stop))]
+    if workload is not None:
+        tasks += [
+            asyncio.create_task(client(workload, latencies, errors, stop, seed))
+            for seed in range(concurrency)
+        ]
+
+    started = time.perf_counter()
+    await asyncio.sleep(duration)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return latencies, intervals, errors[0], elapsed
+
+
+def clock_stats(intervals, elapsed):
+    """Tick rate and jitter (deviation from the nominal 1 s interval)."""
+    intervals = np.asarray(intervals)
+    return {
+        "ticks": int(intervals.size),
+        "ticks_per_s": round(intervals.size / elapsed, 3),
+        "interval_ms": percentiles(intervals),
+        "jitter_ms": percentiles(np.abs(intervals - 1.0)),
+    }
+
+
+def start_server(env):
+    here = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen(
+        [sys.executable, "charging_simulation.py"],
+        cwd=here,
+        env={**os.environ, "PORT": str(port), **server_env, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server()
+    except RuntimeError:
+        server.terminate()
+        raise
+    return server
+
+
+def bench_http(args, parts):
+    """HTTP workloads and/or idle clock measurement against a live server."""
+    results = {}
+    server = start_server({})
+    try:
+        # Let the first ticks and caches settle
+        time.sleep(1.0)
+
+        if "clock" in parts:
+            _, intervals, _, elapsed = asyncio.run(run_window(None, 0, args.duration))
+            results["clock"] = {"idle": clock_stats(intervals, elapsed)}
+            print_clock("idle", results["clock"]["idle"])
+
+        if "http" in parts:
+            results["http"] = {}
+            for workload in args.workloads:
+                latencies, intervals, errors, elapsed = asyncio.run(
+                    run_window(workload, args.concurrency, args.duration)
+                )
+                entry = {
+                    "concurrency": args.concurrency,
+                    "requests": len(latencies),
+                    "errors": errors,
+                    "req_per_s": round(len(latencies) / elapsed, 1),
+                    "latency_ms": percentiles(latencies),
+                }
+                results["http"][workload] = entry
+                print_http(workload, entry)
+                if "clock" in parts:
+                    results["clock"][workload] = clock_stats(intervals, elapsed)
+                    print_clock(workload, results["clock"][workload])
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+# ---- main_prg step ----
+def bench_step(duration):
+    """ticks/sec of charging_simulation.simulation_step in this process."""
+    # Same isolation as the HTTP server, plus a throw-away telemetry
+    # directory (the step includes the telemetry append)
+    os.environ.update(server_env)
+    os.environ["EV_TELEMETRY_DIR"] = tempfile.mkdtemp(prefix="bench_telemetry_")
+    import charging_simulation as sim
+    sim.create_app(start=False)  # no simulation thread racing the steps below
+
+    # Keep every vehicle busy so the tick does full work
+    with sim.state_write():
+        sim.fleet.reset(0)
+        sim.fleet.charging[:] = True
+
+    samples = []
+    i = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        sim.simulation_step(i % sim.seconds_per_hour)
+        samples.append(time.perf_counter() - started)
+        i += 1
+        if i % 50 == 0:
+            with sim.state_write():
+                sim.fleet.reset(0)
+                sim.fleet.charging[:] = True
+
+    entry = {
+        "vehicles": int(sim.fleet.size),
+        "steps": len(samples),
+        "ticks_per_s": round(len(samples) / sum(samples), 1),
+        "step_ms": percentiles(samples),
+    }
+    print(f"{'step':<10} vehicles={entry['vehicles']}  {entry['ticks_per_s']:>10.1f} ticks/s  "
+          + format_ms(entry["step_ms"]))
+    return entry
+
+
+# ---- output ----
+def format_ms(stats):
+    if stats["p50"] is None:
+        return "no samples"
+    return "  ".join(f"{k} {stats[k]:>8.2f} ms" for k in ("p50", "p95", "p99"))
+
+
+def print_http(workload, entry):
+    print(f"{workload:<10} {entry['req_per_s']:>10.1f} req/s  "
+          f"{format_ms(entry['latency_ms'])}  errors {entry['errors']}")
+
+
+def print_clock(label, entry):
+    print(f"{'clock':<10} ({label}) {entry['ticks_per_s']:.2f} ticks/s  jitter "
+          + format_ms(entry["jitter_ms"]))
+
+
+def flatten(results, prefix=""):
+    """{"http": {"info": {"req_per_s": 1}}} -> {"http.info.req_per_s": 1}"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(results, path):
+    """Print every numeric result next to the one in an earlier run."""
+    with open(path, encoding="utf-8") as f:
+        before = flatten(json.load(f).get("results", {}))
+    now = flatten(results)
+
+    print(f"\nCompared with {path}:")
+    print(f"{'metric':<40}  {'before':>12}  {'now':>12}  {'change':>8}")
+    for name, value in now.items():
+        old = before.get(name)
+        if old is None:
+            continue
+        change = f"{(value - old) / old * 100:+.1f}%" if old else ""
+        print(f"{name:<40}  {old:>12}  {value:>12}  {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the EV charging simulation server")
+    parser.add_argument("--only", nargs="+", choices=PARTS, default=list(PARTS),
+                        help="parts to run")
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent HTTP clients")
+    parser.add_argument("--duration", type=float, default=5.0,
+                        help="seconds measured per workload")
+    parser.add_argument("--out", help="results JSON (default: bench_results/bench-<time>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare with")
+    args = parser.parse_args()
+
+    results = {}
+    if "http" in args.only or "clock" in args.only:
+        results.update(bench_http(args, args.only))
+    if "step" in args.only:
+        # Last: importing the server starts its simulation in this process
+        results["step"] = bench_step(args.duration)
+
+    out = args.out
+    if out is None:
+        os.makedirs(results_dir, exist_ok=True)
+        out = os.path.join(results_dir, time.strftime("bench-%Y%m%d-%H%M%S.json"))
+    document = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "fleet_size": int(os.environ.get("EV_FLEET_SIZE", 1)),
+        },
+        "results": results,
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    print(f"\nResults written to {out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
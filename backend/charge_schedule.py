@@ -0,0 +1,133 @@
+# charge_schedule.py
+# Cost-minimizing charge schedule under the building fuse limit.
+#
+# For each vehicle: deliver the energy needed to reach a target SoC before
+# a deadline, at minimum cost. Per hour the charger may use at most
+# min(charger power, fuse headroom) where the headroom is
+# max_power_residential_building - base_load_residential_kwh[h].
+#
+# With a linear price and per-hour upper bounds this LP is a fractional
+# knapsack: filling the cheapest hours first is optimal. All vehicles share
+# the price order, so the fill is one vectorized pass over a
+# (vehicles x hours) matrix.
+#
+# A deadline can be tomorrow, so prices and base loads are a 48-hour
+# horizon from midnight today: today's 24 hours, then tomorrow's. A single
+# 24-hour profile is taken to repeat (the built-in one does).
+
+import numpy as np
+
+from sim_model import (
+    energy_price,
+    base_load_residential_kwh,
+    max_power_residential_building,
+)
+
+
+def hour_window(hour, minute, deadline_hour):
+    """
+    Hours from now until the deadline (next occurrence of deadline_hour, at
+    most 24 hours ahead) as indices into the 48-hour horizon (24.. is
+    tomorrow), and the usable fraction of each.
+    """
+    count = (deadline_hour - hour) % 24 or 24
+    hours = hour + np.arange(count)
+    fraction = np.ones(count)
+    fraction[0] = (60 - minute) / 60  # rest of the current hour
+    return hours, fraction
+
+
+def horizon(values):
+    """Hourly values as the 48-hour horizon (a 24-hour profile repeats)."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 24:
+        return np.tile(values, 2)
+    if values.size != 48:
+        raise ValueError("Expected 24 or 48 hourly values")
+    return values
+
+
+def solve(need, prices, capacity):
+    """
+    Minimum-cost energy per hour.
+
+    need      (V,)   kWh each vehicle still needs
+    prices    (H,)   price per hour
+    capacity  (V, H) kWh each vehicle may take in each hour
+    Returns   (V, H) kWh per hour (less than `need` if infeasible).
+    """
+    # Cheapest first; ties go to the earlier hour
+    order = np.argsort(prices, kind="stable")
+    cap_sorted = capacity[:, order]
+    filled_before = np.cumsum(cap_sorted, axis=1) - cap_sorted
+    energy_sorted = np.clip(need[:, None] - filled_before, 0, cap_sorted)
+
+    energy = np.empty_like(energy_sorted)
+    energy[:, order] = energy_sorted
+    return energy
+
+
+def plan(kwh, capacity, power, target_percent, hour, minute, deadline_hour,
+         prices=energy_price, base_loads=base_load_residential_kwh,
+         max_power=max_power_residential_building):
+    """
+    Plan charging for one or many vehicles (scalars or arrays). `prices`
+    and `base_loads`: 48 hourly values from midnight today (or 24, used
+    for tomorrow too).
+
+    Returns (hours, power_plan, need):
+      hours       (H,)   horizon hour of each plan column (24.. is tomorrow)
+      power_plan  (V, H) average charging power per hour (kW)
+      need        (V,)   kWh needed to reach the target
+    """
+    kwh = np.atleast_1d(np.asarray(kwh, dtype=np.float64))
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=np.float64), kwh.shape)
+    power = np.broadcast_to(np.asarray(power, dtype=np.float64), kwh.shape)
+
+    hours, fraction = hour_window(hour, minute, deadline_hour)
+    headroom = np.maximum(max_power - horizon(base_loads)[hours], 0.0)
+
+    # kWh per vehicle and hour: min(charger, fuse headroom) for the usable part
+    hour_cap = np.minimum(power[:, None], headroom[None, :]) * fraction[None, :]
+    need = np.maximum(capacity * target_percent / 100 - kwh, 0.0)
+
+    energy = solve(need, horizon(prices)[hours], hour_cap)
+    return hours, energy / fraction[None, :], need
+
+
+def describe(kwh, capacity, power, target_percent, hour, minute, deadline_hour,
+             prices=energy_price, **kwargs):
+    """Plan for one vehicle as a JSON-friendly dict (used by /schedule)."""
+    hours, power_plan, need = plan(
+        kwh, capacity, power, target_percent, hour, minute, deadline_hour,
+        prices=prices, **kwargs
+    )
+    _, fraction = hour_window(hour, minute, deadline_hour)
+    prices = horizon(prices)
+
+    rows = []
+    total_energy = 0.0
+    total_cost = 0.0
+    for h, p, f in zip(hours, power_plan[0], fraction):
+        energy = p * f
+        cost = energy * prices[h]
+        total_energy += energy
+        total_cost += cost
+        rows.append({
+            "day": int(h // 24),  # 0 today, 1 tomorrow
+            "hour": int(h % 24),
+            "power_kW": round(float(p), 3),
+            "energy_kWh": round(float(energy), 3),
+            "price": float(prices[h]),
+            "cost_ore": round(float(cost), 2),
+        })
+
+    return {
+        "target_percent": target_percent,
+        "deadline_hour": deadline_hour,
+        "energy_needed_kWh": round(float(need[0]), 3),
+        "energy_planned_kWh": round(total_energy, 3),
+        "cost_ore": round(total_cost, 2),
+        "feasible": bool(total_energy >= need[0] - 1e-6),
+        "plan": rows,
+    }
@@ -3,272 +3,1146 @@
 # charging_simulation.py
 # EV charging simulation server (Flask) + background thread
 
+import os
+import sys
 import json
+import math
+import signal
 import time
 import threading
-from flask import Flask, request, jsonify
+from contextlib import contextmanager
+import numpy as np
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
-from threading import Lock
 
-# User override mode:
-# None        -> AUTO  (algorithm can start/stop charging)
+try:
+    from flask_sock import Sock  # optional: WebSocket /ws endpoint
+except ImportError:
+    Sock = None
+
+from sim_model import (
+    max_power_residential_building,
+    ev_batt_start_percent,
+    seconds_per_hour,  # steps per simulated hour (one per simulated minute)
+    building_load,
+    step_minute,
+    event_message,
+)
+from fleet import Fleet, OVERRIDE_MODES
+from shared_state import SharedState, SimView, CommandClient, serve_commands
+from stream_hub import StreamHub
+from writer_queue import WriterQueue
+from response_cache import StaticResponse, VersionedBody
+from log_buffer import LogBuffer, LogWriter, log_path
+from telemetry import TelemetryStore, METRICS, telemetry_dir
+from strategy import StrategyController
+from load_manager import LoadManager, PRIORITIES
+from accounting import Accounting
+from instrumentation import Instrumentation, sample_profile, profile_max_seconds
+from sim_clock import VirtualClock
+from data_sources import DataSources, parse_date
+from checkpoint import Checkpointer, checkpoint_path
+import checkpoint
+import fast_forward
+import charge_schedule
+
+# Price and base-load series (EV_DATA_DIR files or the built-in profiles)
+data = DataSources.from_env()
+
+base_current_load = data.base_load(data.timestamp(0, 0))  # current load (kW)
+
+# Vehicle state (Citroën e-Berlingo M) as NumPy columns, one row per vehicle.
+# Per vehicle: capacity, SoC, charger power, charging flag and user override:
+# "auto"      -> AUTO  (algorithm can start/stop charging)
 # "force_on"  -> user forces charging ON
 # "force_off" -> user forces charging OFF
-user_override = None
-
-# Energy prices for 24 hours (Öre/kWh)
-energy_price = [
-    85.28, 70.86, 68.01, 67.95, 68.01, 85.04, 87.86, 100.26,
-    118.45, 116.61, 105.93, 91.95, 90.51, 90.34, 90.80, 88.85,
-    90.39, 99.03, 87.11, 82.9, 80.45, 76.48, 32.00, 34.29
-]
-
-# Max power for the household (kW)
-max_power_residential_building = 11  # (11 kW = 16A 3-phase)
-
-# Base load as percentage of max power for each hour
-base_load_residential_percent = [
-    0.08, 0.07, 0.20, 0.18, 0.25, 0.35, 0.41, 0.34,
-    0.35, 0.40, 0.43, 0.56, 0.42, 0.34, 0.32, 0.33,
-    0.53, 1.00, 0.81, 0.55, 0.39, 0.24, 0.17, 0.09
-]
-
-# Convert base load to kW and round
-base_load_residential_kwh = [
-    round(value * max_power_residential_building, 2)
-    for value in base_load_residential_percent
-]
-
-base_current_load = base_load_residential_kwh[0]  # current hourly load (kW)
-
-# Battery model values (Citroën e-Berlingo M)
-ev_batt_nominal_capacity = 50       # kWh nominal
-ev_batt_max_capacity = 46.3         # kWh usable
-ev_batt_capacity_percent = 20       # initial SoC (%)
-ev_batt_capacity_kWh = ev_batt_capacity_percent / 100 * ev_batt_max_capacity
-ev_batt_energy_consumption = 226    # Wh/km
-
-# Charging flag (True = charging enabled)
-ev_battery_charge_start_stopp = False
-
-# Charger power (kW)
-charging_station_info = {"Power": "7.4"}
-charging_power = 7.4
-
-# Simulation time tracking
+# The original single-vehicle endpoints are a view of vehicle 0.
+fleet_size = int(os.environ.get("EV_FLEET_SIZE", 1))
+fleet = Fleet(fleet_size)
+
+# Server-side charging strategy ("manual", "price", "load" or "schedule"); only
+# vehicles in AUTO override are started/stopped by it
+strategy = StrategyController(mode=os.environ.get("EV_STRATEGY", "manual"))
+strategy.set_profiles(
+    data.day_values("price", 0), data.day_values("load", 0),
+    data.day_values("price", 1), data.day_values("load", 1),
+)
+
+# Load management: vehicles 0..EV_BUILDING_CHARGERS-1 share one building
+# fuse (EV_FUSE_KW, default the 11 kW main fuse), split "fair" or by
+# "priority" (EV_LOAD_MODE). EV_BUILDING_CHARGERS=0 disables it.
+building_chargers = min(int(os.environ.get("EV_BUILDING_CHARGERS", 1)), fleet_size)
+load_manager = LoadManager(
+    building_chargers,
+    fuse=float(os.environ.get("EV_FUSE_KW", max_power_residential_building)),
+    mode=os.environ.get("EV_LOAD_MODE", "fair"),
+) if building_chargers > 0 else None
+
+# Energy, cost and peak-load totals for /metrics (updated every tick)
+accounting = Accounting()
+
+# Tick / lock / request histograms for /metrics (EV_INSTRUMENT=0 disables);
+# GET /profile sampling profiler only with EV_PROFILER=1
+instruments = Instrumentation(enabled=os.environ.get("EV_INSTRUMENT", "1") != "0")
+profiler_enabled = os.environ.get("EV_PROFILER") == "1"
+
+# Simulation time tracking (day 0 is data.date_of(0))
+sim_day = 0
 sim_hour = 0
 sim_min = 0
-seconds_per_hour = 60  # 1 simulated hour = 60 real seconds
+
+# Step schedule: speed factor (EV_CLOCK_SPEED, 1-10000), pause and single
+# steps (see sim_clock.py); every step is 3600 / seconds_per_hour simulated
+# seconds at any speed
+clock = VirtualClock(
+    3600 / seconds_per_hour,
+    speed=float(os.environ.get("EV_CLOCK_SPEED", 1)),
+    paused=os.environ.get("EV_CLOCK_PAUSED") == "1",
+)
+next_step = None  # step of the current hour advance() runs next (None: new hour)
 
 # Thread lock for shared values
 global_lock = threading.Lock()
+publish_lock = threading.Lock()  # stream hub publishes (see publish_state)
+
+# Copy-on-write state: the simulation thread is the only writer and
+# publishes an immutable SimView after every change; readers just take the
+# current reference (no lock). Commands reach the writer through a queue.
+snapshot = None
+writer_queue = WriterQueue()
+
+# Monotonic state version: +1 on every state change (see state_write)
+state_version = 0
+
+# Process role:
+# "standalone" -> this process runs the simulation and serves HTTP (default)
+# "owner"      -> runs main_prg and publishes the state to shared memory
+# "worker"     -> serves HTTP from shared memory, forwards commands to owner
+# "asgi"       -> asgi_app.py: simulation as an asyncio task, ASGI server
+# gunicorn.conf.py sets up the owner/worker roles for multi-worker servers.
+sim_role = os.environ.get("EV_SIM_ROLE", "standalone")
+shared = None          # SharedState in owner/worker roles
+command_client = None  # CommandClient in worker role
+increment_sum_thread = None
+app_created = False            # create_app() has run
+setup_lock = threading.Lock()  # one create_app() at a time
 
 app = Flask(__name__)
 # For local + demo hosting; tighten later by replacing "*" with your frontend origin
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-# Optional in-memory log buffer (for future /log endpoint if you want)
-simulation_log = []
-log_lock = Lock()
+# Push-based state for /stream (SSE) and /ws (WebSocket) subscribers
+stream_hub = StreamHub()
+stream_poll_interval = 0.1  # worker role: how often shared memory is checked
+long_poll_max = 60.0        # longest /info?wait= (seconds)
+sock = Sock(app) if Sock is not None else None
+
+# In-memory log ring (served by /log); a background writer echoes it to
+# the console and appends it to a rotating simulation_log.txt
+simulation_log = LogBuffer(int(os.environ.get("EV_LOG_LINES", 4096)))
+log_writer = None
+log_page_limit = 500  # max lines per /log response
 simulation_running = False
 
+# Per-tick history for /history (standalone/owner role, see create_app)
+telemetry = None
+
+# Checkpoint file (EV_CHECKPOINT_FILE, "" disables), written every
+# EV_CHECKPOINT_INTERVAL seconds and restored at startup
+checkpoint_file = None
+checkpointer = None
+
+# Set by a restore: main_prg continues the hour at `resume_step`
+resume_step = 0
+restart_hour = False
+
 
 def add_log(line: str):
-    """Add one log line to buffer and still print to console."""
-    global simulation_log
-    with log_lock:
-        simulation_log.append(line)
-        # keep buffer small
-        if len(simulation_log) > 500:
-            simulation_log = simulation_log[-500:]
-    print(line)
+    """Add one log line to the ring buffer (never blocks on I/O)."""
+    simulation_log.add(line)
 
 
 def main_prg():
     """
     Background simulation loop:
-    - Updates base load and battery SoC
+    - Updates base load and battery SoC of every vehicle (one vectorized tick)
     - Simple temperature check during charging
     - Advances simulated time
     - Hard-clamps SoC at 100% and stops charging when full
+    (asgi_app.py runs the same steps as an asyncio task.)
     """
-    global sim_hour, sim_min
-    global ev_battery_charge_start_stopp
-    global ev_batt_capacity_percent, ev_batt_capacity_kWh, ev_batt_max_capacity
-    global base_current_load, seconds_per_hour
+    # This thread is the single writer: commands run between ticks
+    writer_queue.bind()
 
     while True:
-        # Base load for this simulated hour
-        with global_lock:
-            base_current_load = base_load_residential_kwh[sim_hour]
-
-        for i in range(seconds_per_hour):
-            with global_lock:
-                if ev_battery_charge_start_stopp:
-                    # Temperature monitoring during charging (simple model)
-                    voltage = 3.8                      # assumed average cell voltage (V)
-                    current = charging_power / voltage # I = P / V
-                    R_int = 0.002                      # internal resistance (ohms)
-                    delta_t = 1                        # time step (s)
-                    T_ambient = 25                     # ambient temperature (°C)
-
-                    T_battery = T_ambient + R_int * (current ** 2) * delta_t
-                    T_battery = round(T_battery, 2)
-
-                    # Stop charging if battery exceeds safe temperature
-                    if T_battery > 45:
-                        ev_battery_charge_start_stopp = False
-                        add_log(f"Overtemperature – charging stopped at {T_battery} °C")
-
-                    # Battery charging and SoC update (with clamp)
-                    if ev_battery_charge_start_stopp and ev_batt_capacity_percent < 100.0:
-                        ev_batt_capacity_kWh += charging_power / seconds_per_hour
-
-                        # Hard clamp at physical max capacity
-                        if ev_batt_capacity_kWh >= ev_batt_max_capacity:
-                            ev_batt_capacity_kWh = ev_batt_max_capacity
-                            ev_batt_capacity_percent = 100.0
-                            ev_battery_charge_start_stopp = False  # stop charging
-                            add_log("Battery reached 100% – charging stopped automatically.")
-                        else:
-                            ev_batt_capacity_kWh = round(ev_batt_capacity_kWh, 2)
-                            ev_batt_capacity_percent = round(
-                                ev_batt_capacity_kWh / ev_batt_max_capacity * 100,
-                                2,
-                            )
-
-                    # Current load including charger (kW)
-                    base_current_load = round(
-                        base_load_residential_kwh[sim_hour]
-                        + (charging_power if ev_battery_charge_start_stopp else 0),
-                        2,
-                    )
-
-                # Update simulated minutes (0–59)
-                sim_min = int(round((60 / seconds_per_hour * i) % 60, 0))
-
-            # One real second per step
-            time.sleep(1)
-
-        # Advance simulated hour (0–23)
+        # Commands already queued run even when the clock is behind; then
+        # wait for the next step, running commands as they arrive (paused:
+        # until one of them changes that)
+        while writer_queue.run_next(0):
+            pass
+        delay = clock.delay()
+        while delay is None or delay > 0:
+            writer_queue.run_next(delay)
+            delay = clock.delay()
+
+        advance()
+
+
+def advance():
+    """
+    Run one simulation step, starting and ending simulated hours as needed.
+    Does not wait: main_prg and asgi_app pace it with the clock, tests and
+    benchmarks can call it directly.
+    """
+    global next_step
+
+    if next_step is None or restart_hour:
+        # New hour, or clock restored from a checkpoint: continue from there
+        next_step = begin_hour()
+
+    clock.start_step()
+    instruments.drift = clock.lag
+    simulation_step(next_step)
+    clock.end_step()
+
+    next_step += 1
+    if next_step >= seconds_per_hour:
+        end_hour()
+        next_step = None
+
+
+def begin_hour():
+    """Set the base load for this simulated hour; returns the first step."""
+    global base_current_load, resume_step, restart_hour
+
+    with state_write("begin_hour", columns=()):
+        base_current_load = data.base_load(data.timestamp(sim_day, sim_hour))
+        first, resume_step, restart_hour = resume_step, 0, False
+    return first
+
+
+def end_hour():
+    """Advance simulated hour (0–23) and, at midnight, the day."""
+    global sim_day, sim_hour, sim_min
+
+    with state_write("end_hour", columns=()):
+        sim_hour = (sim_hour + 1) % 24
+        sim_min = 0
+        if sim_hour == 0:
+            sim_day += 1
+            load_day_profiles()
+            add_log(f"Day {sim_day}: {data.date_of(sim_day).isoformat()}")
+
+    if telemetry is not None:
+        telemetry.flush()
+
+
+# Fleet columns every tick may write: the strategy and the battery model
+# start and stop vehicles, and packs cool or heat. kwh/percent (when a
+# vehicle charges), limit and allocated are added when they can change.
+TICK_COLUMNS = ("charging", "temp")
+
+
+def simulation_step(i):
+    """
+    Step `i` of the current simulated hour: strategy, fleet tick, load,
+    telemetry and stream publish (the work main_prg does once a second).
+    """
+    global sim_min, base_current_load
+    started = time.perf_counter()
+
+    with state_write("tick", columns=TICK_COLUMNS) as columns:
+        # Strategy decision for this hour (AUTO vehicles only)
+        if strategy.sets_limits:
+            columns.add("limit")
+        changed = strategy.apply(sim_hour, fleet, step_minute(i))
+        if changed is not None:
+            action = "started" if changed else "stopped"
+            add_log(f"Strategy {strategy.mode.upper()}: charging {action}")
+
+        # Share the fuse headroom among the building's chargers (once per
+        # tick; the strategy's changes are pushed, not rescanned)
+        now = data.timestamp(sim_day, sim_hour, step_minute(i))
+        base_load = data.base_load(now)
+        if load_manager is not None:
+            load_manager.chargers_changed(fleet, strategy.changed)
+            allocated = load_manager.allocate(fleet, base_load)
+            columns.add("allocated")
+
+        # Battery charging, temperature check and SoC clamp
+        stored = fleet.kwh.sum()
+        charging = np.count_nonzero(fleet.charging)
+        if charging:
+            columns.update(("kwh", "percent"))
+        overtemp, full = fleet.tick()
+        log_fleet_events(overtemp, full)
+
+        if load_manager is not None:
+            # Chargers stopped by the battery model free their share next tick
+            stopped = overtemp[:load_manager.chargers] | full[:load_manager.chargers]
+            load_manager.chargers_changed(fleet, np.flatnonzero(stopped))
+            # Building load over this tick: base load plus the managed chargers (kW)
+            base_current_load = round(base_load + allocated, 2)
+        else:
+            # Current load including charger (kW), vehicle 0's household
+            base_current_load = building_load(
+                base_load, fleet.charging[0], fleet.vehicle_rate(0)
+            )
+
+        accounting.record(
+            sim_day, data.date_of(sim_day).isoformat(), sim_hour,
+            energy=float(fleet.kwh.sum() - stored),
+            price=data.price(now),
+            charging_seconds=charging * 3600 / seconds_per_hour,
+            load=base_current_load,
+            stops=(np.count_nonzero(overtemp), np.count_nonzero(full)),
+        )
+
+        # Update simulated minutes (0–59)
+        sim_min = step_minute(i)
+
+        sample = telemetry_sample() if telemetry is not None else None
+
+    if sample is not None:
+        telemetry.append(**sample)
+    if instruments.enabled:
+        instruments.tick.observe(time.perf_counter() - started)
+
+
+def load_day_profiles():
+    """Hand the current and next day's hourly prices and loads to the strategy."""
+    strategy.set_profiles(
+        data.day_values("price", sim_day), data.day_values("load", sim_day),
+        data.day_values("price", sim_day + 1), data.day_values("load", sim_day + 1),
+    )
+
+
+def telemetry_sample():
+    """Values recorded by the telemetry store (caller holds global_lock)."""
+    charging = fleet.charging
+    return {
+        "soc": fleet.percent[0],
+        "load": base_current_load,
+        "price": data.price(data.timestamp(sim_day, sim_hour, sim_min)),
+        "charging": charging[0],
+        "fleet_soc": fleet.percent.mean(),
+        "fleet_kw": fleet.rate()[charging].sum() if charging.any() else 0.0,
+    }
+
+
+def log_fleet_events(overtemp, full):
+    """Log stop events: vehicle 0 as before, other vehicles as a count."""
+    for mask, kind in ((overtemp, "overtemp"), (full, "full")):
+        if not mask.any():
+            continue
+        if mask[0]:
+            add_log(event_message((kind, round(float(fleet.temp[0]), 2))))
+        others = int(np.count_nonzero(mask[1:]))
+        if others:
+            add_log(f"{others} other vehicle(s): {event_message((kind, None))}")
+
+
+@contextmanager
+def state_write(site="state_write", requested=None, columns=None):
+    """
+    Hold global_lock for a state change, then publish a new snapshot (and
+    the shared-memory copy in owner role) with the next state version, and
+    push it to streaming and long-polling clients.
+
+    `columns` names the fleet columns the change may write (None: any);
+    only those are copied into the new snapshot. The context yields them
+    as a set, to which the body can add columns it turned out to write.
+
+    Lock wait and hold times are recorded under `site`; the wait counts
+    from `requested` (perf_counter) if given, else from now.
+    """
+    changed = None if columns is None else set(columns)
+    timed = instruments.enabled
+    if timed and requested is None:
+        requested = time.perf_counter()
+
+    with global_lock:
+        if timed:
+            acquired = time.perf_counter()
+            instruments.lock_wait.observe(acquired - requested, site)
+        try:
+            if shared is None:
+                try:
+                    yield changed
+                finally:
+                    publish_snapshot(changed)
+            else:
+                shared.begin_write()
+                try:
+                    yield changed
+                finally:
+                    shared.end_write(sim_hour, sim_min, base_current_load, sim_day)
+                    publish_snapshot(changed)
+        finally:
+            if timed:
+                instruments.lock_hold.observe(time.perf_counter() - acquired, site)
+
+    # Outside the lock
+    publish_state()
+
+
+def publish_snapshot(changed=None):
+    """
+    Swap in an immutable copy of the state (one reference assignment).
+    Fleet columns not in `changed` are shared with the previous snapshot.
+    """
+    global snapshot, state_version
+    state_version += 1
+    previous = snapshot.fleet if snapshot is not None else None
+    snapshot = SimView(
+        sim_hour, sim_min, base_current_load, fleet.snapshot(previous, changed),
+        sim_day, state_version,
+    )
+
+
+def cached_json(cache, fn, dumps=json.dumps):
+    """fn(SimView) encoded once per published state and shared by readers."""
+    if sim_role == "worker":
+        return cache.get(shared.version(), lambda: dumps(read_state(fn)))
+
+    state = snapshot
+    if state is None:
+        return dumps(read_state(fn))
+    return cache.get(state, lambda: dumps(fn(state)))
+
+
+def read_state(fn):
+    """Call fn(SimView) on a consistent view of the simulation state."""
+    if sim_role == "worker":
+        # Straight from shared memory, no lock and no IPC
+        return shared.read(fn)
+
+    state = snapshot
+    if state is None:
+        # Nothing published yet (before the first state change)
         with global_lock:
-            sim_hour = (sim_hour + 1) % 24
-            sim_min = 0
+            publish_snapshot()
+            state = snapshot
+    return fn(state)
+
+
+def info_view(state):
+    """/info fields (vehicle 0) of a SimView."""
+    return {
+        "version": state.version,
+        "sim_day": state.sim_day,
+        "sim_date": data.date_of(state.sim_day).isoformat(),
+        "sim_time_hour": state.sim_hour,
+        "sim_time_min": state.sim_min,
+        "base_current_load": state.base_current_load,
+        "battery_capacity_kWh": round(float(state.fleet.kwh[0]), 2),
+        "battery_max_capacity_kWh": float(state.fleet.capacity[0]),
+        "ev_battery_charge_start_stopp": bool(state.fleet.charging[0]),
+        "battery_percent": float(state.fleet.percent[0]),
+        "user_override": state.fleet.override_mode(0),
+        "allocated_power_kW": (
+            round(state.fleet.vehicle_rate(0), 2) if state.fleet.charging[0] else 0.0
+        ),
+    }
+
+
+def long_poll_args(args):
+    """(since, wait) of a long-poll /info query (raises ValueError)."""
+    try:
+        since = int(args["since"])
+        wait = float(args.get("wait", 0))
+    except (TypeError, ValueError):
+        raise ValueError("since must be an integer and wait a number of seconds") from None
+    if not wait >= 0:
+        raise ValueError("wait must be >= 0")
+    return since, min(wait, long_poll_max)
+
+
+def long_poll_waits(since):
+    """
+    True if /info?since= has to wait for a state newer than `since`. A
+    `since` ahead of the latest version (from before a server restart) is
+    answered at once, with the full state.
+    """
+    sync_stream_hub()
+    return since <= latest_version()
+
+
+def info_changes(since):
+    """
+    /info fields changed after version `since` (all fields if unknown), at
+    the latest version: never older than a `since` this server published.
+    """
+    sync_stream_hub()
+    return stream_hub.changes_since(since)
+
+
+def latest_version():
+    """Version of the last completed state change (no lock needed)."""
+    if sim_role == "worker":
+        # The shared-memory counter, not the hub: the hub may lag behind
+        return int(shared.header["seq"]) // 2
+    return state_version
+
+
+def publish_state():
+    """Hand the current /info state to the stream hub."""
+    # One publisher at a time, so the hub never goes back to an older state
+    with publish_lock:
+        stream_hub.publish(read_state(info_view))
+
+
+def sync_stream_hub():
+    """Publish to the hub unless it already has the latest version."""
+    if stream_hub.version is None or stream_hub.version < latest_version():
+        publish_state()
+
+
+def stream_pump():
+    """Worker role: publish changes seen in shared memory to local streams."""
+    while True:
+        sync_stream_hub()
+        time.sleep(stream_poll_interval)
+
+
+def fleet_summary(state):
+    """/vehicles fields of a SimView."""
+    info = state.fleet.summary()
+    info["sim_time_hour"] = state.sim_hour
+    info["sim_time_min"] = state.sim_min
+    return info
+
+
+def valid_vehicle(vid):
+    return 0 <= vid < fleet.size
+
+
+def vehicle_info(state, vid):
+    """Info dict for one vehicle of a SimView."""
+    info = state.fleet.vehicle(vid)
+    info["sim_time_hour"] = state.sim_hour
+    info["sim_time_min"] = state.sim_min
+    now = data.timestamp(state.sim_day, state.sim_hour, state.sim_min)
+    info["base_current_load"] = building_load(
+        data.base_load(now), state.fleet.charging[vid], state.fleet.vehicle_rate(vid)
+    )
+    return info
+
+
+def charge_command(vid, start_charg):
+    """Apply a start/stop command to one vehicle (caller holds global_lock)."""
+    mode = fleet.override_mode(vid)
+
+    # If user override is active, ignore algorithm commands
+    if mode != "auto":
+        return {
+            "charging": "on" if fleet.charging[vid] else "off",
+            "override": mode,
+        }
+
+    # Normal behaviour in AUTO mode
+    if start_charg == "on":
+        fleet.set_charging(vid, True)
+        charger_changed(vid)
+        return {"charging": "on", "override": None}
+    if start_charg == "off":
+        fleet.set_charging(vid, False)
+        charger_changed(vid)
+        return {"charging": "off", "override": None}
+
+    return {"error": "Invalid command"}
+
+
+def override_command(vid, mode):
+    """Set the override of one vehicle (caller holds global_lock)."""
+    fleet.set_override(vid, mode)
+    charger_changed(vid)
+    return {
+        "override": fleet.override_mode(vid),
+        "charging": bool(fleet.charging[vid]),
+    }
+
+
+def discharge_command():
+    """Reset every vehicle and the clock (caller holds global_lock)."""
+    global base_current_load, sim_day, sim_hour, sim_min
+
+    # Every vehicle back to 20%, not charging, AUTO mode
+    fleet.reset(ev_batt_start_percent)
+    if load_manager is not None:
+        load_manager.reload(fleet)
+
+    sim_day = 0
+    sim_hour = 0
+    sim_min = 0
+    base_current_load = data.base_load(data.timestamp(0, 0))
+    load_day_profiles()
+    return {"discharging": "on"}
+
+
+def charger_changed(vid):
+    """Reallocate the fuse after a command changed one charger."""
+    if load_manager is not None:
+        load_manager.charger_changed(fleet, vid)
+
+
+def priority_command(vid, priority):
+    """Set the load management priority of one vehicle (caller holds global_lock)."""
+    fleet.priority[vid] = priority
+    charger_changed(vid)
+    return {
+        "id": vid,
+        "priority": int(fleet.priority[vid]),
+        "allocated_power_kW": fleet.vehicle(vid)["allocated_power_kW"],
+    }
+
+
+def load_command(mode=None, fuse=None):
+    """Change load management mode / fuse size (caller holds global_lock)."""
+    if load_manager is None:
+        raise RuntimeError("Load management is disabled (EV_BUILDING_CHARGERS=0)")
+    load_manager.configure(mode, fuse)
+    load_manager.refresh(fleet)
+    return load_manager.info()
+
+
+def load_info_command(offset, limit):
+    """Fuse, headroom and the allocation of chargers offset.. (no lock needed)."""
+    if load_manager is None:
+        raise RuntimeError("Load management is disabled (EV_BUILDING_CHARGERS=0)")
+
+    def chargers(s):
+        ids = range(offset, min(offset + limit, load_manager.chargers))
+        return [
+            {
+                key: value
+                for key, value in s.fleet.vehicle(vid).items()
+                if key in ("id", "priority", "allocated_power_kW",
+                           "ev_battery_charge_start_stopp", "battery_percent")
+            }
+            for vid in ids
+        ]
+
+    info = load_manager.info()
+    info["offset"] = offset
+    info["allocation"] = read_state(chargers)
+    return info
+
+
+def load_settings():
+    """Load management configuration as load_manager.configure() arguments."""
+    return {"mode": load_manager.mode, "fuse": load_manager.fuse}
+
+
+def clock_settings():
+    return {"speed": clock.speed, "paused": clock.paused}
+
+
+def clock_info_command():
+    """Clock state plus the simulated time (no lock needed)."""
+    info = clock.info()
+    info.update(read_state(lambda s: {
+        "sim_day": s.sim_day,
+        "sim_time_hour": s.sim_hour,
+        "sim_time_min": s.sim_min,
+    }))
+    return info
+
+
+def clock_command(action, value=None):
+    """
+    pause / resume / step (value: number of steps) / speed (value: factor)
+    on the writer thread, so the loop sees the change before it waits again.
+    """
+    if action == "pause":
+        clock.pause()
+    elif action == "resume":
+        clock.resume()
+    elif action == "step":
+        clock.step(1 if value is None else value)
+    elif action == "speed":
+        clock.set_speed(value)
+    else:
+        raise ValueError(f"Unknown clock action: {action}")
+    info = clock.info()
+    info.update(sim_day=sim_day, sim_time_hour=sim_hour, sim_time_min=sim_min)
+    return info
+
+
+def strategy_command(mode=None, cheap_hours=None, min_headroom=None,
+                     target_percent=None, deadline_hour=None):
+    """Change the charging strategy (caller holds global_lock)."""
+    strategy.configure(mode, cheap_hours, min_headroom, target_percent, deadline_hour)
+    return strategy.info()
+
+
+def strategy_info_command():
+    return strategy.info()
+
+
+def strategy_settings():
+    """Strategy configuration as strategy.configure() keyword arguments."""
+    return {
+        "mode": strategy.mode,
+        "cheap_hours": strategy.cheap_hours,
+        "min_headroom": strategy.min_headroom,
+        "target_percent": strategy.target_percent,
+        "deadline_hour": strategy.deadline_hour,
+    }
+
+
+def checkpoint_meta():
+    """Settings stored in the checkpoint's JSON trailer."""
+    meta = {"strategy": strategy_settings(), "clock": clock_settings()}
+    if load_manager is not None:
+        meta["load"] = load_settings()
+    return meta
+
+
+def checkpoint_command():
+    """Write the published state to the checkpoint file (no lock needed)."""
+    if not checkpoint_file:
+        raise RuntimeError("Checkpoints are disabled (EV_CHECKPOINT_FILE)")
+
+    started = time.perf_counter()
+    state = read_state(lambda s: s)
+    size = checkpoint.save(
+        checkpoint_file, state, simulation_log.head, checkpoint_meta()
+    )
+    return {
+        "path": checkpoint_file,
+        "bytes": size,
+        "vehicles": state.fleet.size,
+        "sim_day": state.sim_day,
+        "sim_time_hour": state.sim_hour,
+        "sim_time_min": state.sim_min,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def checkpoint_info_command():
+    """Header of the checkpoint file (raises FileNotFoundError if none)."""
+    if not checkpoint_file:
+        raise RuntimeError("Checkpoints are disabled (EV_CHECKPOINT_FILE)")
+
+    saved = checkpoint.load(checkpoint_file)
+    return {
+        "path": checkpoint_file,
+        "bytes": os.path.getsize(checkpoint_file),
+        "vehicles": saved.fleet.size,
+        "created": saved.created,
+        "sim_day": saved.sim_day,
+        "sim_time_hour": saved.sim_hour,
+        "sim_time_min": saved.sim_min,
+    }
+
+
+def restore_command(resume_log=False):
+    """
+    Load the checkpoint file into the live state (caller holds global_lock).
+    `resume_log` continues the log numbering (startup only).
+    """
+    global sim_day, sim_hour, sim_min, base_current_load, resume_step, restart_hour
+    if not checkpoint_file:
+        raise RuntimeError("Checkpoints are disabled (EV_CHECKPOINT_FILE)")
+
+    started = time.perf_counter()
+    saved = checkpoint.load(checkpoint_file)
+    checkpoint.copy_fleet(saved.fleet, fleet)
+
+    sim_day, sim_hour, sim_min = saved.sim_day, saved.sim_hour, saved.sim_min
+    base_current_load = saved.base_current_load
+    settings = saved.meta.get("strategy")
+    if settings:
+        strategy.configure(**settings)
+    if load_manager is not None:
+        load_manager.configure(**saved.meta.get("load", {}))
+        load_manager.reload(fleet)
+    settings = saved.meta.get("clock")
+    if settings:
+        clock.set_speed(settings["speed"])
+    load_day_profiles()
+    if resume_log:
+        simulation_log.resume(saved.log_cursor)
+
+    # Continue after the step that produced sim_min (0: start of the hour)
+    resume_step = round(sim_min * seconds_per_hour / 60) + (sim_min > 0)
+    restart_hour = True
+    return {
+        "restored": checkpoint_file,
+        "vehicles": fleet.size,
+        "sim_day": sim_day,
+        "sim_time_hour": sim_hour,
+        "sim_time_min": sim_min,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def save_checkpoint():
+    """Checkpointer callback: write, logging instead of raising."""
+    try:
+        checkpoint_command()
+    except OSError as e:
+        add_log(f"Checkpoint failed: {e}")
+
+
+def restore_at_startup():
+    """Continue from the checkpoint file, if there is a usable one."""
+    if not os.path.exists(checkpoint_file):
+        return None
+    try:
+        with state_write("startup"):
+            return restore_command(resume_log=True)
+    except (OSError, ValueError) as e:
+        return {"error": str(e)}
+
+
+def log_command(cursor, limit):
+    """Log lines from `cursor` on, or the last `limit` lines (no lock needed)."""
+    if cursor is None:
+        cursor = max(0, simulation_log.head - limit)
+    entries, next_cursor, dropped = simulation_log.read(cursor, limit)
+    return {
+        "lines": [
+            {"seq": seq, "time": round(created, 3), "line": line}
+            for seq, created, line in entries
+        ],
+        "next_cursor": next_cursor,
+        "dropped": dropped,
+    }
+
+
+def metrics_command():
+    """/metrics text: a copy of the accounting taken under the lock."""
+    with global_lock:
+        totals = accounting.copy()
+        version = state_version
+    return totals.render(extra=[
+        ("ev_state_version", "counter", "State changes published", version),
+    ]) + instruments.render_simulation()
+
+
+def history_command(t_from, t_to, step, method, fields):
+    """Downsampled telemetry (the store has its own lock)."""
+    if telemetry is None:
+        raise RuntimeError("Telemetry is disabled")
+    return telemetry.query(t_from, t_to, step, method, fields)
+
+
+def batch_command(ops):
+    """
+    Apply validated batch operations in order (caller holds global_lock,
+    so the whole batch is atomic). Returns one result per operation.
+    """
+    results = []
+    for op in ops:
+        name = op["op"]
+        vid = op.get("vehicle", 0)
+        if name == "charge":
+            results.append(charge_command(vid, op["charging"]))
+        elif name == "override":
+            results.append(override_command(vid, op["mode"]))
+        elif name == "priority":
+            results.append(priority_command(vid, op["priority"]))
+        elif name == "discharge":
+            results.append(discharge_command())
+        else:  # "info"
+            # Readers never see the state between two operations: the batch
+            # is published as one version, and its info results carry it
+            # (usable as /info?since=)
+            view = SimView(
+                sim_hour, sim_min, base_current_load, fleet, sim_day, publishing_version()
+            )
+            results.append(info_view(view) if vid == 0 else vehicle_info(view, vid))
+    return results
+
+
+def publishing_version():
+    """Version the state_write in progress will publish (caller holds global_lock)."""
+    if shared is not None:
+        # Workers read the number of completed shared-memory writes
+        return (int(shared.header["seq"]) + 1) // 2
+    return state_version + 1
+
+
+# Control commands that change the simulation state
+COMMANDS = {
+    "charge": charge_command,
+    "override": override_command,
+    "discharge": discharge_command,
+    "batch": batch_command,
+    "priority": priority_command,
+    "load": load_command,
+    "load_info": load_info_command,
+    "clock": clock_command,
+    "clock_info": clock_info_command,
+    "strategy": strategy_command,
+    "strategy_info": strategy_info_command,
+    "log": log_command,
+    "history": history_command,
+    "metrics": metrics_command,
+    "checkpoint": checkpoint_command,
+    "checkpoint_info": checkpoint_info_command,
+    "restore": restore_command,
+}
+
+# Fleet columns each command may write (not listed: any column)
+COMMAND_COLUMNS = {
+    "charge": ("charging", "allocated"),
+    "override": ("override", "charging", "allocated"),
+    "priority": ("priority", "allocated"),
+    "load": ("allocated",),
+    "clock": (),
+    "strategy": (),
+}
+
+# Commands that only read and skip the state lock
+QUERIES = {
+    "log", "history", "checkpoint", "checkpoint_info", "load_info", "metrics", "clock_info",
+}
+
+
+def apply_command(name, *args):
+    """Run one command on the writer thread and publish the result."""
+    if name in QUERIES:
+        return COMMANDS[name](*args)
+    # The lock wait of a command includes its time in the writer queue
+    requested = time.perf_counter() if instruments.enabled else None
+    return writer_queue.submit(write_command, name, args, requested)
+
+
+def write_command(name, args, requested=None):
+    with state_write(f"command:{name}", requested, COMMAND_COLUMNS.get(name)):
+        return COMMANDS[name](*args)
+
+
+def run_command(name, *args):
+    """Run a command here, or forward it to the owner in worker role."""
+    if command_client is not None:
+        return command_client.call(name, *args)
+
+    return apply_command(name, *args)
+
+
+def json_object():
+    """
+    JSON request body as a dict ({} when empty or not JSON); None when it
+    is valid JSON but not an object (the caller answers 400).
+    """
+    data = request.get_json(silent=True)
+    if data is None:
+        return {}
+    return data if isinstance(data, dict) else None
+
+
+def not_an_object():
+    return jsonify({"error": "Body must be a JSON object"}), 400
+
+
+def number_arg(name):
+    """Query parameter `name` as a finite float, None if absent (raises ValueError)."""
+    text = request.args.get(name)
+    if text is None:
+        return None
+    try:
+        value = float(text)
+    except ValueError:
+        raise ValueError(f"{name} must be a number") from None
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a number")
+    return value
+
+
+# Request latency per endpoint (see instrumentation.py)
+@app.before_request
+def start_request_timer():
+    if instruments.enabled:
+        g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_time(response):
+    started = g.get("request_started")
+    if started is not None:
+        rule = request.url_rule
+        instruments.requests.observe(
+            time.perf_counter() - started, rule.rule if rule is not None else "not_found"
+        )
+    return response
 
 
 # Default route – returns battery energy in kWh
 @app.route("/")
 def home():
-    return json.dumps(ev_batt_capacity_kWh)
+    return json.dumps(read_state(lambda s: round(float(s.fleet.kwh[0]), 2)))
 
 
 # Return system info (includes override)
 @app.route("/info", methods=["GET"])
 def station_info():
-    with global_lock:
-        info = {
-            "sim_time_hour": sim_hour,
-            "sim_time_min": sim_min,
-            "base_current_load": base_current_load,
-            "battery_capacity_kWh": ev_batt_capacity_kWh,
-            "battery_max_capacity_kWh": ev_batt_max_capacity,
-            "ev_battery_charge_start_stopp": ev_battery_charge_start_stopp,
-            "battery_percent": ev_batt_capacity_percent,
-            "user_override": user_override or "auto",
-        }
-    return json.dumps(info), {"Access-Control-Allow-Origin": "*"}
+    """
+    - GET /info                       -> full state, including its "version"
+    - GET /info?since=<v>&wait=<s>    -> long poll: wait up to s seconds for a
+                                         newer state, then return only the
+                                         fields changed since v (+ "version")
+    """
+    if "since" in request.args:
+        try:
+            since, wait = long_poll_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if long_poll_waits(since):
+            stream_hub.wait_newer(since, wait)
+        return json.dumps(info_changes(since)), {"Access-Control-Allow-Origin": "*"}
+
+    # Worker role: record this version in the hub's history, so a long
+    # poll with since=<it> gets a delta rather than the full state
+    sync_stream_hub()
+    body = cached_json(info_body, info_view)
+    return body, {"Access-Control-Allow-Origin": "*"}
+
+
+# Server-Sent Events: full /info state first, then only changed fields
+@app.route("/stream", methods=["GET"])
+def stream():
+    def events():
+        yield b"retry: 2000\n\n"
+        for message in stream_hub.messages():
+            yield b": keepalive\n\n" if message is None else message.sse
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# WebSocket equivalent of /stream (needs flask-sock)
+if sock is not None:
+    @sock.route("/ws")
+    def stream_ws(ws):
+        for message in stream_hub.messages():
+            if message is None:
+                continue
+            ws.send(message.payload)
+
+
+# Day lists encoded (and gzipped) once per (kind, zone, day, resolution);
+# ETag revalidation answers 304
+day_responses = {}
+day_responses_max = 256
+
+# Bodies encoded once per state version (per tick or command)
+info_body = VersionedBody()
+fleet_body = VersionedBody()
 
 
 # Return base load list (24 hours)
 @app.route("/baseload", methods=["GET"])
 def base_load_info():
-    return json.dumps(base_load_residential_kwh)
+    return day_list_response("load")
 
 
 # Return price list (24 hours)
 @app.route("/priceperhour", methods=["GET"])
 def price_per_hour_info():
-    return json.dumps(energy_price)
+    return day_list_response("price")
+
+
+def day_response(kind, date=None, zone=None, resolution="hourly"):
+    """
+    StaticResponse with the `kind` values of one day (raises ValueError,
+    also for a date outside the data): `date` YYYY-MM-DD (default: the
+    current simulated day), `zone` and
+    resolution "native" for quarter-hour values instead of 24 hourly ones.
+    """
+    zone = zone or data.zone
+    if date:
+        day = data.day_of(parse_date(date))
+        if not data.covers(kind, day, zone):
+            raise ValueError(f"No {kind} data for {date}")
+    else:
+        day = read_state(lambda s: s.sim_day)
+    hourly = resolution != "native"
+    key = (kind, zone, day, hourly)
+
+    response = day_responses.get(key)
+    if response is None:
+        response = StaticResponse(data.day_values(kind, day, zone, hourly))
+        if len(day_responses) >= day_responses_max:
+            day_responses.clear()
+        day_responses[key] = response
+    return response
+
+
+def day_list_response(kind):
+    """?date=YYYY-MM-DD, ?zone=<name>, ?resolution=native (see day_response)."""
+    try:
+        response = day_response(
+            kind,
+            request.args.get("date"),
+            request.args.get("zone"),
+            request.args.get("resolution", "hourly"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return response.respond(request)
+
+
+# Zones and dates covered by the price / load data
+@app.route("/zones", methods=["GET"])
+def zones_info():
+    return jsonify({
+        "zones": data.zones,
+        "default_zone": data.zone,
+        "first_date": data.date_of(0).isoformat(),
+        "resolution_s": {kind: data.resolution(kind) for kind in ("price", "load")},
+    }), 200
 
 
 # Start/stop charging – respects user override
-@app.route("/charge", methods=["POST", "GET"])
-def charge_battery():
-    global ev_battery_charge_start_stopp, user_override
+@app.route("/charge", methods=["POST", "GET"], defaults={"vid": 0})
+@app.route("/vehicles/<int:vid>/charge", methods=["POST", "GET"])
+def charge_battery(vid):
+    if not valid_vehicle(vid):
+        return jsonify({"error": "Unknown vehicle"}), 404
 
     if request.method == "POST":
+        json_input = json_object()
+        if json_input is None:
+            return not_an_object()
         try:
-            json_input = request.json or {}
             start_charg = json_input.get("charging", 0)
 
-            with global_lock:
-                # If user override is active, ignore algorithm commands
-                if user_override in ("force_on", "force_off"):
-                    return json.dumps(
-                        {
-                            "charging": "on"
-                            if ev_battery_charge_start_stopp
-                            else "off",
-                            "override": user_override,
-                        }
-                    )
-
-                # Normal behaviour in AUTO mode
-                if start_charg == "on":
-                    ev_battery_charge_start_stopp = True
-                    return json.dumps(
-                        {"charging": "on", "override": user_override}
-                    )
-                if start_charg == "off":
-                    ev_battery_charge_start_stopp = False
-                    return json.dumps(
-                        {"charging": "off", "override": user_override}
-                    )
-
-                return json.dumps({"error": "Invalid command"})
+            return json.dumps(run_command("charge", vid, start_charg))
 
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
     # GET returns battery % only
-    with global_lock:
-        percent = ev_batt_capacity_percent
+    percent = read_state(lambda s: float(s.fleet.percent[vid]))
     return jsonify(percent)
 
 
 # Reset battery to 20% and restart simulation time (also clears override)
 @app.route("/discharge", methods=["POST", "GET"])
 def discharge_battery():
-    global ev_battery_charge_start_stopp
-    global base_current_load, ev_batt_capacity_percent
-    global ev_batt_capacity_kWh, sim_hour, sim_min, user_override
-
     if request.method == "POST":
-        json_input = request.json or {}
+        json_input = json_object()
+        if json_input is None:
+            return not_an_object()
         discharg = json_input.get("discharging", 0)
 
-        with global_lock:
-            if discharg == "on":
-                ev_battery_charge_start_stopp = False
-                user_override = None  # back to AUTO mode
-                base_current_load = base_load_residential_kwh[0]
-
-                ev_batt_capacity_percent = 20
-                ev_batt_capacity_kWh = (
-                    ev_batt_capacity_percent / 100 * ev_batt_max_capacity
-                )
-
-                sim_hour = 0
-                sim_min = 0
-
-                return json.dumps({"discharging": "on"})
+        if discharg == "on":
+            return json.dumps(run_command("discharge"))
 
     return jsonify({"message": "Use POST to reset battery."})
 
 
 # User override endpoint
-@app.route("/override", methods=["GET", "POST"])
-def override():
+@app.route("/override", methods=["GET", "POST"], defaults={"vid": 0})
+@app.route("/vehicles/<int:vid>/override", methods=["GET", "POST"])
+def override(vid):
     """
     User override for charging:
     - GET  -> read current override + charging state
@@ -276,54 +1150,516 @@ def override():
     - POST {"mode": "force_on"}   -> force charging ON
     - POST {"mode": "force_off"}  -> force charging OFF
     """
-    global user_override, ev_battery_charge_start_stopp
+    if not valid_vehicle(vid):
+        return jsonify({"error": "Unknown vehicle"}), 404
 
     if request.method == "GET":
-        with global_lock:
-            return (
-                jsonify(
-                    {
-                        "override": user_override or "auto",
-                        "charging": ev_battery_charge_start_stopp,
-                    }
-                ),
-                200,
-            )
-
-    data = request.get_json(silent=True) or {}
+        return (
+            jsonify(
+                read_state(lambda s: {
+                    "override": s.fleet.override_mode(vid),
+                    "charging": bool(s.fleet.charging[vid]),
+                })
+            ),
+            200,
+        )
+
+    data = json_object()
+    if data is None:
+        return not_an_object()
     mode = data.get("mode")
 
-    if mode not in ("auto", "force_on", "force_off"):
+    if mode not in OVERRIDE_MODES:
         return jsonify({"error": "Invalid mode"}), 400
 
-    with global_lock:
-        if mode == "auto":
-            user_override = None
-        else:
-            user_override = mode
+    result = run_command("override", vid, mode)
+    return jsonify(result), 200
 
-        # Apply immediate effect when forcing ON/OFF
-        if user_override == "force_on":
-            ev_battery_charge_start_stopp = True
-        elif user_override == "force_off":
-            ev_battery_charge_start_stopp = False
 
-        result = {
-            "override": user_override or "auto",
-            "charging": ev_battery_charge_start_stopp,
-        }
+# Batch of operations applied atomically in one request
+@app.route("/batch", methods=["POST"])
+def batch():
+    """
+    POST {"ops": [
+        {"op": "info"},
+        {"op": "charge", "charging": "on"},
+        {"op": "override", "mode": "auto", "vehicle": 3},
+        {"op": "priority", "priority": 9, "vehicle": 3},
+        {"op": "discharge"},
+    ]}
+    -> {"results": [...]} in the same order. "vehicle" defaults to 0.
+    Nothing is applied if any operation is invalid.
+    """
+    data = json_object()
+    if data is None:
+        return not_an_object()
+    ops = data.get("ops")
+
+    if not isinstance(ops, list) or not ops:
+        return jsonify({"error": "ops must be a non-empty list"}), 400
+
+    for index, op in enumerate(ops):
+        error = batch_op_error(op)
+        if error:
+            return jsonify({"error": f"ops[{index}]: {error}"}), 400
+
+    results = run_command("batch", ops)
+    return jsonify({"results": results}), 200
+
+
+def batch_op_error(op):
+    """Return an error message for an invalid batch operation, else None."""
+    if not isinstance(op, dict):
+        return "operation must be an object"
+
+    vid = op.get("vehicle", 0)
+    if type(vid) is not int or not valid_vehicle(vid):
+        return "Unknown vehicle"
+
+    name = op.get("op")
+    if name == "charge":
+        if op.get("charging") not in ("on", "off"):
+            return "Invalid command"
+    elif name == "override":
+        if op.get("mode") not in OVERRIDE_MODES:
+            return "Invalid mode"
+    elif name == "priority":
+        priority = op.get("priority")
+        if type(priority) is not int or priority not in PRIORITIES:
+            return "priority must be 0-9"
+    elif name not in ("discharge", "info"):
+        return f"Unknown op: {name}"
+    return None
+
+
+# Server-side charging strategy
+@app.route("/strategy", methods=["GET", "POST"])
+def strategy_endpoint():
+    """
+    - GET  -> current mode, parameters and cheapest hours
+    - POST {"mode": "price", "cheap_hours": 8}  -> charge in the N cheapest hours
+    - POST {"mode": "load", "min_headroom": 0}  -> charge while the fuse has room
+    - POST {"mode": "schedule", "target_percent": 80, "deadline_hour": 7}
+                                                -> follow the min-cost /schedule plan
+    - POST {"mode": "manual"}                   -> clients control charging
+    """
+    if request.method == "GET":
+        return jsonify(run_command("strategy_info")), 200
+
+    data = json_object()
+    if data is None:
+        return not_an_object()
+    try:
+        result = run_command(
+            "strategy",
+            data.get("mode"),
+            data.get("cheap_hours"),
+            data.get("min_headroom"),
+            data.get("target_percent"),
+            data.get("deadline_hour"),
+        )
+    except (TypeError, ValueError, RuntimeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result), 200
+
+
+# Building load management (see load_manager.py)
+@app.route("/loadmanagement", methods=["GET", "POST"])
+def load_management():
+    """
+    - GET  ?offset=0&limit=100 -> fuse, base load, headroom, total allocated
+                                  power and the allocation of each charger
+    - POST {"mode": "fair"}         -> equal share of the headroom
+    - POST {"mode": "priority"}     -> higher priority chargers first
+    - POST {"fuse_kW": 16}          -> change the fuse size
+    """
+    try:
+        if request.method == "GET":
+            offset = int(request.args.get("offset", 0))
+            limit = min(int(request.args.get("limit", 100)), log_page_limit)
+            if offset < 0 or limit < 1:
+                raise ValueError("offset must be >= 0 and limit >= 1")
+            return jsonify(run_command("load_info", offset, limit)), 200
+
+        data = json_object()
+        if data is None:
+            return not_an_object()
+        return jsonify(run_command("load", data.get("mode"), data.get("fuse_kW"))), 200
+    except (TypeError, ValueError, RuntimeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+
+# Load management priority of one vehicle
+@app.route("/vehicles/<int:vid>/priority", methods=["GET", "POST"])
+def vehicle_priority(vid):
+    """
+    - GET                    -> priority and allocated power
+    - POST {"priority": 5}   -> 0 (lowest) .. 9, used in "priority" mode
+    """
+    if not valid_vehicle(vid):
+        return jsonify({"error": "Unknown vehicle"}), 404
+
+    if request.method == "GET":
+        return jsonify(read_state(lambda s: {
+            key: s.fleet.vehicle(vid)[key] for key in ("id", "priority", "allocated_power_kW")
+        })), 200
+
+    data = json_object()
+    if data is None:
+        return not_an_object()
+    priority = data.get("priority")
+    if type(priority) is not int or priority not in PRIORITIES:
+        return jsonify({"error": "priority must be 0-9"}), 400
+    return jsonify(run_command("priority", vid, priority)), 200
+
+
+# Virtual clock (see sim_clock.py)
+@app.route("/clock", methods=["GET"])
+def clock_endpoint():
+    """Speed, pause state, steps run, lag and the simulated time."""
+    return jsonify(run_command("clock_info")), 200
+
+
+@app.route("/clock/<action>", methods=["POST"])
+def clock_control(action):
+    """
+    - POST /clock/pause
+    - POST /clock/resume
+    - POST /clock/step  {"steps": 1}     -> run N steps now (while paused)
+    - POST /clock/speed {"speed": 100}   -> 1x-10000x (1x: 1 sim hour/min)
+    """
+    data = json_object()
+    if data is None:
+        return not_an_object()
+    if action not in ("pause", "resume", "step", "speed"):
+        return jsonify({"error": f"Unknown clock action: {action}"}), 404
+    value = data.get("steps") if action == "step" else data.get("speed")
+    if action == "speed" and value is None:
+        return jsonify({"error": "speed is required"}), 400
+    try:
+        return jsonify(run_command("clock", action, value)), 200
+    except (TypeError, ValueError, RuntimeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+
+# Checkpoint of the simulation state (see checkpoint.py)
+@app.route("/checkpoint", methods=["GET", "POST"])
+def checkpoint_endpoint():
+    """
+    - GET  -> clock, size and time of the current checkpoint file
+    - POST -> write a checkpoint of the current state now
+    """
+    try:
+        if request.method == "GET":
+            return jsonify(run_command("checkpoint_info")), 200
+        return jsonify(run_command("checkpoint")), 200
+    except FileNotFoundError:
+        return jsonify({"error": "No checkpoint"}), 404
+    except (OSError, ValueError, RuntimeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+
+# Replace the running state with the last checkpoint
+@app.route("/restore", methods=["POST"])
+def restore_endpoint():
+    try:
+        return jsonify(run_command("restore")), 200
+    except FileNotFoundError:
+        return jsonify({"error": "No checkpoint"}), 404
+    except (OSError, ValueError, RuntimeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+
+# Minimum-cost charge plan for one vehicle
+@app.route("/schedule", methods=["GET"])
+def schedule_endpoint():
+    """
+    GET /schedule?vehicle=0&target=80&deadline=7
+    -> per-hour charging power, energy and cost from now until the deadline
+       (defaults: the strategy's target_percent and deadline_hour)
+    """
+    settings = run_command("strategy_info")
+    try:
+        vid = int(request.args.get("vehicle", 0))
+        target = float(request.args.get("target", settings["target_percent"]))
+        deadline = int(request.args.get("deadline", settings["deadline_hour"]))
+    except ValueError:
+        return jsonify({"error": "Invalid parameter"}), 400
+
+    if not valid_vehicle(vid):
+        return jsonify({"error": "Unknown vehicle"}), 404
+    if not 0 <= target <= 100 or not 0 <= deadline <= 23:
+        return jsonify({"error": "target must be 0-100, deadline 0-23"}), 400
+
+    def plan(s):
+        result = charge_schedule.describe(
+            s.fleet.kwh[vid], s.fleet.capacity[vid], s.fleet.power[vid],
+            target, s.sim_hour, s.sim_min, deadline,
+            prices=data.horizon_values("price", s.sim_day),
+            base_loads=data.horizon_values("load", s.sim_day),
+        )
+        result["vehicle"] = vid
+        result["battery_percent"] = float(s.fleet.percent[vid])
+        result["sim_time_hour"] = s.sim_hour
+        result["sim_time_min"] = s.sim_min
+        return result
+
+    return jsonify(read_state(plan)), 200
+
+
+# Simulation log, paged by cursor
+@app.route("/log", methods=["GET"])
+def simulation_log_endpoint():
+    """
+    GET /log?cursor=0&limit=100
+    -> {"lines": [{"seq", "time", "line"}, ...], "next_cursor": N, "dropped": D}
 
+    Pass next_cursor back as cursor to get only the lines not seen yet.
+    Without a cursor, the last `limit` lines are returned. `dropped` counts
+    lines that were overwritten in the ring before they were fetched.
+    """
+    try:
+        limit = min(int(request.args.get("limit", 100)), log_page_limit)
+        cursor = request.args.get("cursor")
+        cursor = None if cursor is None else int(cursor)
+    except ValueError:
+        return jsonify({"error": "cursor and limit must be integers"}), 400
+    if limit < 1 or (cursor is not None and cursor < 0):
+        return jsonify({"error": "cursor must be >= 0 and limit >= 1"}), 400
+
+    return jsonify(run_command("log", cursor, limit)), 200
+
+
+# Telemetry history with server-side downsampling
+@app.route("/history", methods=["GET"])
+def history():
+    """
+    GET /history?from=0&to=86400&step=600&method=minmax&fields=soc,load
+
+    from/to/step are simulated seconds since the store was created (default:
+    the last simulated day in 500 points). method "minmax" returns
+    min/max/mean per step-bucket, "lttb" a largest-triangle-three-buckets
+    selection of the mean values. Long ranges are served from the quarter
+    hour, hour or day rollups.
+    """
+    try:
+        t_from = number_arg("from")
+        t_to = number_arg("to")
+        step = number_arg("step")
+        method = request.args.get("method", "minmax")
+        fields = request.args.get("fields")
+        fields = fields.split(",") if fields else list(METRICS)
+        if step is not None and step <= 0:
+            raise ValueError("step must be > 0")
+        result = run_command("history", t_from, t_to, step, method, fields)
+    except (ValueError, RuntimeError) as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify(result), 200
 
 
-# Start background simulation thread
-increment_sum_thread = threading.Thread(target=main_prg, daemon=True)
-increment_sum_thread.start()
+# Prometheus metrics: energy, cost, charging time, peak load, stops
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Totals since start plus the current simulated day and its 24 price
+    hours, in the Prometheus text format (constant size, see accounting.py).
+    """
+    body = run_command("metrics") + instruments.render_requests()
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+# Sampling profiler of this process (opt-in: EV_PROFILER=1)
+@app.route("/profile", methods=["GET"])
+def profile():
+    """
+    GET /profile?seconds=5&interval=0.005
+    -> folded stacks ("thread;outer;inner count") of every thread, sampled
+       for `seconds` (at most 60); feed to flamegraph.pl or speedscope.
+    With several workers this profiles the worker that got the request.
+    """
+    if not profiler_enabled:
+        return jsonify({"error": "Profiler disabled (start with EV_PROFILER=1)"}), 404
+    try:
+        seconds = float(request.args.get("seconds", 5))
+        interval = float(request.args.get("interval", 0.005))
+        if not 0 < seconds <= profile_max_seconds or not 0.0005 <= interval <= 1:
+            raise ValueError("seconds must be 0-60 and interval 0.0005-1")
+        samples, stacks = sample_profile(seconds, interval)
+    except (ValueError, RuntimeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return Response(stacks, mimetype="text/plain", headers={"X-Profile-Samples": str(samples)})
+
+
+# Fleet summary (vehicle count, mean SoC, chargers running, ...)
+@app.route("/vehicles", methods=["GET"])
+def fleet_info():
+    body = cached_json(fleet_body, fleet_summary, dumps=app.json.dumps)
+    return Response(body, mimetype="application/json"), 200
+
+
+# Info for one vehicle of the fleet
+@app.route("/vehicles/<int:vid>", methods=["GET"])
+def vehicle_station_info(vid):
+    if not valid_vehicle(vid):
+        return jsonify({"error": "Unknown vehicle"}), 404
+
+    info = read_state(lambda s: vehicle_info(s, vid))
+    return jsonify(info), 200
+
+
+# Longest /simulate horizon (days); a year takes a few tens of milliseconds
+simulate_max_days = fast_forward.max_days
+
+
+# Headless fast-forward run – does not touch the live simulation
+@app.route("/simulate", methods=["POST"])
+def simulate():
+    """
+    POST {"mode": "price", "start_percent": 20, "days": 7}
+    -> final SoC, energy charged and cost for the whole horizon
+
+    Runs in the request thread, so the horizon is capped at
+    simulate_max_days (400 above it).
+    """
+    data = json_object()
+    if data is None:
+        return not_an_object()
+
+    try:
+        mode = data.get("mode", "price")
+        start_percent = float(data.get("start_percent", ev_batt_start_percent))
+        days = float(data.get("days", 1))
+        if not 0 < days <= simulate_max_days:
+            raise ValueError(f"days must be between 0 and {simulate_max_days}")
+        # Same price/load data and fuse as the live simulation
+        result = fast_forward.simulate(
+            mode=mode, start_percent=start_percent, days=days, data=data,
+            fuse=load_manager.fuse if load_manager is not None else None,
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(result), 200
+
+
+def create_app(role=None, virtual_clock=None, start=True):
+    """
+    App factory: set up this process for its role and return the Flask app.
+    - standalone: start the background simulation thread
+    - owner:      map shared memory, start the thread and the command server
+    - worker:     map shared memory and connect to the owner for commands
+    - asgi:       like standalone, but asgi_app.py runs the simulation
+    `virtual_clock` replaces the EV_CLOCK_* clock (tests: a VirtualClock
+    with a fake time source). With start=False nothing is started or
+    restored (see start_simulation): the caller drives the simulation
+    with advance(). Safe to call more than once.
+    """
+    global sim_role, shared, command_client, fleet, clock, app_created
+    global telemetry, checkpoint_file
+
+    with setup_lock:
+        if app_created:
+            return app
+        app_created = True
+
+        sim_role = role or sim_role
+        if virtual_clock is not None:
+            clock = virtual_clock
+
+        if sim_role in ("owner", "worker"):
+            shm_name = os.environ["EV_SIM_SHM"]
+            address = os.environ["EV_SIM_OWNER_ADDR"]
+            authkey = os.environ["EV_SIM_AUTHKEY"].encode()
+
+            if sim_role == "worker":
+                shared = SharedState.attach(shm_name)
+                fleet = shared.fleet
+                command_client = CommandClient(address, authkey)
+                threading.Thread(target=stream_pump, daemon=True).start()
+                return app
+
+            shared = SharedState.create(fleet_size, name=shm_name)
+            fleet = shared.fleet
+            serve_commands(address, authkey, apply_command)
+
+        checkpoint_file = os.environ.get("EV_CHECKPOINT_FILE", checkpoint_path)
+
+        # Append-only per-tick history (EV_TELEMETRY_DIR="" disables it)
+        directory = os.environ.get("EV_TELEMETRY_DIR", telemetry_dir)
+        if directory:
+            telemetry = TelemetryStore(directory, step_seconds=3600 // seconds_per_hour)
+
+        if start:
+            start_simulation()
+    return app
+
+
+def start_simulation():
+    """
+    Restore the checkpoint, then start the log writer, the checkpointer and
+    (except in asgi role, where asgi_app.py runs it) the simulation thread.
+    """
+    global increment_sum_thread, log_writer, checkpointer
+
+    if log_writer is not None:
+        return
+
+    # Continue from the last checkpoint (before the log writer takes its cursor)
+    restored = restore_at_startup() if checkpoint_file else None
+
+    # Console / file output of the log ring, off the simulation thread
+    log_writer = LogWriter(simulation_log, path=os.environ.get("EV_LOG_FILE", log_path))
+    log_writer.start()
+
+    if restored is not None and "error" in restored:
+        add_log(f"Checkpoint not restored: {restored['error']}")
+    elif restored is not None:
+        add_log(
+            f"Restored checkpoint: day {restored['sim_day']} "
+            f"{restored['sim_time_hour']:02d}:{restored['sim_time_min']:02d}, "
+            f"{restored['vehicles']} vehicle(s) in {restored['elapsed_ms']} ms"
+        )
+    if checkpoint_file:
+        checkpointer = Checkpointer(
+            save_checkpoint, float(os.environ.get("EV_CHECKPOINT_INTERVAL", 60))
+        )
+        checkpointer.start()
+
+    # Start background simulation thread (asgi: an asyncio task instead)
+    if sim_role != "asgi":
+        increment_sum_thread = threading.Thread(target=main_prg, daemon=True)
+        increment_sum_thread.start()
+
+
+# Importing this module starts nothing. `gunicorn charging_simulation:app`
+# without the factory sets the process up on its first request.
+@app.before_request
+def start_on_first_request():
+    if not app_created:
+        create_app()
+
+
+def run_owner():
+    """Entry point of the owner process (see gunicorn.conf.py)."""
+    create_app("owner")
+
+    # Exit cleanly on SIGTERM so the shared segment is removed
+    # (the command socket is removed by the listener's finalizer)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        increment_sum_thread.join()
+    finally:
+        if checkpointer is not None:
+            checkpointer.stop()  # final checkpoint for the next start
+        log_writer.stop()
+        if telemetry is not None:
+            telemetry.flush()
+        shared.close(unlink=True)
+
 
 # Start Flask server
 if __name__ == "__main__":
-    import os
-
+    create_app()
     port = int(os.environ.get("PORT", 5000))
     # For DigitalOcean/App Platform this host/port is correct
     app.run(host="0.0.0.0", port=port)
\ No newline at end of file
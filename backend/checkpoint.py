@@ -0,0 +1,148 @@
+# checkpoint.py
+# Checkpoint/restore of the simulation state in one compact binary file.
+#
+# File layout:
+#   header (128 bytes)  magic, format version, fleet size, sim clock (day,
+#                       hour, minute), base load, log cursor, time written,
+#                       length of the JSON trailer
+#   fleet columns       fleet.COLUMNS back to back (the shared-memory layout)
+#   JSON trailer        small settings such as the strategy configuration
+#
+# save() writes a temporary file and renames it over the old checkpoint, so
+# a crash never leaves a half-written file behind. load() memory-maps the
+# fleet columns instead of reading them, so restoring a large fleet is one
+# copy per column into the live arrays.
+
+import os
+import json
+import time
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from fleet import Fleet, COLUMNS
+
+MAGIC = b"EVSIMCKP"
+FORMAT_VERSION = 2  # 2: load management columns (allocated, priority)
+
+HEADER_SIZE = 128
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", np.uint64),
+    ("size", np.uint64),             # number of vehicles
+    ("sim_day", np.int64),
+    ("sim_hour", np.int64),
+    ("sim_min", np.int64),
+    ("base_current_load", np.float64),
+    ("log_cursor", np.uint64),       # LogBuffer.head when written
+    ("created", np.float64),         # Unix time when written
+    ("meta_bytes", np.uint64),       # length of the JSON trailer
+])
+
+# Default file next to this module (EV_CHECKPOINT_FILE overrides, "" disables)
+checkpoint_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoint.bin")
+
+# State read back by load(); `fleet` is mapped read-only onto the file
+Checkpoint = namedtuple(
+    "Checkpoint",
+    "sim_day sim_hour sim_min base_current_load log_cursor created meta fleet",
+)
+
+
+def save(path, state, log_cursor=0, meta=None):
+    """
+    Write a SimView (`state`) plus `meta` (JSON serializable) to `path`.
+    Returns the file size in bytes.
+    """
+    trailer = json.dumps(meta or {}).encode()
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)[0]
+    header["magic"] = MAGIC
+    header["version"] = FORMAT_VERSION
+    header["size"] = state.fleet.size
+    header["sim_day"] = state.sim_day
+    header["sim_hour"] = state.sim_hour
+    header["sim_min"] = state.sim_min
+    header["base_current_load"] = state.base_current_load
+    header["log_cursor"] = log_cursor
+    header["created"] = time.time()
+    header["meta_bytes"] = len(trailer)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.tobytes().ljust(HEADER_SIZE, b"\0"))
+        for name, _ in COLUMNS:
+            f.write(np.ascontiguousarray(getattr(state.fleet, name)).data)
+        f.write(trailer)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return HEADER_SIZE + Fleet.nbytes(state.fleet.size) + len(trailer)
+
+
+def load(path):
+    """
+    Read a checkpoint (raises OSError if missing, ValueError if invalid).
+    The fleet columns stay memory-mapped until the Checkpoint is dropped.
+    """
+    file_size = os.path.getsize(path)
+    if file_size < HEADER_SIZE:
+        raise ValueError(f"{path}: not a checkpoint (too short)")
+
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+    header = np.frombuffer(mapped, dtype=HEADER_DTYPE, count=1)[0]
+    if bytes(header["magic"]) != MAGIC:
+        raise ValueError(f"{path}: not a checkpoint")
+    if int(header["version"]) != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported checkpoint version {int(header['version'])}")
+
+    size = int(header["size"])
+    columns_end = HEADER_SIZE + Fleet.nbytes(size)
+    if size < 1 or file_size != columns_end + int(header["meta_bytes"]):
+        raise ValueError(f"{path}: truncated or corrupt checkpoint")
+
+    fleet = Fleet.attach(size, mapped[HEADER_SIZE:columns_end])
+    meta = json.loads(bytes(mapped[columns_end:]).decode() or "{}")
+    return Checkpoint(
+        int(header["sim_day"]),
+        int(header["sim_hour"]),
+        int(header["sim_min"]),
+        float(header["base_current_load"]),
+        int(header["log_cursor"]),
+        float(header["created"]),
+        meta,
+        fleet,
+    )
+
+
+def copy_fleet(source, target):
+    """Copy every column of `source` into `target` (same size)."""
+    if source.size != target.size:
+        raise ValueError(
+            f"Checkpoint has {source.size} vehicle(s), the server runs {target.size}"
+        )
+    for name, _ in COLUMNS:
+        np.copyto(getattr(target, name), getattr(source, name))
+
+
+class Checkpointer(threading.Thread):
+    """
+    Background thread: calls save() every `interval` seconds, and once
+    more when stopped.
+    """
+
+    def __init__(self, save, interval=60.0):
+        super().__init__(daemon=True, name="checkpointer")
+        self.save = save
+        self.interval = interval
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            self.save()
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+        self.save()
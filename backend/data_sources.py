@@ -0,0 +1,303 @@
+# data_sources.py
+# Price and base-load time series for the simulation (multi-day, multi-zone).
+#
+# A data directory (EV_DATA_DIR) may contain:
+#   price.csv / price.npy    electricity price (öre/kWh)
+#   load.csv  / load.npy     household base load (kW)
+#
+# CSV: first column an ISO timestamp, one column per zone, e.g.
+#   timestamp,SE3,SE4
+#   2025-01-01T00:00,85.2,91.0
+#   2025-01-01T00:15,84.9,90.1
+# Rows must be evenly spaced, hourly (3600 s) or quarter-hourly (900 s).
+# A CSV is converted once to price.npy + price.json next to it (when the
+# directory is writable) and memory-mapped from then on.
+#
+# NPY: an array of shape (rows,) or (rows, zones) plus a sidecar JSON:
+#   {"start": "2025-01-01T00:00", "resolution": 900, "zones": ["SE3", "SE4"]}
+#
+# Without files, the built-in 24-hour profiles of sim_model are used
+# (zone "default"), repeating every day as before.
+#
+# Lookups by absolute timestamp are O(1): (t - start) // resolution, and
+# series shorter than the simulated horizon wrap around. The HTTP endpoints
+# only serve dates a series covers (the built-in profiles cover any date).
+
+import os
+import csv
+import json
+from datetime import datetime, date, timedelta, timezone
+
+import numpy as np
+
+from sim_model import energy_price, base_load_residential_kwh
+
+KINDS = ("price", "load")
+RESOLUTIONS = (3600, 900)
+DEFAULT_ZONE = "default"
+
+# First simulated day when nothing else is known
+default_start = "2025-01-01"
+
+seconds_per_day = 86400
+
+
+def parse_time(text):
+    """ISO date/time (no time zone = UTC) -> Unix seconds."""
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def parse_date(text):
+    """YYYY-MM-DD -> datetime.date (raises ValueError)."""
+    return date.fromisoformat(text)
+
+
+class TimeSeries:
+    """Evenly spaced values of one zone, indexed by Unix timestamp."""
+
+    def __init__(self, values, start, resolution, repeat=False):
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unsupported resolution {resolution} s (use 3600 or 900)")
+        if len(values) == 0:
+            raise ValueError("Empty series")
+        self.values = values            # 1-D, may be a memory-mapped view
+        self.start = int(start)
+        self.resolution = int(resolution)
+        self.repeat = repeat            # a profile valid at any time
+
+    def __len__(self):
+        return len(self.values)
+
+    def index(self, t):
+        return int((t - self.start) // self.resolution) % len(self.values)
+
+    def covers(self, start, end):
+        """True if the series has data for [start, end) without wrapping."""
+        if self.repeat:
+            return True
+        return self.start <= start and end <= self.start + len(self.values) * self.resolution
+
+    def at(self, t):
+        """Value in effect at Unix time t."""
+        return float(self.values[self.index(t)])
+
+    def take(self, times):
+        """at() for an array of Unix times (one NumPy gather)."""
+        index = (np.asarray(times, dtype=np.int64) - self.start) // self.resolution
+        return np.asarray(self.values[index % len(self.values)], dtype=np.float64)
+
+    def day(self, day_start, hourly=True):
+        """
+        Values of the day starting at `day_start`: 24 hourly values
+        (quarter-hours averaged) or the native resolution.
+        """
+        per_day = seconds_per_day // self.resolution
+        first = int((day_start - self.start) // self.resolution)
+        values = np.take(self.values, np.arange(first, first + per_day), mode="wrap")
+        if hourly and self.resolution != 3600:
+            values = values.reshape(24, -1).mean(axis=1)
+        return np.round(values.astype(np.float64), 2).tolist()
+
+
+def load_npy(path, meta_path):
+    """Memory-map an .npy file described by its sidecar JSON."""
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+
+    array = np.load(path, mmap_mode="r")
+    if array.ndim == 1:
+        array = array[:, None]
+    zones = meta.get("zones") or [DEFAULT_ZONE]
+    if len(zones) != array.shape[1]:
+        raise ValueError(f"{path}: {array.shape[1]} column(s) but {len(zones)} zone(s)")
+
+    start = parse_time(meta["start"])
+    resolution = int(meta["resolution"])
+    return {
+        zone: TimeSeries(array[:, i], start, resolution)
+        for i, zone in enumerate(zones)
+    }
+
+
+def read_csv(path):
+    """Parse a CSV series -> (start, resolution, zones, values[rows, zones])."""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = csv.reader(f)
+        header = next(rows)
+        zones = [z.strip() for z in header[1:]]
+        if not zones:
+            raise ValueError(f"{path}: no value columns")
+        if zones == ["value"]:
+            zones = [DEFAULT_ZONE]
+
+        stamps, values = [], []
+        for row in rows:
+            if not row:
+                continue
+            stamps.append(parse_time(row[0].strip()))
+            values.append([float(v) for v in row[1:]])
+
+    if len(stamps) < 2:
+        raise ValueError(f"{path}: need at least two rows")
+
+    steps = np.diff(np.asarray(stamps, dtype=np.int64))
+    resolution = int(steps[0])
+    if resolution not in RESOLUTIONS or np.any(steps != resolution):
+        raise ValueError(f"{path}: rows must be evenly spaced by 3600 or 900 seconds")
+
+    return stamps[0], resolution, zones, np.asarray(values, dtype=np.float64)
+
+
+def load_csv(path, stem):
+    """
+    Load a CSV series. Converts it to <stem>.npy + <stem>.json (if the
+    directory is writable) so later starts memory-map it instead.
+    """
+    start, resolution, zones, values = read_csv(path)
+    meta = {
+        "start": datetime.fromtimestamp(start, timezone.utc).strftime("%Y-%m-%dT%H:%M"),
+        "resolution": resolution,
+        "zones": zones,
+    }
+    try:
+        np.save(f"{stem}.npy", values)
+        with open(f"{stem}.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    except OSError:
+        return {
+            zone: TimeSeries(values[:, i], start, resolution)
+            for i, zone in enumerate(zones)
+        }
+    return load_npy(f"{stem}.npy", f"{stem}.json")
+
+
+def load_kind(directory, kind):
+    """Zones of one kind found in `directory` (empty dict if no file)."""
+    stem = os.path.join(directory, kind)
+    csv_path, npy_path, meta_path = f"{stem}.csv", f"{stem}.npy", f"{stem}.json"
+
+    have_npy = os.path.exists(npy_path) and os.path.exists(meta_path)
+    if os.path.exists(csv_path):
+        # Re-convert when the CSV is newer than its cached .npy
+        if not have_npy or os.path.getmtime(csv_path) > os.path.getmtime(npy_path):
+            return load_csv(csv_path, stem)
+    if have_npy:
+        return load_npy(npy_path, meta_path)
+    return {}
+
+
+class DataSources:
+    """
+    Price and load series per zone plus the simulated calendar:
+    simulated day 0 starts at `epoch` (Unix seconds, midnight).
+    """
+
+    def __init__(self, prices, loads, zone=None, epoch=None):
+        self.series = {"price": prices, "load": loads}
+        self.zone = zone or next(iter(prices))
+        for kind in KINDS:
+            if self.zone not in self.series[kind]:
+                raise ValueError(f"Zone {self.zone!r} has no {kind} data")
+        if epoch is None:
+            epoch = prices[self.zone].start
+        self.epoch = int(epoch) - int(epoch) % seconds_per_day
+
+    @classmethod
+    def builtin(cls, start=default_start):
+        """The original one-day profiles, repeated every day."""
+        return cls.profiles(energy_price, base_load_residential_kwh, start)
+
+    @classmethod
+    def profiles(cls, prices, base_loads, start=default_start):
+        """24 hourly prices and base loads, repeated every day."""
+        epoch = parse_time(start)
+        return cls(
+            {DEFAULT_ZONE: TimeSeries(np.asarray(prices, dtype=np.float64), epoch, 3600, repeat=True)},
+            {DEFAULT_ZONE: TimeSeries(np.asarray(base_loads, dtype=np.float64), epoch, 3600, repeat=True)},
+            epoch=epoch,
+        )
+
+    @classmethod
+    def from_directory(cls, directory, zone=None, start=None):
+        """
+        Series from a data directory; a missing kind falls back to the
+        built-in profile for every zone of the other kind.
+        """
+        builtin = cls.builtin(start or default_start)
+        prices = load_kind(directory, "price")
+        loads = load_kind(directory, "load")
+        if not prices and not loads:
+            raise ValueError(f"No price or load data in {directory}")
+
+        zones = list(prices or loads)
+        prices = prices or {z: builtin.series["price"][DEFAULT_ZONE] for z in zones}
+        loads = loads or {z: builtin.series["load"][DEFAULT_ZONE] for z in zones}
+        if len(loads) == 1 and len(prices) > 1:
+            # One household profile shared by every price zone
+            only = next(iter(loads.values()))
+            loads = {z: only for z in prices}
+
+        epoch = parse_time(start) if start else None
+        return cls(prices, loads, zone=zone, epoch=epoch)
+
+    @classmethod
+    def from_env(cls):
+        """EV_DATA_DIR / EV_ZONE / EV_SIM_START, or the built-in profiles."""
+        directory = os.environ.get("EV_DATA_DIR")
+        start = os.environ.get("EV_SIM_START")
+        if directory:
+            return cls.from_directory(directory, os.environ.get("EV_ZONE"), start)
+        return cls.builtin(start or default_start)
+
+    @property
+    def zones(self):
+        return sorted(self.series["price"])
+
+    def _series(self, kind, zone):
+        try:
+            return self.series[kind][zone or self.zone]
+        except KeyError:
+            raise ValueError(f"Unknown zone {zone!r}") from None
+
+    # ---- calendar ----
+    def timestamp(self, day, hour, minute=0):
+        """Unix time of a simulated (day, hour, minute)."""
+        return self.epoch + day * seconds_per_day + hour * 3600 + minute * 60
+
+    def date_of(self, day):
+        return (datetime.fromtimestamp(self.epoch, timezone.utc) + timedelta(days=day)).date()
+
+    def day_of(self, when):
+        """Simulated day index of a datetime.date."""
+        return (when - self.date_of(0)).days
+
+    # ---- O(1) lookups ----
+    def price(self, t, zone=None):
+        return self._series("price", zone).at(t)
+
+    def base_load(self, t, zone=None):
+        return self._series("load", zone).at(t)
+
+    def values_at(self, kind, times, zone=None):
+        """`kind` values at each Unix time of the array `times`."""
+        return self._series(kind, zone).take(times)
+
+    # ---- whole days ----
+    def day_values(self, kind, day, zone=None, hourly=True):
+        """Values for simulated day `day` (see TimeSeries.day)."""
+        return self._series(kind, zone).day(self.timestamp(day, 0), hourly)
+
+    def horizon_values(self, kind, day, zone=None):
+        """Hourly values of day `day` and the day after it (48 values)."""
+        return self.day_values(kind, day, zone) + self.day_values(kind, day + 1, zone)
+
+    def covers(self, kind, day, zone=None):
+        """True if the `kind` data has the whole of simulated day `day`."""
+        start = self.timestamp(day, 0)
+        return self._series(kind, zone).covers(start, start + seconds_per_day)
+
+    def resolution(self, kind, zone=None):
+        return self._series(kind, zone).resolution
@@ -1,8 +1,13 @@
+import os
 import sys
-import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
-from PyQt5.QtCore import Qt, QTimer
+import numpy as np
+import requests
+
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 from PyQt5.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -21,6 +26,153 @@ from PyQt5.QtGui import QFont
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
+from server_api import EVClient, BASE_URL
+from sim_model import max_power_residential_building
+
+# Simulation server (EV_SERVER_URL overrides)
+SERVER_URL = os.environ.get("EV_SERVER_URL", BASE_URL)
+
+# Seconds one long-poll /info request may wait for a change
+POLL_WAIT_S = 2
+
+# Live history: one sample per state change (about one per second), a week kept
+HISTORY_SECONDS = 7 * 24 * 3600
+FRAME_MS = 16  # ~60 fps chart refresh
+
+# Visible span of the live charts (label -> seconds)
+WINDOWS = {"10 min": 600, "1 h": 3600, "24 h": 86400, "7 days": HISTORY_SECONDS}
+
+MODES = {"Price": "price", "Load": "load", "Manual": "manual"}
+
+
+class ServerWorker(QThread):
+    """
+    Network I/O off the GUI thread.
+
+    run() long-polls /info and emits the merged state after every change,
+    plus the day's prices whenever the simulated date changes. Commands
+    (start/stop, strategy) run on a separate single-thread executor so a
+    click never waits for a pending long poll. Results arrive in the GUI
+    thread through the (queued) signals.
+    """
+
+    info_received = pyqtSignal(dict)
+    prices_received = pyqtSignal(list)
+    strategy_received = pyqtSignal(dict)
+    connection_changed = pyqtSignal(bool)
+
+    def __init__(self, base_url=SERVER_URL, parent=None):
+        super().__init__(parent)
+        self.client = EVClient(base_url)
+        self.commands = ThreadPoolExecutor(max_workers=1)
+        self.connected = None
+
+    def send(self, name, *args):
+        """Call EVClient.<name>(*args) in the background."""
+        self.commands.submit(self._command, name, args)
+
+    def _command(self, name, args):
+        try:
+            result = getattr(self.client, name)(*args)
+        except requests.RequestException:
+            self._set_connected(False)
+            return
+        if name == "set_strategy" and "error" not in result:
+            self.strategy_received.emit(result)
+
+    def _set_connected(self, connected):
+        if connected != self.connected:
+            self.connected = connected
+            self.connection_changed.emit(connected)
+
+    def run(self):
+        info = {}
+        date = None
+        while not self.isInterruptionRequested():
+            try:
+                if "version" in info:
+                    changes = self.client.get_info(info["version"], POLL_WAIT_S)
+                else:
+                    changes = self.client.get_info()
+                    strategy = self.client.get_strategy()
+                    if "mode" in strategy:
+                        self.strategy_received.emit(strategy)
+            except (requests.RequestException, ValueError):
+                changes = {"error": "unreachable"}
+
+            if "error" in changes:
+                self._set_connected(False)
+                info = {}
+                self.msleep(1000)  # retry
+                continue
+            self._set_connected(True)
+
+            if changes.get("version") == info.get("version"):
+                continue  # long poll timed out without a change
+            info = {**info, **changes}
+            self.info_received.emit(info)
+
+            if info.get("sim_date") != date:
+                try:
+                    prices = self.client.get_price_per_hour(date=info.get("sim_date"))
+                except (requests.RequestException, ValueError):
+                    continue  # fetched again with the next change
+                date = info.get("sim_date")
+                self.prices_received.emit(prices)
+
+    def stop(self):
+        self.requestInterruption()
+        self.wait((POLL_WAIT_S + self.client.timeout) * 1000)
+        self.commands.shutdown(wait=False)
+        self.client.close()
+
+
+class History:
+    """
+    Ring buffer of (time, SoC, load) samples.
+
+    Every sample is written twice, at i and i + capacity, so the last
+    `capacity` samples are always one contiguous slice: reading the
+    window is a view, never a copy or a concatenate.
+    """
+
+    def __init__(self, capacity=HISTORY_SECONDS):
+        self.capacity = capacity
+        self.data = np.zeros((3, 2 * capacity))
+        self.count = 0  # samples ever appended
+
+    def append(self, t, soc, load):
+        i = self.count % self.capacity
+        self.data[:, i] = self.data[:, i + self.capacity] = (t, soc, load)
+        self.count += 1
+
+    def view(self):
+        """(t, soc, load) of the stored samples, oldest first."""
+        n = min(self.count, self.capacity)
+        end = self.count % self.capacity + self.capacity
+        return self.data[:, end - n:end]
+
+
+def decimate(t, y, t_from, t_to, bins):
+    """
+    Min/max per time bin of the samples in [t_from, t_to): at most 2 points
+    per bin, so the drawn line is limited by the pixel width, not by the
+    history length. Bins are aligned to absolute time so a scrolling line
+    does not shimmer.
+    """
+    lo, hi = np.searchsorted(t, [t_from, t_to])
+    t, y = t[lo:hi], y[lo:hi]
+    if len(t) <= 2 * bins:
+        return t, y
+
+    width = (t_to - t_from) / bins
+    starts = np.r_[0, np.flatnonzero(np.diff(np.floor(t / width))) + 1]
+    points_t = np.repeat(t[starts], 2)
+    points_y = np.empty(2 * len(starts))
+    points_y[0::2] = np.minimum.reduceat(y, starts)
+    points_y[1::2] = np.maximum.reduceat(y, starts)
+    return points_t, points_y
+
 
 class PriceChartCanvas(FigureCanvas):
     """
@@ -40,35 +192,112 @@ class PriceChartCanvas(FigureCanvas):
         self.ax.set_xlabel("Hour")
         self.ax.set_ylabel("Price")
 
-        # Initial empty plot
+        # Initial empty plot; titles, grid and ticks are set up once
         self.hours = list(range(24))
         self.prices = [0] * 24
         (self.line,) = self.ax.plot(self.hours, self.prices, marker="o")
         self.ax.grid(True)
+        self.ax.set_xticks(self.hours)
 
     def update_prices(self, prices: List[float]):
         """
         Update the 24-hour price graph.
         prices must be a list of length 24.
         """
-        if not prices or len(prices) != 24:
+        if not prices or len(prices) != 24 or prices == self.prices:
             return
 
+        # Only the line data and the y range change
         self.prices = prices
-        self.ax.clear()
+        self.line.set_ydata(prices)
+        low, high = min(prices), max(prices)
+        margin = (high - low) * 0.1 or 1.0
+        self.ax.set_ylim(low - margin, high + margin)
+        self.draw_idle()
 
-        self.ax.set_title("Electricity price (24h)")
-        self.ax.set_xlabel("Hour")
-        self.ax.set_ylabel("Price")
 
-        # Plot line
-        self.ax.plot(self.hours, self.prices, marker="o")
-        self.ax.grid(True)
+class LiveChartCanvas(FigureCanvas):
+    """
+    Scrolling SoC and building-load charts of the live History.
 
-        # Make x-axis ticks 0–23
-        self.ax.set_xticks(self.hours)
+    The x axis is "hours before now", so axes, ticks and labels never move:
+    they are rendered once into a background that is restored every frame,
+    and only the two (animated) lines are redrawn and blitted. Lines are
+    decimated to the pixel width when new samples arrive; a frame only
+    shifts them by the time that passed.
+    """
 
-        self.draw()
+    def __init__(self, history, parent=None):
+        self.fig = Figure(figsize=(5, 3))
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.history = history
+        self.span = WINDOWS["10 min"]
+
+        self.ax_soc, self.ax_load = self.fig.subplots(2, 1, sharex=True)
+        self.ax_soc.set_ylabel("SoC (%)")
+        self.ax_soc.set_ylim(0, 100)
+        self.ax_load.set_ylabel("Load (kW)")
+        self.ax_load.set_xlabel("Hours ago")
+        self.ax_load.set_ylim(0, max_power_residential_building * 1.5)
+        self.ax_load.axhline(max_power_residential_building, color="#EF4444",
+                             linestyle="--", linewidth=1)
+        for ax in (self.ax_soc, self.ax_load):
+            ax.grid(True)
+        self.fig.tight_layout(pad=1.2)
+        self._set_span_limits()
+
+        (self.soc_line,) = self.ax_soc.plot([], [], animated=True)
+        (self.load_line,) = self.ax_load.plot([], [], animated=True, color="#10B981")
+
+        # Decimated points in absolute time (refreshed on new samples)
+        self._points = None
+        self._samples = -1
+        self._background = None
+        self.mpl_connect("draw_event", self._on_draw)
+
+    def set_span(self, seconds):
+        self.span = seconds
+        self._set_span_limits()
+        self._samples = -1
+        self.draw_idle()  # new ticks: full redraw, then blitting again
+
+    def _set_span_limits(self):
+        self.ax_load.set_xlim(-self.span / 3600, 0)
+
+    def _on_draw(self, event):
+        # Static parts were just rendered: keep them and draw the lines on top
+        self._background = self.copy_from_bbox(self.fig.bbox)
+        self._draw_lines()
+
+    def _refresh_points(self, now):
+        """Decimate the visible window (only when samples were added)."""
+        if self._samples == self.history.count:
+            return
+        self._samples = self.history.count
+        t, soc, load = self.history.view()
+        # Twice the span so the window can scroll until the next refresh
+        t_from, bins = now - 2 * self.span, max(self.width(), 100) * 2
+        self._points = (decimate(t, soc, t_from, now + 1, bins),
+                        decimate(t, load, t_from, now + 1, bins))
+
+    def _draw_lines(self):
+        if self._points is None:
+            return
+        now = time.time()
+        for line, ax, (t, y) in zip((self.soc_line, self.load_line),
+                                    (self.ax_soc, self.ax_load), self._points):
+            line.set_data((t - now) / 3600, y)
+            ax.draw_artist(line)
+
+    def frame(self):
+        """One animation frame: restore background, redraw lines, blit."""
+        if self._background is None:
+            return
+        self._refresh_points(time.time())
+        self.restore_region(self._background)
+        self._draw_lines()
+        self.blit(self.fig.bbox)
 
 
 class ChargingDashboard(QMainWindow):
@@ -80,7 +309,7 @@ class ChargingDashboard(QMainWindow):
     - Battery % progress bar (enhanced)
     """
 
-    def __init__(self):
+    def __init__(self, base_url=SERVER_URL):
         super().__init__()
         self.setWindowTitle("EV Charging Dashboard")
         self.setMinimumSize(1000, 600)
@@ -88,12 +317,24 @@ class ChargingDashboard(QMainWindow):
         self._current_mode = "Price"
         self._is_charging = False
         self._battery_percent = 40
+        self.history = History()
 
         self._build_ui()
         self._apply_styles()
 
-        # Demo timers (you will replace with real updates from your Flask API)
-        self._setup_demo_timers()
+        # Live data from the simulation server (background thread)
+        self.worker = ServerWorker(base_url, self)
+        self.worker.info_received.connect(self._on_info)
+        self.worker.prices_received.connect(self.update_price_chart)
+        self.worker.strategy_received.connect(self._on_strategy)
+        self.worker.connection_changed.connect(self._on_connection_changed)
+        self.worker.start()
+
+        # Chart animation: blit the live lines at ~60 fps
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
+        self.frame_timer.timeout.connect(self.live_chart.frame)
+        self.frame_timer.start(FRAME_MS)
 
     # ------------------------------------------------------------------
     # UI Construction
@@ -210,8 +451,35 @@ class ChargingDashboard(QMainWindow):
         )
         chart_layout.addWidget(self.price_chart)
 
+        # Bottom: Live SoC / load history with its visible span
+        live_group = QGroupBox("Live SoC and load")
+        live_layout = QVBoxLayout()
+        live_group.setLayout(live_layout)
+
+        span_row = QHBoxLayout()
+        self.connection_label = QLabel("Connecting...")
+        self.connection_label.setObjectName("connectionLabel")
+        self.span_selector = QComboBox()
+        self.span_selector.addItems(list(WINDOWS))
+        self.span_selector.currentTextChanged.connect(self._on_span_changed)
+        span_row.addWidget(self.connection_label)
+        span_row.addStretch()
+        span_row.addWidget(self.span_selector)
+
+        self.live_chart = LiveChartCanvas(self.history, self)
+        self.live_chart.setSizePolicy(
+            QSizePolicy.Expanding, QSizePolicy.Expanding
+        )
+        live_layout.addLayout(span_row)
+        live_layout.addWidget(self.live_chart)
+
+        charts_layout = QHBoxLayout()
+        charts_layout.setSpacing(16)
+        charts_layout.addWidget(chart_group, 1)
+        charts_layout.addWidget(live_group, 1)
+
         root_layout.addLayout(top_layout, 1)
-        root_layout.addWidget(chart_group, 2)
+        root_layout.addLayout(charts_layout, 2)
 
     # ------------------------------------------------------------------
     # Styling
@@ -252,7 +520,8 @@ class ChargingDashboard(QMainWindow):
 
             QLabel#statusTitle,
             QLabel#modeTitle,
-            QLabel#batteryLabel {
+            QLabel#batteryLabel,
+            QLabel#connectionLabel {
                 color: #9CA3AF;
             }
 
@@ -400,44 +669,46 @@ class ChargingDashboard(QMainWindow):
     # Handlers for UI controls
     # ------------------------------------------------------------------
     def _on_mode_changed(self, text: str):
-        # Local UI update; in your real app you can also notify the backend here.
-        self.set_mode(text)
+        # Server-side strategy; the badge follows the server's answer
+        self.worker.send("set_strategy", MODES[text])
 
     def _on_start_clicked(self):
-        # In your real app: call Flask /start_charge or similar, then update UI.
-        self.set_charging(True)
+        # The indicator follows the next /info change
+        self.worker.send("start_charging")
 
     def _on_stop_clicked(self):
-        # In your real app: call Flask /stop_charge or similar, then update UI.
-        self.set_charging(False)
+        self.worker.send("stop_charging")
+
+    def _on_span_changed(self, text: str):
+        self.live_chart.set_span(WINDOWS[text])
 
     # ------------------------------------------------------------------
-    # Demo timers – replace with your real server polling
+    # Server updates (GUI thread, from ServerWorker signals)
     # ------------------------------------------------------------------
-    def _setup_demo_timers(self):
-        """
-        Demo only:
-        - Randomize battery every 3 seconds
-        - Randomize 24h prices every 10 seconds
-        Replace this with actual polling of your Flask server.
-        """
-        self.demo_battery_timer = QTimer(self)
-        self.demo_battery_timer.timeout.connect(self._demo_update_battery)
-        self.demo_battery_timer.start(3000)
-
-        self.demo_price_timer = QTimer(self)
-        self.demo_price_timer.timeout.connect(self._demo_update_prices)
-        self.demo_price_timer.start(10000)
-
-    def _demo_update_battery(self):
-        # Simple smooth up/down demo
-        delta = random.choice([-2, -1, 1, 2])
-        self.set_battery_percent(self._battery_percent + delta)
-
-    def _demo_update_prices(self):
-        # Generate 24 random values as demo prices
-        prices = [round(random.uniform(0.5, 3.0), 2) for _ in range(24)]
-        self.update_price_chart(prices)
+    def _on_info(self, info: dict):
+        self.set_charging(bool(info.get("ev_battery_charge_start_stopp")))
+        percent = float(info.get("battery_percent", 0))
+        self.set_battery_percent(int(round(percent)))
+        self.history.append(time.time(), percent, float(info.get("base_current_load", 0)))
+
+    def _on_strategy(self, info: dict):
+        # Schedule mode has no button; shown as Price (charges by price)
+        mode = {"load": "Load", "manual": "Manual"}.get(info.get("mode"), "Price")
+        self.set_mode(mode)
+        self.mode_selector.blockSignals(True)
+        self.mode_selector.setCurrentText(mode)
+        self.mode_selector.blockSignals(False)
+
+    def _on_connection_changed(self, connected: bool):
+        self.connection_label.setText(
+            "Live" if connected
+            else f"Server unreachable ({self.worker.client.base_url}), retrying..."
+        )
+
+    def closeEvent(self, event):
+        self.frame_timer.stop()
+        self.worker.stop()
+        super().closeEvent(event)
 
 
 def main():
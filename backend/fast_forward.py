@@ -0,0 +1,268 @@
+# fast_forward.py
+# Headless fast-forward simulation engine + offline batch runner.
+#
+# Runs the same battery model (battery_model.py), price and base-load data
+# (data_sources.py, one day after the other) and building fuse as
+# charging_simulation.main_prg, but without sleeping between steps, so
+# whole days and weeks are evaluated in milliseconds. One vehicle does not
+# need the fleet arrays: charging steps use the model's plain-float path
+# (BatteryModel.charge) and the rest of an hour in which the charger stays
+# off is cooled in one closed-form update.
+#
+# Like the server's load manager with one charger, the charging power is
+# capped by the fuse headroom (fuse - base load) of each step.
+#
+# Usage:
+#   python fast_forward.py --mode price --start 20 --days 7
+
+import os
+import csv
+import time
+import argparse
+
+import numpy as np
+
+from sim_model import (
+    energy_price,
+    base_load_residential_kwh,
+    ev_batt_max_capacity,
+    ev_batt_start_percent,
+    charging_power,
+    max_power_residential_building,
+    seconds_per_hour,
+    ambient_temperature,
+    building_load,
+    step_minute,
+)
+from battery_model import default_model
+from data_sources import DataSources
+from strategy import StrategyController
+
+# Charging modes:
+# "price"  -> charge during the N cheapest hours of the day
+# "load"   -> charge whenever the base load leaves room under the fuse
+# "manual" -> charge continuously until the battery is full
+MODES = ("price", "load", "manual")
+
+# Number of cheap hours used by the price mode
+cheap_hours = 8
+
+# Longest horizon accepted by /simulate and the CLI (days)
+max_days = 366
+
+# Default CSV output for the batch runner
+battery_log_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "battery_log.csv")
+
+csv_header = [
+    "Day", "Hour", "Minute", "Base Load (kW)", "Price (öre)",
+    "Battery (%)", "Charging",
+]
+
+
+def charging_plan(mode, hours=cheap_hours, prices=energy_price,
+                  base_loads=base_load_residential_kwh):
+    """Return a list of 24 booleans: may the charger run in this hour?"""
+    if mode == "manual":
+        return [True] * 24
+
+    # Same decisions as the server-side strategy controller
+    controller = StrategyController(
+        mode=mode, cheap_hours=hours, prices=prices, base_loads=base_loads
+    )
+    return [controller.wants_charging(h) for h in range(24)]
+
+
+def step_offsets(steps_per_hour):
+    """Seconds from midnight to the start of every step of a day, (24, steps)."""
+    minutes = [step_minute(i, steps_per_hour) * 60 for i in range(steps_per_hour)]
+    return np.arange(24)[:, None] * 3600 + np.asarray(minutes)
+
+
+def step_values(data, kind, day, offsets):
+    """`kind` values at the start of every step of simulated `day`, per hour."""
+    return data.values_at(kind, data.timestamp(day, 0) + offsets).tolist()
+
+
+def simulate(mode="price", start_percent=ev_batt_start_percent, days=1,
+             steps_per_hour=seconds_per_hour, power=charging_power,
+             capacity=ev_batt_max_capacity, prices=None, base_loads=None,
+             data=None, first_day=0, fuse=max_power_residential_building,
+             hours=cheap_hours, writer=None, model=None):
+    """
+    Run the simulation for `days` without sleeping.
+
+    Prices and base loads come from `data` (a DataSources, default:
+    EV_DATA_DIR or the built-in profiles), from simulated day `first_day`
+    on. `prices` / `base_loads` (24 hourly values, repeated every day)
+    replace them. `fuse` (kW) caps the charging power at the headroom
+    left by the base load, None turns that off. `capacity` defaults to
+    the Citroën e-Berlingo M. `hours`: cheap hours per day in price mode.
+    If `writer` is given (a csv.writer), one row per step is written to it.
+    `model` is a battery_model.BatteryModel (default: the live one).
+    Returns a summary dict with final SoC, energy charged and cost.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Invalid mode: {mode}")
+    if not 0 <= start_percent <= 100:
+        raise ValueError("start_percent must be between 0 and 100")
+    if not 0 < days <= max_days:
+        raise ValueError(f"days must be between 0 and {max_days}")
+
+    if not power > 0 or not capacity > 0:
+        raise ValueError("power and capacity must be positive")
+
+    if prices is not None or base_loads is not None:
+        data = DataSources.profiles(
+            energy_price if prices is None else prices,
+            base_load_residential_kwh if base_loads is None else base_loads,
+        )
+    elif data is None:
+        data = DataSources.from_env()
+    total_hours = int(round(days * 24))
+    offsets = step_offsets(steps_per_hour)
+
+    model = model or default_model
+    dt = 3600 / steps_per_hour
+    kwh = capacity * (start_percent / 100)
+    temp = float(ambient_temperature)
+    percent = float(start_percent)
+    charging = False
+    cooling_down = False
+
+    energy_charged = 0.0   # kWh
+    cost = 0.0             # öre
+    charging_steps = 0
+    peak_load = 0.0
+    time_to_full = 0.0 if percent >= 100.0 else None   # hours
+    events = []
+
+    started = time.perf_counter()
+
+    for abs_hour in range(total_hours):
+        hour = abs_hour % 24
+        if hour == 0:
+            # A new day: its prices, loads and (same as the server's
+            # strategy) charging plan
+            day = first_day + abs_hour // 24
+            plan = charging_plan(
+                mode, hours, prices=data.day_values("price", day),
+                base_loads=data.day_values("load", day),
+            )
+            day_prices = step_values(data, "price", day, offsets)
+            day_loads = step_values(data, "load", day, offsets)
+        wanted = plan[hour]
+        prices_now = day_prices[hour]
+        loads_now = day_loads[hour]
+
+        for i in range(steps_per_hour):
+            if not wanted or percent >= 100.0:
+                # The charger stays off for the rest of the hour
+                rest = range(i, steps_per_hour)
+                temp = model.cool(temp, dt * len(rest))
+                charging = False
+                peak_load = max(peak_load, building_load(max(loads_now[i:]), False))
+                if writer is not None:
+                    writer.writerows(
+                        [abs_hour // 24, hour, step_minute(j, steps_per_hour),
+                         building_load(loads_now[j], False), prices_now[j], percent, False]
+                        for j in rest
+                    )
+                break
+
+            price = prices_now[i]
+            base_load = loads_now[i]
+            rate = power if fuse is None else min(power, max(0.0, fuse - base_load))
+
+            # Same decision the clients make: charge in allowed hours until
+            # full; after an overtemperature stop, wait for the pack to cool
+            if cooling_down and temp <= model.resume_temperature:
+                cooling_down = False
+            charging = not cooling_down
+            was_charging = charging
+
+            event = None
+            if charging:
+                before = kwh
+                kwh, temp, event = model.charge(kwh, temp, capacity, rate, dt)
+                # Same rounding as np.round(..., 2) in BatteryModel.step
+                percent = round(kwh / capacity * 100 * 100) / 100
+                charging = event is None
+                added = kwh - before
+                if added > 0:
+                    energy_charged += added
+                    cost += added * price
+                    charging_steps += 1
+            else:
+                temp = model.cool(temp, dt)
+
+            cooling_down = cooling_down or event == "overtemp"
+            if event is not None:
+                events.append({"hour": abs_hour, "minute": step_minute(i, steps_per_hour), "event": event})
+                if event == "full" and time_to_full is None:
+                    time_to_full = abs_hour + (i + 1) / steps_per_hour
+
+            if fuse is None:
+                load = building_load(base_load, charging, power)
+            else:
+                # The load manager's share for this step, like the server
+                load = round(base_load + (rate if was_charging else 0.0), 2)
+            if load > peak_load:
+                peak_load = load
+
+            if writer is not None:
+                writer.writerow([
+                    abs_hour // 24, hour, step_minute(i, steps_per_hour),
+                    load, price, percent, charging,
+                ])
+
+    elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "days": days,
+        "start_percent": start_percent,
+        "final_percent": percent,
+        "final_kWh": round(kwh, 2),
+        "final_temperature_C": round(temp, 2),
+        "energy_charged_kWh": round(energy_charged, 2),
+        "cost_ore": round(cost, 2),
+        "charging_hours": round(charging_steps / steps_per_hour, 2),
+        "peak_load_kW": peak_load,
+        "time_to_full_h": time_to_full,
+        "events": events,
+        "steps": total_hours * steps_per_hour,
+        "elapsed_s": round(elapsed, 4),
+    }
+
+
+def run_to_csv(path=battery_log_path, **kwargs):
+    """Run simulate() and stream every step into a CSV file."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_header)
+        return simulate(writer=writer, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fast-forward EV charging simulation")
+    parser.add_argument("--mode", choices=MODES, default="price")
+    parser.add_argument("--start", type=float, default=ev_batt_start_percent,
+                        help="start SoC in percent")
+    parser.add_argument("--days", type=float, default=1, help="horizon in days")
+    parser.add_argument("--log", default=battery_log_path,
+                        help="CSV file for per-step rows")
+    args = parser.parse_args()
+
+    result = run_to_csv(args.log, mode=args.mode, start_percent=args.start, days=args.days)
+
+    print(f"Mode:            {result['mode'].upper()}")
+    print(f"Horizon:         {result['days']} day(s), {result['steps']} steps")
+    print(f"Final SoC:       {result['final_percent']:.2f} %")
+    print(f"Energy charged:  {result['energy_charged_kWh']:.2f} kWh")
+    print(f"Cost:            {result['cost_ore']:.2f} öre")
+    print(f"Run time:        {result['elapsed_s'] * 1000:.1f} ms")
+    print(f"Rows written to: {args.log}")
+
+
+if __name__ == "__main__":
+    main()
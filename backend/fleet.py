@@ -0,0 +1,186 @@
+# fleet.py
+# Vectorized fleet model: per-vehicle state as NumPy struct-of-arrays.
+#
+# Every vehicle column (capacity, SoC, temperature, charger power, charging
+# flag, override) is one NumPy array, and tick() advances the whole fleet
+# with the battery model (battery_model.py), without a Python loop.
+
+import numpy as np
+
+from sim_model import (
+    ev_batt_max_capacity,
+    ev_batt_start_percent,
+    charging_power,
+    seconds_per_hour,
+    ambient_temperature,
+)
+import battery_model
+
+# Override codes stored in Fleet.override (index = code)
+OVERRIDE_MODES = ("auto", "force_on", "force_off")
+OVERRIDE_AUTO, OVERRIDE_FORCE_ON, OVERRIDE_FORCE_OFF = range(3)
+
+# Column layout (8-byte columns first so every column stays aligned when
+# the fleet is mapped onto one shared buffer)
+COLUMNS = (
+    ("capacity", np.float64),
+    ("power", np.float64),
+    ("limit", np.float64),
+    ("kwh", np.float64),
+    ("percent", np.float64),
+    ("temp", np.float64),
+    ("allocated", np.float64),
+    ("charging", np.bool_),
+    ("override", np.int8),
+    ("priority", np.int8),
+)
+
+
+class Fleet:
+    """
+    State for `size` vehicles, one NumPy array per column:
+    - capacity  usable battery capacity (kWh)
+    - kwh       stored energy (kWh)
+    - percent   state of charge (%)
+    - temp      battery temperature (°C)
+    - power     charger power (kW)
+    - limit     power cap set by the scheduler (kW, inf = no cap)
+    - allocated power cap set by load management (kW, inf = no cap)
+    - charging  charging flag
+    - override  override code (see OVERRIDE_MODES)
+    - priority  load management priority (0 = lowest)
+
+    With `buffer` the columns are mapped onto that memory (for example a
+    shared-memory segment) instead of private arrays.
+    """
+
+    def __init__(self, size=1, capacity=ev_batt_max_capacity,
+                 start_percent=ev_batt_start_percent, power=charging_power,
+                 buffer=None):
+        if size < 1:
+            raise ValueError("Fleet needs at least one vehicle")
+
+        self._map_columns(size, buffer)
+        self.capacity.fill(capacity)
+        self.power.fill(power)
+        self.reset(start_percent)
+
+    @classmethod
+    def attach(cls, size, buffer):
+        """Map an already initialized fleet stored in `buffer`."""
+        fleet = cls.__new__(cls)
+        fleet._map_columns(size, buffer)
+        return fleet
+
+    @staticmethod
+    def nbytes(size):
+        """Bytes needed to store `size` vehicles in one buffer."""
+        return sum(np.dtype(dtype).itemsize * size for _, dtype in COLUMNS)
+
+    def _map_columns(self, size, buffer):
+        self.size = size
+        offset = 0
+        for name, dtype in COLUMNS:
+            if buffer is None:
+                column = np.zeros(size, dtype=dtype)
+            else:
+                column = np.ndarray(size, dtype=dtype, buffer=buffer, offset=offset)
+                offset += column.nbytes
+            setattr(self, name, column)
+
+    def snapshot(self, previous=None, changed=None):
+        """
+        Read-only copy of the columns (an immutable view for readers).
+
+        With `previous`, an earlier snapshot of this fleet, only the columns
+        named in `changed` are copied; the others are shared with it (copy
+        on write per column). changed=None copies every column.
+        """
+        frozen = Fleet.__new__(Fleet)
+        frozen.size = self.size
+        for name, _ in COLUMNS:
+            if previous is not None and changed is not None and name not in changed:
+                column = getattr(previous, name)
+            else:
+                column = getattr(self, name).copy()
+                column.flags.writeable = False
+            setattr(frozen, name, column)
+        return frozen
+
+    def reset(self, start_percent=ev_batt_start_percent):
+        """Reset every vehicle to `start_percent`, not charging, AUTO mode."""
+        self.percent.fill(start_percent)
+        np.multiply(self.capacity, start_percent / 100, out=self.kwh)
+        self.charging.fill(False)
+        self.override.fill(OVERRIDE_AUTO)
+        self.limit.fill(np.inf)
+        self.allocated.fill(np.inf)
+        self.priority.fill(0)
+        self.temp.fill(ambient_temperature)
+
+    def rate(self):
+        """Power each vehicle draws while charging (kW): charger power, capped."""
+        return np.minimum(np.minimum(self.power, self.limit), self.allocated)
+
+    def vehicle_rate(self, vid):
+        return float(min(self.power[vid], self.limit[vid], self.allocated[vid]))
+
+    def temperature(self):
+        """Battery temperature (°C) of each vehicle."""
+        return self.temp
+
+    def tick(self, steps_per_hour=seconds_per_hour, model=None):
+        """
+        Advance all vehicles by one simulation step (3600 / steps_per_hour
+        simulated seconds).
+
+        Returns (overtemp, full): boolean masks of the vehicles that were
+        stopped for overtemperature or because they reached 100%.
+        """
+        model = model or battery_model.default_model
+        return model.step(self, 3600 / steps_per_hour)
+
+    def set_charging(self, vid, on):
+        self.charging[vid] = bool(on)
+
+    def set_override(self, vid, mode):
+        """Set override for one vehicle and apply its immediate effect."""
+        code = OVERRIDE_MODES.index(mode)
+        self.override[vid] = code
+        if code == OVERRIDE_FORCE_ON:
+            self.charging[vid] = True
+        elif code == OVERRIDE_FORCE_OFF:
+            self.charging[vid] = False
+
+    def override_mode(self, vid):
+        return OVERRIDE_MODES[self.override[vid]]
+
+    def vehicle(self, vid):
+        """Plain-Python view of one vehicle (JSON serializable)."""
+        return {
+            "id": int(vid),
+            "battery_capacity_kWh": round(float(self.kwh[vid]), 2),
+            "battery_max_capacity_kWh": float(self.capacity[vid]),
+            "battery_percent": float(self.percent[vid]),
+            "charging_power_kW": self.vehicle_rate(vid),
+            "allocated_power_kW": (
+                round(self.vehicle_rate(vid), 2) if self.charging[vid] else 0.0
+            ),
+            "priority": int(self.priority[vid]),
+            "battery_temperature_C": round(float(self.temp[vid]), 2),
+            "ev_battery_charge_start_stopp": bool(self.charging[vid]),
+            "user_override": self.override_mode(vid),
+        }
+
+    def summary(self):
+        """Aggregate view of the whole fleet."""
+        charging = int(np.count_nonzero(self.charging))
+        return {
+            "vehicles": self.size,
+            "charging": charging,
+            "full": int(np.count_nonzero(self.percent >= 100.0)),
+            "mean_percent": round(float(self.percent.mean()), 2),
+            "min_percent": float(self.percent.min()),
+            "energy_kWh": round(float(self.kwh.sum()), 2),
+            "charging_power_kW": round(float(self.rate()[self.charging].sum()), 2),
+        }
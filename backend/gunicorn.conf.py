@@ -0,0 +1,48 @@
+# gunicorn.conf.py
+# Multi-worker setup: exactly one owner process runs the simulation,
+# every HTTP worker reads its state from shared memory.
+#
+# Usage (see Procfile):
+#   gunicorn -c gunicorn.conf.py "charging_simulation:create_app()"
+
+import os
+import sys
+import secrets
+import subprocess
+
+from shared_state import default_address
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+
+# Threaded workers: /stream and /ws keep one connection open per client
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 64))
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def on_starting(server):
+    """Start the owner process before any worker is forked."""
+    os.environ["EV_SIM_SHM"] = f"ev-sim-{secrets.token_hex(6)}"
+    os.environ["EV_SIM_OWNER_ADDR"] = default_address()
+    os.environ["EV_SIM_AUTHKEY"] = secrets.token_hex(16)
+
+    # The owner creates the shared segment and runs main_prg
+    server.ev_sim_owner = subprocess.Popen(
+        [sys.executable, "-c", "import charging_simulation as cs; cs.run_owner()"],
+        env=dict(os.environ, EV_SIM_ROLE="owner"),
+        cwd=backend_dir,
+    )
+
+    # Workers forked from now on only read the shared state
+    os.environ["EV_SIM_ROLE"] = "worker"
+
+
+def on_exit(server):
+    owner = server.ev_sim_owner
+    owner.terminate()
+    try:
+        owner.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        owner.kill()
@@ -0,0 +1,166 @@
+# instrumentation.py
+# Low-overhead timing of the hot paths, rendered with /metrics:
+#   ev_tick_seconds                  duration of one main_prg step
+#   ev_lock_wait_seconds{site}       time until global_lock (and, for
+#                                    commands, the writer thread) was ours
+#   ev_lock_hold_seconds{site}       time global_lock was held
+#   ev_request_seconds{endpoint}     HTTP request latency per endpoint
+#   ev_clock_drift_seconds           how late the last simulation step
+#                                    started (see sim_clock.py)
+#
+# Histograms have fixed buckets, so observe() is a bisect and two adds and
+# memory does not grow. With EV_INSTRUMENT=0 nothing is timed: callers
+# check Instrumentation.enabled before reading the clock.
+#
+# sample_profile() is an opt-in sampling profiler (EV_PROFILER=1): it reads
+# the stack of every thread at a fixed interval for N seconds and returns
+# the counts as folded stacks ("thread;outer;inner count"), the input
+# format of flamegraph.pl and speedscope.
+
+import os
+import sys
+import time
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+# Upper bounds (seconds) of the histogram buckets; +Inf is implicit
+BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+profile_max_seconds = 60.0
+
+
+class Histogram:
+    """Counts per bucket plus sum, safe to observe from many threads."""
+
+    __slots__ = ("counts", "sum", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class HistogramFamily:
+    """Histograms of one metric, one per value of an (optional) label."""
+
+    def __init__(self, name, text, label=None):
+        self.name = name
+        self.text = text
+        self.label = label
+        self._histograms = {}
+
+    def observe(self, seconds, value=None):
+        histogram = self._histograms.get(value)
+        if histogram is None:
+            histogram = self._histograms.setdefault(value, Histogram())
+        histogram.observe(seconds)
+
+    def render(self, lines):
+        """Append the Prometheus text lines of every histogram to `lines`."""
+        lines.append(f"# HELP {self.name} {self.text}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for value, histogram in sorted(self._histograms.items(), key=lambda i: str(i[0])):
+            counts, total = histogram.snapshot()
+            label = "" if self.label is None else f'{self.label}="{value}",'
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label}le="{bound}"}} {cumulative}')
+            tail = f"{{{label[:-1]}}}" if label else ""
+            lines.append(f"{self.name}_sum{tail} {total:.10g}")
+            lines.append(f"{self.name}_count{tail} {cumulative}")
+
+
+class Instrumentation:
+    """The server's histograms; timing is skipped when not `enabled`."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.tick = HistogramFamily("ev_tick_seconds", "Duration of one simulation step")
+        self.lock_wait = HistogramFamily(
+            "ev_lock_wait_seconds", "Wait for the state lock by call site", "site"
+        )
+        self.lock_hold = HistogramFamily(
+            "ev_lock_hold_seconds", "State lock hold time by call site", "site"
+        )
+        self.requests = HistogramFamily(
+            "ev_request_seconds", "HTTP request latency by endpoint", "endpoint"
+        )
+        self.drift = 0.0  # seconds the last step started behind schedule
+
+    def render_simulation(self):
+        """Tick, lock and clock metrics (the process running the simulation)."""
+        if not self.enabled:
+            return ""
+        lines = []
+        for family in (self.tick, self.lock_wait, self.lock_hold):
+            family.render(lines)
+        lines.append("# HELP ev_clock_drift_seconds Simulated clock lag behind wall time")
+        lines.append("# TYPE ev_clock_drift_seconds gauge")
+        lines.append(f"ev_clock_drift_seconds {self.drift:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def render_requests(self):
+        """Request latency metrics (the process serving HTTP)."""
+        if not self.enabled:
+            return ""
+        lines = []
+        self.requests.render(lines)
+        return "\n".join(lines) + "\n"
+
+
+# ---- sampling profiler ----
+_profiling = threading.Lock()
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_profile(seconds, interval=0.005):
+    """
+    Sample the stacks of all other threads every `interval` seconds for
+    `seconds`. Returns (samples taken, folded stacks most frequent first);
+    raises RuntimeError if a profile is already running.
+    """
+    if not _profiling.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+    try:
+        own = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        deadline = time.monotonic() + min(seconds, profile_max_seconds)
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                stacks[";".join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(interval)
+    finally:
+        _profiling.release()
+
+    lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+    return samples, "\n".join(lines) + "\n"
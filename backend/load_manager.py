@@ -0,0 +1,200 @@
+# load_manager.py
+# Dynamic load management: N chargers behind one building fuse.
+#
+# Every tick the headroom (fuse - building base load) is shared among the
+# chargers that are charging:
+#   "fair"     -> equal share (water-filling): chargers that need less than
+#                 the share get what they need, the rest is split evenly
+#   "priority" -> higher priority classes are served first (0..9, fair
+#                 share within a class); lower classes get what is left
+#
+# The allocator never rescans the chargers to compute the split. It keeps
+# the number of charging chargers per (priority, demand) group, updated in
+# O(1) when one charger starts, stops or changes priority or demand, and
+# derives one power cap per priority class from those groups. A cap is
+# written to Fleet.allocated only when it changes.
+#
+# The code that changes a charger reports it (charger_changed for a
+# command, chargers_changed for the strategy and the battery model's
+# stops), so a tick does not compare the fleet with the groups. Only a
+# bulk change (reset, restore) re-reads every charger (reload).
+
+import math
+from collections import defaultdict
+
+import numpy as np
+
+from sim_model import max_power_residential_building
+
+LOAD_MODES = ("fair", "priority")
+PRIORITIES = range(10)  # 0 = lowest
+
+
+class LoadManager:
+    """Allocates the fuse headroom to fleet vehicles 0..chargers-1."""
+
+    def __init__(self, chargers, fuse=max_power_residential_building, mode="fair"):
+        if chargers < 1:
+            raise ValueError("LoadManager needs at least one charger")
+        self.chargers = chargers
+        self.fuse = float(fuse)
+        self.mode = "fair"
+        self.configure(mode=mode)
+
+        # Last known state of every charger
+        self.active = np.zeros(chargers, dtype=bool)
+        self.demand = np.zeros(chargers)                 # kW
+        self.priority = np.zeros(chargers, dtype=np.int8)
+
+        # (priority, demand) -> number of charging chargers
+        self._groups = defaultdict(int)
+        self.base_load = 0.0
+        self.headroom = None
+        self.caps = None      # power cap per priority (kW), None = recompute
+        self.allocated = 0.0  # total allocated power (kW)
+
+    def configure(self, mode=None, fuse=None):
+        """Change mode and/or fuse size (raises ValueError if invalid)."""
+        if mode is not None and mode not in LOAD_MODES:
+            raise ValueError("Invalid load management mode")
+        if fuse is not None:
+            fuse = float(fuse)
+            if not (math.isfinite(fuse) and fuse > 0):
+                raise ValueError("fuse_kW must be a finite number > 0")
+            self.fuse = fuse
+        if mode is not None:
+            self.mode = mode
+        self.caps = None
+
+    # ---- incremental bookkeeping ----
+    def _count(self, cid, sign):
+        key = (int(self.priority[cid]), float(self.demand[cid]))
+        self._groups[key] += sign
+        if not self._groups[key]:
+            del self._groups[key]
+
+    def update(self, cid, active, demand, priority):
+        """One charger changed: O(1) update of the groups."""
+        if self.active[cid]:
+            self._count(cid, -1)
+        self.active[cid] = active
+        self.demand[cid] = demand
+        self.priority[cid] = priority
+        if active:
+            self._count(cid, +1)
+        self.caps = None
+
+    def charger_changed(self, fleet, cid):
+        """A command changed vehicle `cid`: update it and reallocate."""
+        if 0 <= cid < self.chargers:
+            self.chargers_changed(fleet, (cid,))
+            self.refresh(fleet)
+
+    def chargers_changed(self, fleet, ids):
+        """
+        Vehicles `ids` (sorted) started, stopped or changed demand or
+        priority: update those that are chargers, O(1) each. The caps are
+        recomputed on the next refresh/allocate.
+        """
+        ids = np.asarray(ids)
+        for cid in ids[:np.searchsorted(ids, self.chargers)]:
+            self.update(
+                cid,
+                bool(fleet.charging[cid]),
+                float(min(fleet.power[cid], fleet.limit[cid])),
+                int(fleet.priority[cid]),
+            )
+
+    def reload(self, fleet):
+        """
+        The fleet changed in bulk (reset, restore): re-read every charger
+        and rewrite every cap on the next refresh.
+        """
+        self.sync(fleet)
+        self.caps = None
+
+    def sync(self, fleet):
+        """Compare every charger with the groups; update those that changed."""
+        n = self.chargers
+        active = fleet.charging[:n]
+        demand = np.minimum(fleet.power[:n], fleet.limit[:n])
+        priority = fleet.priority[:n]
+        changed = np.flatnonzero(
+            (active != self.active) | (demand != self.demand) | (priority != self.priority)
+        )
+        for cid in changed:
+            self.update(cid, bool(active[cid]), float(demand[cid]), int(priority[cid]))
+        return len(changed)
+
+    # ---- allocation ----
+    def _caps(self, headroom):
+        """Power cap per priority class and the total allocated power."""
+        caps = np.zeros(len(PRIORITIES))
+        if self.mode == "fair":
+            classes = [(PRIORITIES, list(self._groups.items()))]
+        else:
+            by_priority = defaultdict(list)
+            for key, count in self._groups.items():
+                by_priority[key[0]].append((key, count))
+            classes = [([p], by_priority[p]) for p in sorted(by_priority, reverse=True)]
+            # Classes without charging chargers: no cap needed
+            caps[[p for p in PRIORITIES if p not in by_priority]] = np.inf
+
+        remaining = headroom
+        for priorities, groups in classes:
+            cap, used = water_fill(groups, remaining)
+            caps[list(priorities)] = cap
+            remaining -= used
+        return caps, headroom - remaining
+
+    def refresh(self, fleet):
+        """Recompute the caps if the groups or the headroom changed."""
+        headroom = max(0.0, self.fuse - self.base_load)
+        if self.caps is not None and headroom == self.headroom:
+            return
+        caps, self.allocated = self._caps(headroom)
+        self.headroom = headroom
+        if self.caps is None or not np.array_equal(caps, self.caps):
+            fleet.allocated[:self.chargers] = caps[self.priority]
+        self.caps = caps
+
+    def allocate(self, fleet, base_load):
+        """
+        Every tick: share fuse - base_load among the charging chargers.
+        Returns the total allocated power (kW).
+        """
+        self.base_load = float(base_load)
+        self.refresh(fleet)
+        return self.allocated
+
+    def info(self):
+        return {
+            "mode": self.mode,
+            "fuse_kW": self.fuse,
+            "chargers": self.chargers,
+            "charging": int(sum(self._groups.values())),
+            "base_load_kW": round(self.base_load, 2),
+            "headroom_kW": round(self.headroom or 0.0, 2),
+            "allocated_kW": round(self.allocated, 2),
+        }
+
+
+def water_fill(groups, headroom):
+    """
+    Equal-share split of `headroom` among groups ((priority, demand), count):
+    returns (cap, used). Chargers needing less than the cap get their
+    demand; cap is inf if every demand fits.
+    """
+    total = sum(key[1] * count for key, count in groups)
+    if total <= headroom:
+        return np.inf, total
+
+    remaining = headroom
+    left = sum(count for _, count in groups)
+    for (_, demand), count in sorted(groups, key=lambda g: g[0][1]):
+        share = remaining / left
+        if share <= demand:
+            return share, headroom
+        remaining -= demand * count
+        left -= count
+    return np.inf, total  # not reached
@@ -0,0 +1,135 @@
+# log_buffer.py
+# Non-blocking simulation log: ring buffer + background file writer.
+#
+# add() only stores the line in a fixed-size ring and bumps a sequence
+# number, so logging from inside global_lock never waits for stdout or the
+# disk. A background thread echoes new lines to the console and appends
+# them to a rotating simulation_log.txt. Readers page through the ring
+# with a cursor (the sequence number of the next line they want).
+
+import os
+import time
+import threading
+import itertools
+from logging.handlers import RotatingFileHandler
+import logging
+
+# Default log file next to this module
+log_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simulation_log.txt")
+
+
+class LogBuffer:
+    """
+    Ring buffer of the last `capacity` log lines.
+
+    Each line gets a sequence number 0, 1, 2, ...; read(cursor) returns the
+    lines from `cursor` on. No lock is taken: a writer fills its slot
+    before publishing the new head, and a reader drops slots whose sequence
+    number no longer matches (overwritten while it was reading).
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self._slots = [None] * capacity     # (seq, unix time, line)
+        self._seq = itertools.count()       # atomic under the GIL
+        self.head = 0                       # sequence number of the next line
+
+    def add(self, line):
+        seq = next(self._seq)
+        self._slots[seq % self.capacity] = (seq, time.time(), line)
+        # Publish; with concurrent writers, keep the highest head
+        if seq + 1 > self.head:
+            self.head = seq + 1
+        return seq
+
+    def resume(self, seq):
+        """
+        Continue numbering at `seq` (restored from a checkpoint, so client
+        cursors stay valid across restarts). Only moves forward; call it
+        before any reader (LogWriter) takes a cursor.
+        """
+        if seq > self.head:
+            self._seq = itertools.count(seq)
+            self.head = seq
+
+    def read(self, cursor=0, limit=None):
+        """
+        Lines with sequence number >= cursor, oldest first.
+
+        Returns (entries, next_cursor, dropped) where entries are
+        (seq, time, line) tuples, next_cursor is the value to pass next
+        time and dropped counts lines that fell out of the ring before
+        they were read.
+        """
+        head = self.head
+        oldest = max(0, head - self.capacity)
+        start = min(max(cursor, oldest), head)
+        dropped = start - cursor if cursor < start else 0
+
+        stop = head if limit is None else min(head, start + limit)
+        entries = []
+        for seq in range(start, stop):
+            entry = self._slots[seq % self.capacity]
+            if entry is None or entry[0] != seq:
+                # Overwritten (or not yet filled) while we were reading
+                continue
+            entries.append(entry)
+        return entries, stop, dropped
+
+    def lines(self, count=None):
+        """The last `count` lines as plain strings (all by default)."""
+        head = self.head
+        cursor = 0 if count is None else max(0, head - count)
+        return [entry[2] for entry in self.read(cursor)[0]]
+
+
+class LogWriter(threading.Thread):
+    """
+    Background thread: drains a LogBuffer to the console and to a
+    rotating log file every `interval` seconds.
+    """
+
+    def __init__(self, buffer, path=log_path, max_bytes=1_000_000, backups=3,
+                 echo=True, interval=0.2):
+        super().__init__(daemon=True, name="log-writer")
+        self.buffer = buffer
+        self.echo = echo
+        self.interval = interval
+        self.cursor = buffer.head
+        self._halt = threading.Event()
+
+        self.handler = None
+        if path:
+            self.handler = RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+            )
+            # Same line format as the client-side simulation_log.txt
+            self.handler.setFormatter(logging.Formatter(
+                "[%(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+            ))
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        entries, self.cursor, dropped = self.buffer.read(self.cursor)
+        if dropped:
+            entries.insert(0, (None, time.time(), f"[log] {dropped} line(s) dropped"))
+
+        for _, created, line in entries:
+            if self.echo:
+                print(line)
+            if self.handler is not None:
+                record = logging.LogRecord(
+                    "simulation", logging.INFO, "", 0, line, None, None
+                )
+                record.created = created
+                self.handler.emit(record)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+        if self.handler is not None:
+            self.handler.close()
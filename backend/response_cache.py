@@ -0,0 +1,65 @@
+# response_cache.py
+# Pre-serialized HTTP responses.
+#
+# StaticResponse: a constant JSON document encoded once at startup, with
+# an ETag (304 on revalidation) and a gzip variant for clients that
+# accept it.
+# VersionedBody: a JSON body that is encoded once per data version (for
+# example once per simulation tick) and shared by every reader until the
+# version changes.
+
+import gzip
+import json
+import hashlib
+
+from flask import Response
+
+
+class StaticResponse:
+    """Constant JSON body, encoded and compressed once."""
+
+    def __init__(self, data):
+        self.body = json.dumps(data).encode()
+        self.etag = hashlib.sha1(self.body).hexdigest()
+
+        # Only worth serving compressed if it is actually smaller
+        gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.gzipped = gzipped if len(gzipped) < len(self.body) else None
+
+    def respond(self, request):
+        """200 (plain or gzip) or 304 for the given request."""
+        if self.etag in request.if_none_match:
+            response = Response(status=304)
+        elif self.gzipped is not None and request.accept_encodings["gzip"]:
+            response = Response(self.gzipped, mimetype="application/json")
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = Response(self.body, mimetype="application/json")
+
+        response.set_etag(self.etag)
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+class VersionedBody:
+    """
+    Encoded body for the current data version.
+
+    get(version, build) returns the cached bytes while `version` is
+    unchanged and calls build() once when it changes. A version of None
+    means "do not cache". Concurrent misses may build twice; the last one
+    wins, which is harmless because both encode the same version.
+    """
+
+    def __init__(self):
+        self._cached = (None, None)  # (version, body)
+
+    def get(self, version, build):
+        cached_version, body = self._cached
+        if version is not None and cached_version == version:
+            return body
+
+        body = build()
+        if version is not None:
+            self._cached = (version, body)
+        return body
@@ -1,4 +1,7 @@
+import time
+
 import requests  # Send HTTP requests to the Flask simulation server
+from requests.adapters import HTTPAdapter
 
 # Base URL of the EV simulation server
 BASE_URL = "http://127.0.0.1:5000"
@@ -15,36 +18,344 @@ def safe_json(response):
     return {"error": f"HTTP {response.status_code}", "raw": response.text}
 
 
-# ------------------------------
-# PRICE & BASELOAD
-# ------------------------------
-
-def get_price_per_hour():
-    """Fetch hourly electricity prices (24 values)."""
-    response = requests.get(f"{BASE_URL}/priceperhour")  # Call Flask /priceperhour
-    data = safe_json(response)
-
+def hour_list(data, name):
+    """Accept a list of 24 values or a dict with hour keys "0"–"23"."""
     if isinstance(data, list):
         return data                                      # Already a list
     elif isinstance(data, dict):
         # Convert dict with hour keys "0"–"23" to a list
         return [data[str(h)] for h in range(24)]
     else:
-        raise ValueError("Unexpected price format")
+        raise ValueError(f"Unexpected {name} format")
+
+
+def day_query(path, date=None, zone=None):
+    """Path with the optional ?date=YYYY-MM-DD&zone=... of the day lists."""
+    params = [f"{k}={v}" for k, v in (("date", date), ("zone", zone)) if v]
+    return f"{path}?{'&'.join(params)}" if params else path
+
+
+def batch_results(data):
+    return data["results"] if "results" in data else data
+
+
+# ------------------------------
+# POOLED CLIENT
+# ------------------------------
+
+class EVClient:
+    """
+    Client for the simulation server.
+
+    - Keeps a pool of keep-alive connections (one requests.Session)
+    - Caches the static /priceperhour and /baseload lists and revalidates
+      them with ETag / If-None-Match (HTTP 304 -> cached copy is reused)
+
+    Use one client per application (it is safe to share between threads).
+    """
+
+    def __init__(self, base_url=BASE_URL, pool_size=10, timeout=10):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._cache = {}                                 # path -> (etag, data)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get(self, path):
+        response = self.session.get(f"{self.base_url}{path}", timeout=self.timeout)
+        return safe_json(response)
+
+    def _post(self, path, body):
+        response = self.session.post(
+            f"{self.base_url}{path}", json=body, timeout=self.timeout
+        )
+        return safe_json(response)
+
+    def _get_cached(self, path):
+        """GET with ETag revalidation of the locally cached body."""
+        cached = self._cache.get(path)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+
+        response = self.session.get(
+            f"{self.base_url}{path}", headers=headers, timeout=self.timeout
+        )
+        if response.status_code == 304 and cached:
+            return cached[1]                             # Not modified
+
+        data = safe_json(response)
+        etag = response.headers.get("ETag")
+        if etag and response.status_code == 200:
+            self._cache[path] = (etag, data)
+        return data
+
+    # ---- price & baseload ----
+    def get_price_per_hour(self, date=None, zone=None):
+        """Fetch hourly electricity prices (24 values) of a day and zone."""
+        return hour_list(self._get_cached(day_query("/priceperhour", date, zone)), "price")
+
+    def get_baseload(self, date=None, zone=None):
+        """Fetch household base load for 24 hours of a day and zone."""
+        return hour_list(self._get_cached(day_query("/baseload", date, zone)), "baseload")
+
+    # ---- battery + info ----
+    def get_battery_percent(self):
+        """Fetch current battery state of charge (%)."""
+        return self._get("/charge")
+
+    def get_info(self, since=None, wait=0):
+        """
+        Fetch system info (sim time, load, battery, charging, override).
+        With `since` (a "version" seen before) the server waits up to `wait`
+        seconds for a newer state and returns only the changed fields.
+        """
+        if since is None:
+            return self._get("/info")
+        response = self.session.get(
+            f"{self.base_url}/info",
+            params={"since": since, "wait": wait},
+            timeout=self.timeout + wait,
+        )
+        return safe_json(response)
+
+    def poll_info(self, wait=30):
+        """Yield the full /info state after every change (long polling)."""
+        info = self.get_info()
+        yield info
+        while True:
+            changes = self.get_info(info.get("version", 0), wait)
+            if "error" in changes:
+                time.sleep(1)  # server unreachable, retry
+                continue
+            if changes.get("version") != info.get("version"):
+                info = {**info, **changes}
+                yield info
+
+    def get_vehicle(self, vid):
+        """Fetch info for one vehicle of the fleet."""
+        return self._get(f"/vehicles/{vid}")
+
+    # ---- charging control ----
+    def start_charging(self, vid=0):
+        """Ask server to turn charging ON (ignored if override is active)."""
+        return self._post(self._vehicle_path(vid, "/charge"), {"charging": "on"})
+
+    def stop_charging(self, vid=0):
+        """Ask server to turn charging OFF (ignored if override is active)."""
+        return self._post(self._vehicle_path(vid, "/charge"), {"charging": "off"})
+
+    def discharge_battery(self):
+        """Reset battery to 20% and reset simulated clock to hour 0."""
+        return self._post("/discharge", {"discharging": "on"})
+
+    # ---- user override ----
+    def get_override(self, vid=0):
+        """Check current override mode and charging state."""
+        return self._get(self._vehicle_path(vid, "/override"))
+
+    def set_override(self, mode, vid=0):
+        """Set override mode: "auto", "force_on" or "force_off"."""
+        return self._post(self._vehicle_path(vid, "/override"), {"mode": mode})
+
+    # ---- server-side strategy ----
+    def get_strategy(self):
+        """Current server-side strategy and its cheapest hours."""
+        return self._get("/strategy")
+
+    def set_strategy(self, mode, **params):
+        """Select "manual", "price" (cheap_hours=N) or "load" (min_headroom=kW)."""
+        return self._post("/strategy", {"mode": mode, **params})
+
+    # ---- log ----
+    def get_log(self, cursor=None, limit=100):
+        """Log lines from `cursor` on (None: the last `limit` lines)."""
+        query = f"?limit={limit}" if cursor is None else f"?cursor={cursor}&limit={limit}"
+        return self._get(f"/log{query}")
+
+    # ---- history ----
+    def get_history(self, **query):
+        """Downsampled telemetry: from, to, step (sim seconds), method, fields."""
+        response = self.session.get(
+            f"{self.base_url}/history", params=query, timeout=self.timeout
+        )
+        return safe_json(response)
+
+    # ---- batch ----
+    def batch(self, ops):
+        """Apply several operations atomically in one request."""
+        return batch_results(self._post("/batch", {"ops": ops}))
+
+    @staticmethod
+    def _vehicle_path(vid, path):
+        return path if vid == 0 else f"/vehicles/{vid}{path}"
+
+
+# ------------------------------
+# ASYNC CLIENT
+# ------------------------------
+
+class AsyncEVClient:
+    """
+    asyncio variant of EVClient (needs aiohttp), for driving many vehicles
+    or sessions concurrently over one connection pool:
+
+        async with AsyncEVClient() as client:
+            infos = await asyncio.gather(*(client.get_vehicle(v) for v in ids))
+    """
+
+    def __init__(self, base_url=BASE_URL, limit=100, timeout=10):
+        try:
+            import aiohttp
+        except ImportError as e:
+            raise ImportError("AsyncEVClient requires aiohttp (pip install aiohttp)") from e
+
+        self._aiohttp = aiohttp
+        self.base_url = base_url
+        self.limit = limit
+        self.timeout = timeout
+        self.session = None
+        self._cache = {}                                 # path -> (etag, data)
+
+    async def __aenter__(self):
+        self.session = self._aiohttp.ClientSession(
+            connector=self._aiohttp.TCPConnector(limit=self.limit),
+            timeout=self._aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _request(self, method, path, body=None, headers=None, **options):
+        """(response, data): parsed JSON, or an error structure like safe_json."""
+        async with self.session.request(
+            method, f"{self.base_url}{path}", json=body, headers=headers, **options
+        ) as response:
+            text = await response.text()
+            if response.status == 304:
+                return response, None
+            if response.status != 200:
+                return response, {"error": f"HTTP {response.status}", "raw": text}
+            try:
+                return response, await response.json(content_type=None)
+            except ValueError:
+                return response, {"warning": "Invalid JSON", "raw": text}
+
+    async def _get(self, path):
+        return (await self._request("GET", path))[1]
+
+    async def _post(self, path, body):
+        return (await self._request("POST", path, body))[1]
+
+    async def _get_cached(self, path):
+        cached = self._cache.get(path)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+
+        response, data = await self._request("GET", path, headers=headers)
+        if response.status == 304 and cached:
+            return cached[1]                             # Not modified
+
+        etag = response.headers.get("ETag")
+        if etag and response.status == 200:
+            self._cache[path] = (etag, data)
+        return data
+
+    async def get_price_per_hour(self, date=None, zone=None):
+        return hour_list(await self._get_cached(day_query("/priceperhour", date, zone)), "price")
+
+    async def get_baseload(self, date=None, zone=None):
+        return hour_list(await self._get_cached(day_query("/baseload", date, zone)), "baseload")
+
+    async def get_battery_percent(self):
+        return await self._get("/charge")
+
+    async def get_info(self, since=None, wait=0):
+        if since is None:
+            return await self._get("/info")
+        # Long poll: the session timeout has to allow `wait`
+        _, data = await self._request(
+            "GET", "/info",
+            params={"since": since, "wait": wait},
+            timeout=self._aiohttp.ClientTimeout(total=self.timeout + wait),
+        )
+        return data
+
+    async def get_vehicle(self, vid):
+        return await self._get(f"/vehicles/{vid}")
+
+    async def start_charging(self, vid=0):
+        return await self._post(EVClient._vehicle_path(vid, "/charge"), {"charging": "on"})
+
+    async def stop_charging(self, vid=0):
+        return await self._post(EVClient._vehicle_path(vid, "/charge"), {"charging": "off"})
+
+    async def discharge_battery(self):
+        return await self._post("/discharge", {"discharging": "on"})
+
+    async def get_override(self, vid=0):
+        return await self._get(EVClient._vehicle_path(vid, "/override"))
+
+    async def set_override(self, mode, vid=0):
+        return await self._post(EVClient._vehicle_path(vid, "/override"), {"mode": mode})
+
+    async def get_strategy(self):
+        return await self._get("/strategy")
+
+    async def set_strategy(self, mode, **params):
+        return await self._post("/strategy", {"mode": mode, **params})
+
+    async def get_log(self, cursor=None, limit=100):
+        query = f"?limit={limit}" if cursor is None else f"?cursor={cursor}&limit={limit}"
+        return await self._get(f"/log{query}")
+
+    async def batch(self, ops):
+        return batch_results(await self._post("/batch", {"ops": ops}))
+
+
+# ------------------------------
+# MODULE-LEVEL HELPERS
+# ------------------------------
+# Kept for existing scripts (get_prices_only.py, get_baseload_only.py, ...).
+# They all share one pooled client.
+
+_default_client = None
+
+
+def default_client():
+    """Shared EVClient used by the module-level helpers."""
+    global _default_client
+    if _default_client is None:
+        _default_client = EVClient(BASE_URL)
+    return _default_client
+
+
+# ------------------------------
+# PRICE & BASELOAD
+# ------------------------------
+
+def get_price_per_hour():
+    """Fetch hourly electricity prices (24 values)."""
+    return default_client().get_price_per_hour()
 
 
 def get_baseload():
     """Fetch household base load for 24 hours."""
-    response = requests.get(f"{BASE_URL}/baseload")      # Call Flask /baseload
-    data = safe_json(response)
-
-    if isinstance(data, list):
-        return data                                      # Already a list
-    elif isinstance(data, dict):
-        # Convert dict with hour keys "0"–"23" to a list
-        return [data[str(h)] for h in range(24)]
-    else:
-        raise ValueError("Unexpected baseload format")
+    return default_client().get_baseload()
 
 
 # ------------------------------
@@ -53,17 +364,16 @@ def get_baseload():
 
 def get_battery_percent():
     """Fetch current battery state of charge (%)."""
-    response = requests.get(f"{BASE_URL}/charge")        # GET /charge returns % value
-    return safe_json(response)
+    return default_client().get_battery_percent()
 
 
-def get_info():
+def get_info(since=None, wait=0):
     """
     Fetch system info:
     sim time, base load, battery kWh, charging flag, and override mode.
+    With `since`, only the fields changed after that version (long poll).
     """
-    response = requests.get(f"{BASE_URL}/info")          # GET /info
-    return safe_json(response)
+    return default_client().get_info(since, wait)
 
 
 # ------------------------------
@@ -72,29 +382,17 @@ def get_info():
 
 def start_charging():
     """Ask server to turn charging ON (ignored if override is force_on/force_off)."""
-    response = requests.post(
-        f"{BASE_URL}/charge",
-        json={"charging": "on"}                          # POST body: turn on
-    )
-    return safe_json(response)
+    return default_client().start_charging()
 
 
 def stop_charging():
     """Ask server to turn charging OFF (ignored if override is force_on/force_off)."""
-    response = requests.post(
-        f"{BASE_URL}/charge",
-        json={"charging": "off"}                         # POST body: turn off
-    )
-    return safe_json(response)
+    return default_client().stop_charging()
 
 
 def discharge_battery():
     """Reset battery to 20% and reset simulated clock to hour 0."""
-    response = requests.post(
-        f"{BASE_URL}/discharge",
-        json={"discharging": "on"}                       # POST body: trigger reset
-    )
-    return safe_json(response)
+    return default_client().discharge_battery()
 
 
 # ------------------------------
@@ -103,8 +401,7 @@ def discharge_battery():
 
 def get_override():
     """Check current override mode and charging state."""
-    response = requests.get(f"{BASE_URL}/override")      # GET /override
-    return safe_json(response)
+    return default_client().get_override()
 
 
 def set_override(mode):
@@ -116,8 +413,39 @@ def set_override(mode):
       - "force_on"   -> user forces charging ON
       - "force_off"  -> user forces charging OFF
     """
-    response = requests.post(
-        f"{BASE_URL}/override",
-        json={"mode": mode}                              # POST body: new mode
-    )
-    return safe_json(response)
\ No newline at end of file
+    return default_client().set_override(mode)
+
+
+# ------------------------------
+# SERVER-SIDE STRATEGY
+# ------------------------------
+
+def get_strategy():
+    """Check the server-side charging strategy."""
+    return default_client().get_strategy()
+
+
+def set_strategy(mode, **params):
+    """
+    Let the server control charging:
+      - "manual"  -> clients start/stop charging themselves
+      - "price"   -> charge in the cheapest hours (cheap_hours=8)
+      - "load"    -> charge while the fuse has headroom (min_headroom=0)
+    """
+    return default_client().set_strategy(mode, **params)
+
+
+# ------------------------------
+# BATCH
+# ------------------------------
+
+def batch(ops):
+    """
+    Apply several operations atomically in one request.
+
+    ops is an ordered list, for example:
+      [{"op": "charge", "charging": "on"}, {"op": "info"}]
+    Supported ops: "charge", "override", "discharge", "info"
+    (optional "vehicle" id). Returns the list of results.
+    """
+    return default_client().batch(ops)
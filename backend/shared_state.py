@@ -0,0 +1,246 @@
+# shared_state.py
+# Shared-memory state + command channel for multi-worker deployments.
+#
+# One "owner" process runs main_prg and writes the simulation state into a
+# shared-memory segment. Every gunicorn worker maps the same segment and
+# reads it directly (no IPC round-trip), using a sequence lock to get a
+# consistent view. Control commands are forwarded to the owner over a
+# multiprocessing connection.
+#
+# Segment layout:
+#   header (64 bytes)  seq, fleet size, sim clock (hour, minute, day), base load
+#   fleet columns      see fleet.COLUMNS
+
+import os
+import time
+import tempfile
+import threading
+from collections import namedtuple
+from multiprocessing import shared_memory
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+
+from fleet import Fleet
+
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([
+    ("seq", np.uint64),              # odd while the owner is writing
+    ("size", np.uint64),             # number of vehicles
+    ("sim_hour", np.int64),
+    ("sim_min", np.int64),
+    ("base_current_load", np.float64),
+    ("sim_day", np.int64),
+])
+
+# Consistent view of the simulation state handed to readers
+SimView = namedtuple(
+    "SimView", "sim_hour sim_min base_current_load fleet sim_day version",
+    defaults=(0, 0),
+)
+
+
+def _open_segment(name):
+    """Attach to an existing segment without letting this process unlink it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers every attach with the resource tracker,
+        # which would destroy the segment when this process exits.
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedState:
+    """Simulation state stored in one shared-memory segment."""
+
+    def __init__(self, shm, fleet):
+        self.shm = shm
+        self.header = np.ndarray(1, dtype=HEADER_DTYPE, buffer=shm.buf)[0]
+        self.fleet = fleet
+
+    @classmethod
+    def create(cls, size, name=None):
+        """Create and initialize a new segment for `size` vehicles."""
+        shm = shared_memory.SharedMemory(
+            name=name, create=True, size=HEADER_SIZE + Fleet.nbytes(size)
+        )
+        fleet = Fleet(size, buffer=shm.buf[HEADER_SIZE:])
+        state = cls(shm, fleet)
+        state.header["size"] = size
+        return state
+
+    @classmethod
+    def attach(cls, name, timeout=10.0):
+        """Map a segment created by another process (waits for the owner)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                shm = _open_segment(name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+        # Wait until the owner has written the header
+        while np.ndarray(1, dtype=HEADER_DTYPE, buffer=shm.buf)[0]["size"] == 0:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Shared state {name} was never initialized")
+            time.sleep(0.05)
+
+        size = int(np.ndarray(1, dtype=HEADER_DTYPE, buffer=shm.buf)[0]["size"])
+        return cls(shm, Fleet.attach(size, shm.buf[HEADER_SIZE:]))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    # ---- writer side (owner only) ----
+    def begin_write(self):
+        self.header["seq"] += 1  # odd: write in progress
+
+    def end_write(self, sim_hour, sim_min, base_current_load, sim_day=0):
+        self.header["sim_day"] = sim_day
+        self.header["sim_hour"] = sim_hour
+        self.header["sim_min"] = sim_min
+        self.header["base_current_load"] = base_current_load
+        self.header["seq"] += 1  # even: consistent again
+
+    # ---- reader side ----
+    def version(self):
+        """Write counter of the state, or None while a write is in progress."""
+        seq = int(self.header["seq"])
+        return None if seq & 1 else seq
+
+    def read(self, fn):
+        """Call fn(SimView) until it ran against an unchanged state."""
+        header = self.header
+        while True:
+            seq = int(header["seq"])
+            if seq & 1:
+                time.sleep(0)  # writer active, let it finish
+                continue
+            view = SimView(
+                int(header["sim_hour"]),
+                int(header["sim_min"]),
+                float(header["base_current_load"]),
+                self.fleet,
+                int(header["sim_day"]),
+                seq // 2,  # number of completed writes
+            )
+            result = fn(view)
+            if int(header["seq"]) == seq:
+                return result
+
+    def close(self, unlink=False):
+        # Drop our views before closing the mapping
+        self.header = None
+        self.fleet = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+# ------------------------------
+# COMMAND CHANNEL
+# ------------------------------
+
+# Exceptions raised by a command in the owner are raised again in the
+# worker as the nearest of these types (the endpoints map them to HTTP
+# status codes); anything else arrives as RuntimeError
+FORWARDED_ERRORS = (
+    FileNotFoundError, PermissionError, TimeoutError, OSError,
+    KeyError, IndexError, LookupError, TypeError, ValueError, RuntimeError,
+)
+
+def default_address():
+    return os.path.join(tempfile.gettempdir(), f"ev-sim-{os.getpid()}.sock")
+
+
+def serve_commands(address, authkey, handler):
+    """
+    Owner side: accept worker connections and answer (name, args) requests
+    with handler(name, *args). Runs in background threads.
+    """
+    listener = Listener(address, family="AF_UNIX", authkey=authkey)
+
+    def serve(conn):
+        with conn:
+            while True:
+                try:
+                    name, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    conn.send(("ok", handler(name, *args)))
+                except Exception as e:
+                    conn.send(("error", error_reply(e)))
+
+    def accept_loop():
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    return listener
+
+
+def error_reply(e):
+    """(type name, message) of an exception, for the command channel."""
+    forwarded = next(
+        (cls for cls in type(e).__mro__ if cls in FORWARDED_ERRORS), RuntimeError
+    )
+    message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+    return forwarded.__name__, message
+
+
+def raise_reply(reply):
+    """Raise the exception described by error_reply() in this process."""
+    name, message = reply
+    types = {cls.__name__: cls for cls in FORWARDED_ERRORS}
+    raise types.get(name, RuntimeError)(message)
+
+
+class CommandClient:
+    """Worker side: forward commands to the owner over one connection."""
+
+    def __init__(self, address, authkey, connect_timeout=10.0):
+        self.address = address
+        self.authkey = authkey
+        self.connect_timeout = connect_timeout
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        # The owner may still be starting up
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def call(self, name, *args):
+        with self.lock:
+            for attempt in range(2):
+                if self.conn is None:
+                    self.conn = self._connect()
+                try:
+                    self.conn.send((name, args))
+                    status, result = self.conn.recv()
+                    break
+                except (EOFError, OSError):
+                    # Owner restarted: reconnect once
+                    self.conn = None
+                    if attempt:
+                        raise
+
+        if status == "error":
+            raise_reply(result)
+        return result
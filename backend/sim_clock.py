@@ -0,0 +1,138 @@
+# sim_clock.py
+# Virtual simulation clock: how fast simulated time runs against real time.
+#
+# A simulation step is always the same amount of simulated time
+# (3600 / seconds_per_hour seconds), whatever the speed, so the battery
+# integration gives the same result at 1x and at 10000x. The speed factor
+# only sets how many steps run per real second: 1x is one step per second
+# (one simulated hour per minute, as before), 10000x is 10000 steps per
+# second.
+#
+# Steps are scheduled from an anchor (real time, step count) instead of
+# "one second after the previous step finished", so the time spent in a
+# step does not push the later ones back and the clock does not drift.
+# If the machine cannot keep up (a large fleet at a high speed), steps run
+# back to back, and after falling more than `max_lag` behind the anchor is
+# moved up: the clock then runs as fast as it can instead of racing to
+# catch up later.
+#
+# The time source is injectable (`now`), so tests can use a fake clock and
+# drive the simulation without sleeping: charging_simulation.create_app(
+# virtual_clock=VirtualClock(..., now=fake), start=False) sets the server up
+# without starting its thread, then advance() runs one step at a time.
+
+import time
+
+MIN_SPEED = 1.0
+MAX_SPEED = 10000.0
+
+
+def check_speed(speed):
+    """Speed factor as float (raises ValueError outside MIN_SPEED..MAX_SPEED)."""
+    speed = float(speed)
+    if not MIN_SPEED <= speed <= MAX_SPEED:
+        raise ValueError(f"speed must be {MIN_SPEED:g}-{MAX_SPEED:g}")
+    return speed
+
+
+class VirtualClock:
+    """Step schedule of the simulation: speed, pause and single steps."""
+
+    def __init__(self, step_seconds, speed=1.0, paused=False, now=time.monotonic,
+                 max_lag=1.0):
+        self.step_seconds = step_seconds  # simulated seconds per step
+        self.now = now
+        self.max_lag = max_lag            # real seconds behind before re-anchoring
+        self.speed = check_speed(speed)
+        self.paused = paused
+        self.steps = 0       # steps run
+        self.pending = 0     # single steps requested while paused
+        self.lag = 0.0       # how late the last step started (real seconds)
+        self.resets = 0      # times the schedule was moved after falling behind
+        self.listeners = []  # called after every pause/resume/step/speed change
+        self._reanchor()
+
+    def _reanchor(self):
+        self._anchor_time = self.now()
+        self._anchor_steps = self.steps
+
+    def _changed(self):
+        for listener in self.listeners:
+            listener()
+
+    def due_time(self):
+        """Real time at which the next step is due."""
+        return self._anchor_time + (self.steps - self._anchor_steps) / self.speed
+
+    def delay(self):
+        """Real seconds until the next step is due (0: now, None: paused)."""
+        if self.pending:
+            return 0.0
+        if self.paused:
+            return None
+        return max(0.0, self.due_time() - self.now())
+
+    # ---- simulation loop ----
+    def start_step(self):
+        """A step starts: note how late it is."""
+        if self.paused:
+            self.lag = 0.0
+            return
+        self.lag = max(0.0, self.now() - self.due_time())
+        if self.lag > self.max_lag:
+            # Cannot keep up: continue from here instead of catching up
+            self.resets += 1
+            self._reanchor()
+
+    def end_step(self):
+        """A step finished."""
+        self.steps += 1
+        if self.pending:
+            self.pending -= 1
+
+    # ---- control ----
+    def pause(self):
+        self.paused = True
+        self._changed()
+
+    def resume(self):
+        if self.paused:
+            self.paused = False
+            self.pending = 0
+            self._reanchor()
+        self._changed()
+
+    def step(self, count=1):
+        """Run `count` steps now (only while paused)."""
+        if not self.paused:
+            raise ValueError("Pause the clock before stepping")
+        if type(count) is not int or count < 1:
+            raise ValueError("steps must be a positive integer")
+        self.pending += count
+        self._changed()
+
+    def set_speed(self, speed):
+        speed = check_speed(speed)
+        self._reanchor()  # steps so far were on the old speed
+        self.speed = speed
+        self._changed()
+
+    def info(self):
+        elapsed = self.now() - self._anchor_time
+        steps = self.steps - self._anchor_steps
+        if self.paused:
+            effective = 0.0
+        elif elapsed >= 1.0:
+            effective = round(steps / elapsed, 2)
+        else:
+            effective = None  # too soon after a change to tell
+        return {
+            "paused": self.paused,
+            "speed": self.speed,
+            "effective_speed": effective,
+            "steps": self.steps,
+            "pending_steps": self.pending,
+            "step_seconds": self.step_seconds,
+            "lag_s": round(self.lag, 6),
+            "resets": self.resets,
+        }
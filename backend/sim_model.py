@@ -0,0 +1,79 @@
+# sim_model.py
+# Shared simulation constants and the per-step battery logic.
+#
+# Used by the live server (charging_simulation.py) and by the headless
+# fast-forward engine (fast_forward.py), so both advance the battery the
+# exact same way.
+
+# Energy prices for 24 hours (Öre/kWh)
+energy_price = [
+    85.28, 70.86, 68.01, 67.95, 68.01, 85.04, 87.86, 100.26,
+    118.45, 116.61, 105.93, 91.95, 90.51, 90.34, 90.80, 88.85,
+    90.39, 99.03, 87.11, 82.9, 80.45, 76.48, 32.00, 34.29
+]
+
+# Max power for the household (kW)
+max_power_residential_building = 11  # (11 kW = 16A 3-phase)
+
+# Base load as percentage of max power for each hour
+base_load_residential_percent = [
+    0.08, 0.07, 0.20, 0.18, 0.25, 0.35, 0.41, 0.34,
+    0.35, 0.40, 0.43, 0.56, 0.42, 0.34, 0.32, 0.33,
+    0.53, 1.00, 0.81, 0.55, 0.39, 0.24, 0.17, 0.09
+]
+
+# Convert base load to kW and round
+base_load_residential_kwh = [
+    round(value * max_power_residential_building, 2)
+    for value in base_load_residential_percent
+]
+
+# Battery model values (Citroën e-Berlingo M)
+ev_batt_nominal_capacity = 50       # kWh nominal
+ev_batt_max_capacity = 46.3         # kWh usable
+ev_batt_start_percent = 20          # SoC after a reset (%)
+ev_batt_energy_consumption = 226    # Wh/km
+
+# Charger power (kW)
+charging_station_info = {"Power": "7.4"}
+charging_power = 7.4
+
+# 1 simulated hour = 60 steps (one step per simulated minute)
+seconds_per_hour = 60
+
+# Battery model parameters (see battery_model.py)
+ambient_temperature = 25        # °C
+max_safe_temperature = 45       # charging stops above this (°C)
+pack_voltage_empty = 320        # pack voltage at 0% SoC (V)
+pack_voltage_full = 400         # pack voltage at 100% SoC (V)
+pack_resistance = 0.1           # internal resistance at 50% SoC (ohm)
+resistance_soc_factor = 0.5     # extra resistance at 0% / 100% SoC (fraction)
+thermal_mass = 1.0e5            # pack heat capacity (J/K)
+cooling_coefficient = 20        # heat loss to ambient (W/K)
+cc_cv_knee_percent = 80         # constant power below, tapering above (% SoC)
+cv_cutoff = 0.05                # charging ends below 5% of the constant power
+
+
+def current_load(hour, charging, power=charging_power,
+                 base_loads=base_load_residential_kwh):
+    """Building load (kW) for `hour`, including the charger when active."""
+    return building_load(base_loads[hour], charging, power)
+
+
+def building_load(base_load, charging, power=charging_power):
+    """Building load (kW): base load plus the charger when active."""
+    return round(base_load + (power if charging else 0), 2)
+
+
+def step_minute(i, steps_per_hour=seconds_per_hour):
+    """Simulated minute (0–59) at the start of step `i` of an hour."""
+    # Integer arithmetic: exact for any steps_per_hour, no rounding up to 60
+    return (i * 60 // steps_per_hour) % 60
+
+
+def event_message(event):
+    """Log line for a ("overtemp", °C) or ("full", None) event."""
+    kind, value = event
+    if kind == "overtemp":
+        return f"Overtemperature – charging stopped at {value} °C"
+    return "Battery reached 100% – charging stopped automatically."
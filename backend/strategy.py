@@ -0,0 +1,235 @@
+# strategy.py
+# Server-side charging strategies, run inside the simulation loop.
+#
+# Modes:
+# "manual"   -> no automation, clients start/stop charging themselves
+# "price"    -> charge during the N cheapest hours of the day
+# "load"     -> charge whenever the base load leaves fuse headroom
+# "schedule" -> follow the minimum-cost plan to reach a target SoC before
+#               a daily deadline (see charge_schedule.py), re-planned hourly
+#
+# Only vehicles in AUTO override are controlled; force_on/force_off win.
+
+import math
+
+import numpy as np
+
+from sim_model import (
+    energy_price,
+    base_load_residential_kwh,
+    max_power_residential_building,
+)
+from fleet import OVERRIDE_AUTO
+from battery_model import default_model
+import charge_schedule
+
+STRATEGY_MODES = ("manual", "price", "load", "schedule")
+
+changed_none = np.zeros(0, dtype=np.intp)
+
+# Vehicles planned per solver call in schedule mode (bounds memory use)
+plan_chunk = 100_000
+
+# Remaining need (kWh) treated as "target reached": above the CC-CV knee the
+# battery takes less than the planned power, so the last few tenths of a
+# kWh are not worth re-planning for
+plan_tolerance = 0.2
+
+
+def whole_number(value, name):
+    """`value` as an int; fractions, booleans and non-numbers raise ValueError."""
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be an integer")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer") from None
+    if not number.is_integer():
+        raise ValueError(f"{name} must be an integer")
+    return int(number)
+
+
+def cheapest_hours(prices, count):
+    """Boolean mask over the hours: True for the `count` cheapest ones."""
+    mask = np.zeros(len(prices), dtype=bool)
+    if count > 0:
+        # Stable sort: ties go to the earlier hour, like the dashboard did
+        mask[np.argsort(prices, kind="stable")[:count]] = True
+    return mask
+
+
+class StrategyController:
+    """
+    Decides per simulated hour whether AUTO vehicles should charge.
+
+    The cheapest-hour index is rebuilt only when the prices change
+    (set_prices), not on every tick.
+    """
+
+    def __init__(self, mode="manual", cheap_hours=8, min_headroom=0.0,
+                 target_percent=100.0, deadline_hour=7,
+                 prices=energy_price, base_loads=base_load_residential_kwh,
+                 max_power=max_power_residential_building):
+        self.mode = "manual"
+        self.cheap_hours = cheap_hours
+        self.min_headroom = min_headroom
+        self.target_percent = target_percent
+        self.deadline_hour = deadline_hour
+        self.max_power = max_power
+        self.base_loads = base_loads
+        self.prices = None
+        # Tomorrow's profiles, for schedule deadlines past midnight
+        self.next_prices = list(prices)
+        self.next_base_loads = list(base_loads)
+        self._cheap = None
+        self._planned_hour = None   # schedule mode: hour of the last plan
+        self._clear_limits = False  # schedule mode left: drop power caps
+        # Vehicles whose charging flag or power cap the last apply() changed
+        self.changed = changed_none
+        self.set_prices(prices)
+        self.configure(mode=mode)
+
+    def set_prices(self, prices):
+        """New price data: rebuild the cheapest-hour index once."""
+        self.prices = list(prices)
+        self._cheap = cheapest_hours(self.prices, self.cheap_hours)
+        self._planned_hour = None
+
+    def set_profiles(self, prices, base_loads, next_prices=None, next_base_loads=None):
+        """
+        Hourly prices and base loads of a new simulated day, and of the day
+        after it (default: the same day again).
+        """
+        self.base_loads = list(base_loads)
+        self.next_prices = list(prices if next_prices is None else next_prices)
+        self.next_base_loads = list(base_loads if next_base_loads is None else next_base_loads)
+        self.set_prices(prices)
+
+    def configure(self, mode=None, cheap_hours=None, min_headroom=None,
+                  target_percent=None, deadline_hour=None):
+        """Change mode and/or parameters (raises ValueError if invalid)."""
+        if mode is not None and mode not in STRATEGY_MODES:
+            raise ValueError("Invalid strategy mode")
+        if target_percent is not None:
+            target_percent = float(target_percent)
+            if not 0 <= target_percent <= 100:
+                raise ValueError("target_percent must be between 0 and 100")
+        if deadline_hour is not None:
+            deadline_hour = whole_number(deadline_hour, "deadline_hour")
+            if not 0 <= deadline_hour <= 23:
+                raise ValueError("deadline_hour must be between 0 and 23")
+        if cheap_hours is not None:
+            cheap_hours = whole_number(cheap_hours, "cheap_hours")
+            if not 0 <= cheap_hours <= len(self.prices):
+                raise ValueError(f"cheap_hours must be between 0 and {len(self.prices)}")
+        if min_headroom is not None:
+            min_headroom = float(min_headroom)
+            if not (math.isfinite(min_headroom) and min_headroom >= 0):
+                raise ValueError("min_headroom must be a finite number >= 0")
+
+        if mode is not None:
+            if self.mode == "schedule" and mode != "schedule":
+                self._clear_limits = True
+            self.mode = mode
+        if min_headroom is not None:
+            self.min_headroom = min_headroom
+        if target_percent is not None:
+            self.target_percent = target_percent
+        if deadline_hour is not None:
+            self.deadline_hour = deadline_hour
+        self._planned_hour = None  # re-plan with the new settings
+        if cheap_hours is not None and cheap_hours != self.cheap_hours:
+            self.cheap_hours = cheap_hours
+            self._cheap = cheapest_hours(self.prices, cheap_hours)
+
+    @property
+    def sets_limits(self):
+        """True if apply() may change the power caps (fleet.limit)."""
+        return self.mode == "schedule" or self._clear_limits
+
+    def wants_charging(self, hour):
+        """True/False for the hour-based modes, None otherwise."""
+        if self.mode in ("manual", "schedule"):
+            return None
+
+        # Never charge when the base load leaves no room under the fuse
+        if self.max_power - self.base_loads[hour] <= self.min_headroom:
+            return False
+        if self.mode == "load":
+            return True
+        return bool(self._cheap[hour])
+
+    def apply(self, hour, fleet, minute=0):
+        """
+        Start/stop the AUTO vehicles of `fleet` for this hour.
+        Returns the new charging flag of vehicle 0 if the strategy changed
+        it, else None. The ids of every vehicle it changed are left in
+        self.changed (for the load manager).
+        """
+        changed = []
+        if self._clear_limits:
+            changed.append(np.flatnonzero(np.isfinite(fleet.limit)))
+            fleet.limit.fill(np.inf)
+            self._clear_limits = False
+
+        before = bool(fleet.charging[0])
+
+        if self.mode == "schedule":
+            if self._planned_hour != hour:
+                changed.extend(self._replan(hour, minute, fleet))
+                self._planned_hour = hour
+        else:
+            want = self.wants_charging(hour)
+            if want is not None:
+                auto = fleet.override == OVERRIDE_AUTO
+                if want:
+                    # Vehicles stopped for overtemperature restart once cooled
+                    cool = fleet.temp <= default_model.resume_temperature
+                    ids = np.flatnonzero(auto & (fleet.percent < 100.0) & ~fleet.charging & cool)
+                    fleet.charging[ids] = True
+                else:
+                    ids = np.flatnonzero(auto & fleet.charging)
+                    fleet.charging[ids] = False
+                changed.append(ids)
+
+        self.changed = np.unique(np.concatenate(changed)) if changed else changed_none
+        after = bool(fleet.charging[0])
+        return after if after != before else None
+
+    def _replan(self, hour, minute, fleet):
+        """
+        Schedule mode: plan AUTO vehicles, run this hour's part of it.
+        Returns the ids of the vehicles it changed, one array per chunk.
+        """
+        auto = np.flatnonzero(fleet.override == OVERRIDE_AUTO)
+        changed = []
+
+        for start in range(0, len(auto), plan_chunk):
+            ids = auto[start:start + plan_chunk]
+            _, power_plan, need = charge_schedule.plan(
+                fleet.kwh[ids], fleet.capacity[ids], fleet.power[ids],
+                self.target_percent, hour, minute, self.deadline_hour,
+                prices=self.prices + self.next_prices,
+                base_loads=self.base_loads + self.next_base_loads,
+                max_power=self.max_power,
+            )
+            now = power_plan[:, 0]
+            run = (now > 1e-9) & (need > plan_tolerance) & (fleet.percent[ids] < 100.0)
+            run &= fleet.charging[ids] | (fleet.temp[ids] <= default_model.resume_temperature)
+
+            # Charge at the planned power for this hour
+            limit = np.where(run, now, np.inf)
+            changed.append(ids[(fleet.limit[ids] != limit) | (fleet.charging[ids] != run)])
+            fleet.limit[ids] = limit
+            fleet.charging[ids] = run
+        return changed
+
+    def info(self):
+        return {
+            "mode": self.mode,
+            "cheap_hours": self.cheap_hours,
+            "min_headroom_kW": self.min_headroom,
+            "cheapest_hours": [int(h) for h in np.flatnonzero(self._cheap)],
+            "target_percent": self.target_percent,
+            "deadline_hour": self.deadline_hour,
+        }
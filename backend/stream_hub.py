@@ -0,0 +1,223 @@
+# stream_hub.py
+# Fan-out of simulation state to streaming clients (SSE and WebSocket).
+#
+# The tick loop publishes the current state once per step. The hub keeps
+# only the latest state and serializes it at most once per step: the
+# delta (changed fields) for subscribers that are up to date and the full
+# state for new or lagging subscribers. Every subscriber gets the same
+# pre-encoded message.
+#
+# Thread subscribers (Flask) use messages(); asyncio subscribers (the ASGI
+# server) use amessages(), which wakes each event loop once per change
+# instead of holding a thread per subscriber.
+#
+# The hub also remembers the last `history` states by their version field,
+# so a long-polling client can ask for the fields changed since the
+# version it saw last (changes_since, wait_newer / await_newer).
+
+import json
+import asyncio
+import threading
+from collections import OrderedDict
+
+
+class Message:
+    """One published state change, encoded lazily and only once."""
+
+    __slots__ = ("seq", "kind", "data", "_payload", "_sse")
+
+    def __init__(self, seq, kind, data):
+        self.seq = seq
+        self.kind = kind      # "state" (full) or "delta"
+        self.data = data
+        self._payload = None
+        self._sse = None
+
+    @property
+    def payload(self):
+        """JSON text, used as WebSocket message."""
+        if self._payload is None:
+            self._payload = json.dumps(
+                {"seq": self.seq, "type": self.kind, "data": self.data}
+            )
+        return self._payload
+
+    @property
+    def sse(self):
+        """Server-Sent Events frame (bytes)."""
+        if self._sse is None:
+            self._sse = (
+                f"id: {self.seq}\nevent: {self.kind}\ndata: {self.payload}\n\n"
+            ).encode()
+        return self._sse
+
+
+class StreamHub:
+    """Latest state + change notification for any number of subscribers."""
+
+    def __init__(self, version_key="version", history=256):
+        self._cond = threading.Condition()
+        self.version_key = version_key
+        self.history = history
+        self._history = OrderedDict()  # version -> state
+        self._seq = 0
+        self._state = {}
+        self._delta = None   # Message for the latest change
+        self._full = None    # Message with the full latest state (lazy)
+        self._loop_events = {}  # event loop -> asyncio.Event set on the next change
+        self.subscribers = 0
+
+    def publish(self, state):
+        """Publish the current state; does nothing if no field changed."""
+        delta = {
+            key: value
+            for key, value in state.items()
+            if key not in self._state or self._state[key] != value
+        }
+        if not delta:
+            return
+
+        with self._cond:
+            self._seq += 1
+            self._state = dict(state)
+            version = state.get(self.version_key)
+            if version is not None:
+                self._history[version] = self._state
+                if len(self._history) > self.history:
+                    self._history.popitem(last=False)
+            self._delta = Message(self._seq, "delta", delta)
+            self._full = None
+            self._cond.notify_all()
+            self._wake_loops()
+
+    def _wake_loops(self):
+        # Caller holds self._cond; one wake-up per event loop
+        events, self._loop_events = self._loop_events, {}
+        for loop, event in events.items():
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+    def _full_message(self):
+        # Caller holds self._cond
+        if self._full is None:
+            self._full = Message(self._seq, "state", self._state)
+        return self._full
+
+    def _loop_event(self, loop):
+        # Caller holds self._cond: event set on the next change
+        event = self._loop_events.get(loop)
+        if event is None:
+            event = self._loop_events[loop] = asyncio.Event()
+        return event
+
+    # ---- versions (long polling) ----
+    @property
+    def version(self):
+        return self._state.get(self.version_key)
+
+    def _newer(self, version):
+        current = self._state.get(self.version_key)
+        return current is not None and current > version
+
+    def changes_since(self, version):
+        """
+        Fields that changed after state `version` (always with the current
+        version), or the full state if `version` is not in the history.
+        """
+        with self._cond:
+            current = self._state
+            old = self._history.get(version)
+        if old is None:
+            return dict(current)
+        changes = {
+            key: value
+            for key, value in current.items()
+            if key not in old or old[key] != value
+        }
+        changes[self.version_key] = current.get(self.version_key)
+        return changes
+
+    def wait_newer(self, version, timeout):
+        """Block until the state moved past `version`; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._newer(version), timeout)
+
+    async def await_newer(self, version, timeout):
+        """wait_newer() for the running asyncio event loop."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self._cond:
+                if self._newer(version):
+                    return True
+                event = self._loop_event(loop)
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    # ---- subscribers ----
+    def _next_message(self, last):
+        # Caller holds self._cond: message for a subscriber that saw `last`
+        if self._seq == last or self._seq == 0:
+            return None
+        if last is not None and self._seq == last + 1:
+            return self._delta
+        return self._full_message()
+
+    def messages(self, keepalive=15.0):
+        """
+        Yield Message objects for one subscriber, forever.
+
+        The first message is the full state. After that only deltas, unless
+        the subscriber fell behind, then it gets the full state again.
+        Yields None every `keepalive` seconds without changes.
+        """
+        last = None
+        with self._cond:
+            self.subscribers += 1
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(
+                        lambda: self._seq != last and self._seq > 0,
+                        timeout=keepalive,
+                    )
+                    message = self._next_message(last)
+                    if message is not None:
+                        last = message.seq
+                yield message
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+    async def amessages(self, keepalive=15.0):
+        """messages() for a subscriber on the running asyncio event loop."""
+        loop = asyncio.get_running_loop()
+        last = None
+        with self._cond:
+            self.subscribers += 1
+        try:
+            while True:
+                with self._cond:
+                    message = self._next_message(last)
+                    if message is None:
+                        event = self._loop_event(loop)
+
+                if message is None:
+                    try:
+                        await asyncio.wait_for(event.wait(), keepalive)
+                        continue
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    last = message.seq
+                yield message
+        finally:
+            with self._cond:
+                self.subscribers -= 1
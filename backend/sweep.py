@@ -0,0 +1,317 @@
+# sweep.py
+# Parallel parameter sweep / Monte Carlo runner on top of fast_forward.
+#
+# A scenario is a small dict of parameters (mode, charger power, battery
+# capacity, start SoC, days and an optional random profile seed). Scenarios
+# are spread over a process pool; each result is memoized on disk under a
+# hash of its parameters, so repeating or extending a sweep only runs the
+# new scenarios. Results are aggregated into percentile tables.
+#
+# Usage:
+#   python sweep.py                                  # default grid
+#   python sweep.py --powers 3.7 7.4 11 22 --capacities 46.3 77 --samples 200
+#   python sweep.py --by mode power --json sweep.json
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sim_model import (
+    energy_price,
+    base_load_residential_kwh,
+    ev_batt_max_capacity,
+    ev_batt_start_percent,
+    charging_power,
+)
+import fast_forward
+
+# Bump when the simulation model changes: old cache entries are then ignored
+model_version = 3
+
+# Default on-disk result cache
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sweep_cache")
+
+# Default sweep axes
+default_powers = [3.7, 7.4, 11.0, 22.0]               # kW
+default_capacities = [ev_batt_max_capacity]           # kWh
+default_modes = list(fast_forward.MODES)
+
+# Metrics aggregated into the percentile tables
+metrics = ("cost_ore", "energy_charged_kWh", "peak_load_kW", "time_to_full_h")
+default_percentiles = (5, 25, 50, 75, 95)
+
+
+# ------------------------------
+# SCENARIOS
+# ------------------------------
+
+def scenario(mode="price", power=charging_power, capacity=ev_batt_max_capacity,
+             start_percent=ev_batt_start_percent, days=1, seed=None,
+             price_sigma=0.0, load_sigma=0.0):
+    """One scenario as a plain dict (hashable via scenario_key)."""
+    return {
+        "mode": mode,
+        "power": float(power),
+        "capacity": float(capacity),
+        "start_percent": float(start_percent),
+        "days": float(days),
+        "seed": seed,
+        "price_sigma": float(price_sigma),
+        "load_sigma": float(load_sigma),
+    }
+
+
+def grid(modes=default_modes, powers=default_powers,
+         capacities=default_capacities, samples=1, seed=0, **fixed):
+    """
+    Cartesian product of the axes. With samples > 1 every combination is
+    repeated with `samples` random profiles (seeds seed, seed+1, ...).
+    """
+    seeds = [None] if samples <= 1 else range(seed, seed + samples)
+    return [
+        scenario(mode=m, power=p, capacity=c, seed=s, **fixed)
+        for m, p, c, s in itertools.product(modes, powers, capacities, seeds)
+    ]
+
+
+def scenario_key(params):
+    """Stable hash of the scenario parameters (and the model version)."""
+    blob = json.dumps([model_version, params], sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def profiles(params):
+    """
+    Price and base-load profiles for a scenario: the built-in ones, or
+    (with a seed) randomly scaled per hour by lognormal noise.
+    """
+    prices = np.asarray(energy_price, dtype=np.float64)
+    loads = np.asarray(base_load_residential_kwh, dtype=np.float64)
+
+    if params["seed"] is not None:
+        rng = np.random.default_rng(params["seed"])
+        prices = prices * rng.lognormal(0.0, params["price_sigma"], prices.size)
+        loads = loads * rng.lognormal(0.0, params["load_sigma"], loads.size)
+
+    return prices.round(2).tolist(), loads.round(2).tolist()
+
+
+def run_scenario(params):
+    """Run one scenario (top-level so the process pool can pickle it)."""
+    prices, loads = profiles(params)
+    result = fast_forward.simulate(
+        mode=params["mode"],
+        start_percent=params["start_percent"],
+        days=params["days"],
+        power=params["power"],
+        capacity=params["capacity"],
+        prices=prices,
+        base_loads=loads,
+    )
+
+    # Keep cache entries small: count events instead of listing them
+    events = result.pop("events")
+    result["overtemp_stops"] = sum(e["event"] == "overtemp" for e in events)
+    result["full_stops"] = sum(e["event"] == "full" for e in events)
+    return result
+
+
+# ------------------------------
+# RESULT CACHE
+# ------------------------------
+
+class ResultCache:
+    """One JSON file per scenario, named by its parameter hash."""
+
+    def __init__(self, directory=cache_dir):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, result):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file and rename: concurrent sweeps never see
+        # half-written entries
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(tmp, path)
+
+
+# ------------------------------
+# SWEEP
+# ------------------------------
+
+def run_sweep(scenarios, workers=None, cache=None, chunksize=None):
+    """
+    Run all scenarios, in parallel, skipping the ones already cached.
+
+    Returns (results, stats): results in scenario order (each with its
+    "params"), stats with counts of cached and computed scenarios.
+    """
+    started = time.perf_counter()
+    keys = [scenario_key(p) for p in scenarios]
+
+    results = [None] * len(scenarios)
+    todo = []
+    for index, key in enumerate(keys):
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            results[index] = cached
+        else:
+            todo.append(index)
+
+    if todo:
+        workers = workers or os.cpu_count() or 1
+        if chunksize is None:
+            # A few chunks per worker: low IPC overhead, still balanced
+            chunksize = max(1, len(todo) // (workers * 4))
+
+        jobs = [scenarios[i] for i in todo]
+        if workers == 1:
+            computed = map(run_scenario, jobs)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            computed = pool.map(run_scenario, jobs, chunksize=chunksize)
+
+        try:
+            for index, result in zip(todo, computed):
+                results[index] = result
+                if cache is not None:
+                    cache.put(keys[index], result)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    for params, result in zip(scenarios, results):
+        result["params"] = params
+
+    stats = {
+        "scenarios": len(scenarios),
+        "cached": len(scenarios) - len(todo),
+        "computed": len(todo),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+    return results, stats
+
+
+def percentile_table(results, by=("power", "capacity"), percentiles=default_percentiles):
+    """
+    Group results by the given parameters and compute percentiles of each
+    metric. Returns a list of rows:
+      {"power": 7.4, "capacity": 46.3, "runs": 200,
+       "cost_ore": {"p5": ..., "p50": ..., ...}, ...}
+    """
+    groups = {}
+    for result in results:
+        group = tuple(result["params"][name] for name in by)
+        groups.setdefault(group, []).append(result)
+
+    rows = []
+    for group in sorted(groups):
+        members = groups[group]
+        row = dict(zip(by, group))
+        row["runs"] = len(members)
+
+        for metric in metrics:
+            values = np.array(
+                [r[metric] for r in members if r[metric] is not None],
+                dtype=np.float64,
+            )
+            if metric == "time_to_full_h":
+                row["reached_full"] = round(values.size / len(members), 3)
+            if values.size == 0:
+                row[metric] = None
+                continue
+            row[metric] = {
+                f"p{q}": round(float(v), 2)
+                for q, v in zip(percentiles, np.percentile(values, percentiles))
+            }
+        rows.append(row)
+    return rows
+
+
+def print_table(rows, by):
+    """Plain-text table with p5 / p50 / p95 of every metric."""
+    header = [f"{name:>10}" for name in by] + [f"{'runs':>6}"]
+    for metric in metrics:
+        header.append(f"{metric + ' p5/p50/p95':>34}")
+    print("  ".join(header))
+
+    for row in rows:
+        line = [f"{str(row[name]):>10}" for name in by] + [f"{row['runs']:>6}"]
+        for metric in metrics:
+            stats = row[metric]
+            if stats is None:
+                line.append(f"{'-':>34}")
+            else:
+                cell = f"{stats['p5']:.1f} / {stats['p50']:.1f} / {stats['p95']:.1f}"
+                line.append(f"{cell:>34}")
+        print("  ".join(line))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel EV charging parameter sweep")
+    parser.add_argument("--modes", nargs="+", choices=fast_forward.MODES, default=default_modes)
+    parser.add_argument("--powers", nargs="+", type=float, default=default_powers,
+                        help="charger powers in kW")
+    parser.add_argument("--capacities", nargs="+", type=float, default=default_capacities,
+                        help="usable battery capacities in kWh")
+    parser.add_argument("--start", type=float, default=ev_batt_start_percent,
+                        help="start SoC in percent")
+    parser.add_argument("--days", type=float, default=1, help="horizon in days")
+    parser.add_argument("--samples", type=int, default=100,
+                        help="random price/load profiles per combination")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--price-sigma", type=float, default=0.3,
+                        help="lognormal sigma of the hourly price noise")
+    parser.add_argument("--load-sigma", type=float, default=0.2,
+                        help="lognormal sigma of the hourly base-load noise")
+    parser.add_argument("--by", nargs="+", default=["mode", "power", "capacity"],
+                        choices=["mode", "power", "capacity", "start_percent", "days"],
+                        help="parameters to group the percentile table by")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", default=cache_dir)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--json", help="write the percentile table to this file")
+    args = parser.parse_args()
+
+    scenarios = grid(
+        modes=args.modes, powers=args.powers, capacities=args.capacities,
+        samples=args.samples, seed=args.seed,
+        start_percent=args.start, days=args.days,
+        price_sigma=args.price_sigma, load_sigma=args.load_sigma,
+    )
+    cache = None if args.no_cache else ResultCache(args.cache_dir)
+
+    results, stats = run_sweep(scenarios, workers=args.workers, cache=cache)
+    rows = percentile_table(results, by=args.by)
+
+    print_table(rows, args.by)
+    print(f"\n{stats['scenarios']} scenarios: {stats['computed']} computed, "
+          f"{stats['cached']} from cache, {stats['elapsed_s']} s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"stats": stats, "table": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+# telemetry.py
+# Append-only, memory-mapped columnar time series of the simulation.
+#
+# Every tick appends one row (simulated time, SoC, load, price, charging,
+# fleet mean SoC and fleet charging power) to the raw tier. The same row
+# is folded into rollup tiers (per quarter hour, hour and day) that keep
+# min / max / mean per bucket, so a query over months of simulated time
+# reads a few thousand hourly or daily rows instead of the raw ticks.
+# There is no minute tier: one tick is one simulated minute, so it would
+# only copy the raw tier.
+#
+# Layout on disk (one directory):
+#   raw.t.f8, raw.soc.f4, ...           one file per column and tier
+#   raw.len, 900.len, 3600.len, ...      row counts (memory-mapped int64)
+#
+# Time is simulated seconds since the store was created. It never goes
+# backwards (a /discharge resets the clock, not the store).
+
+import os
+import threading
+
+import numpy as np
+
+# Values recorded per tick
+METRICS = ("soc", "load", "price", "charging", "fleet_soc", "fleet_kw")
+
+# Rollup tiers: bucket width in simulated seconds
+ROLLUPS = (900, 3600, 86400)
+TIER_NAMES = {900: "quarter", 3600: "hour", 86400: "day"}
+
+AGGREGATES = ("min", "max", "mean")
+
+# Default store location next to this module
+telemetry_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "telemetry")
+
+# Upper bound of points returned by one query
+max_points = 5000
+
+
+class Series:
+    """Named float columns in growable memory-mapped files, plus a length."""
+
+    def __init__(self, directory, tier, columns, capacity=4096):
+        self.directory = directory
+        self.tier = tier
+        self.columns = columns      # {name: dtype}
+        self.arrays = {}
+
+        length_path = self._path("len")
+        mode = "r+" if os.path.exists(length_path) else "w+"
+        self._length = np.memmap(length_path, dtype=np.int64, mode=mode, shape=(1,))
+
+        capacity = max(capacity, int(self._length[0]))
+        self._map(capacity)
+
+    def _path(self, column, dtype=None):
+        suffix = f".{np.dtype(dtype).str[1:]}" if dtype is not None else ""
+        return os.path.join(self.directory, f"{self.tier}.{column}{suffix}")
+
+    def _map(self, capacity):
+        """(Re)map every column file with room for `capacity` rows."""
+        for name, dtype in self.columns.items():
+            path = self._path(name, dtype)
+            size = capacity * np.dtype(dtype).itemsize
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            self.arrays[name] = np.memmap(path, dtype=dtype, mode="r+", shape=(capacity,))
+        self.capacity = capacity
+
+    def __len__(self):
+        return int(self._length[0])
+
+    def append(self, row):
+        """Append one row (dict of column -> value)."""
+        n = len(self)
+        if n == self.capacity:
+            self.flush()
+            self._map(self.capacity * 2)
+
+        for name, value in row.items():
+            self.arrays[name][n] = value
+        # Publish the row only after every column is written
+        self._length[0] = n + 1
+
+    def last(self, column):
+        n = len(self)
+        return float(self.arrays[column][n - 1]) if n else None
+
+    def slice(self, t_from, t_to):
+        """Copies of all columns for rows with t_from <= t < t_to."""
+        n = len(self)
+        t = self.arrays["t"][:n]
+        lo, hi = np.searchsorted(t, [t_from, t_to])
+        return {name: np.array(array[lo:hi]) for name, array in self.arrays.items()}
+
+    def flush(self):
+        for array in self.arrays.values():
+            array.flush()
+        self._length.flush()
+
+
+class Bucket:
+    """Running min / max / sum of the current rollup bucket."""
+
+    __slots__ = ("start", "count", "low", "high", "total")
+
+    def __init__(self, start, row):
+        self.start = start
+        self.count = 1
+        self.low = dict(row)
+        self.high = dict(row)
+        self.total = dict(row)
+
+    def add(self, row):
+        self.count += 1
+        for name, value in row.items():
+            if value < self.low[name]:
+                self.low[name] = value
+            if value > self.high[name]:
+                self.high[name] = value
+            self.total[name] += value
+
+    def row(self):
+        out = {"t": self.start, "n": self.count}
+        for name in self.total:
+            out[f"{name}_min"] = self.low[name]
+            out[f"{name}_max"] = self.high[name]
+            out[f"{name}_mean"] = self.total[name] / self.count
+        return out
+
+
+class TelemetryStore:
+    """
+    Raw tier plus rollup tiers, written by the simulation thread and read
+    by /history (a short internal lock keeps appends and reads apart).
+    """
+
+    def __init__(self, directory=telemetry_dir, step_seconds=60):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.step_seconds = step_seconds
+        self._lock = threading.Lock()
+
+        raw_columns = {"t": np.float64}
+        raw_columns.update({name: np.float32 for name in METRICS})
+        self.raw = Series(directory, "raw", raw_columns)
+
+        rollup_columns = {"t": np.float64, "n": np.int32}
+        for name in METRICS:
+            for agg in AGGREGATES:
+                rollup_columns[f"{name}_{agg}"] = np.float32
+        self.rollups = {res: Series(directory, str(res), rollup_columns, 256) for res in ROLLUPS}
+        self._buckets = {res: self._reopen(res) for res in ROLLUPS}
+
+        # Continue after the last stored row
+        last = self.raw.last("t")
+        self.now = -step_seconds if last is None else last
+
+    def _reopen(self, res):
+        """
+        Rebuild the open bucket of a tier from the raw rows after its last
+        closed bucket. Buckets the raw tier holds but the tier lost (closed
+        just before a crash) are appended again.
+        """
+        last = self.rollups[res].last("t")
+        data = self.raw.slice(0.0 if last is None else last + res, np.inf)
+        bucket = None
+        for i, t in enumerate(data["t"].tolist()):
+            row = {name: float(data[name][i]) for name in METRICS}
+            start = t - t % res
+            if bucket is not None and bucket.start == start:
+                bucket.add(row)
+                continue
+            if bucket is not None:
+                self.rollups[res].append(bucket.row())
+            bucket = Bucket(start, row)
+        return bucket
+
+    def append(self, **values):
+        """Record one tick; advances simulated time by step_seconds."""
+        row = {name: float(values[name]) for name in METRICS}
+
+        with self._lock:
+            self.now += self.step_seconds
+            t = self.now
+            self.raw.append({"t": t, **row})
+
+            for res in ROLLUPS:
+                start = t - t % res
+                bucket = self._buckets[res]
+                if bucket is not None and bucket.start == start:
+                    bucket.add(row)
+                    continue
+                if bucket is not None:
+                    self.rollups[res].append(bucket.row())   # bucket closed
+                self._buckets[res] = Bucket(start, row)
+
+    def flush(self):
+        with self._lock:
+            self.raw.flush()
+            for series in self.rollups.values():
+                series.flush()
+
+    def tier_for(self, step):
+        """Coarsest tier whose resolution still fits `step` seconds."""
+        best = None
+        for res in ROLLUPS:
+            if res <= step:
+                best = res
+        return best
+
+    def _rows(self, res, t_from, t_to):
+        """
+        Rows of a tier as {"t", "n", "<metric>_min/max/mean"} arrays,
+        including the still open rollup bucket.
+        """
+        with self._lock:
+            if res is None:
+                data = self.raw.slice(t_from, t_to)
+                rows = {"t": data["t"], "n": np.ones(len(data["t"]), dtype=np.int32)}
+                for name in METRICS:
+                    for agg in AGGREGATES:
+                        rows[f"{name}_{agg}"] = data[name]
+                return rows
+
+            rows = self.rollups[res].slice(t_from, t_to)
+            bucket = self._buckets[res]
+            if bucket is not None and t_from <= bucket.start < t_to:
+                current = bucket.row()
+                rows = {name: np.append(rows[name], current[name]) for name in rows}
+            return rows
+
+    def query(self, t_from=None, t_to=None, step=None, method="minmax", fields=METRICS):
+        """
+        Downsampled history between t_from and t_to (simulated seconds).
+
+        method "minmax": one point per `step` seconds with min/max/mean.
+        method "lttb":   largest-triangle-three-buckets on the mean values,
+                         (t_to - t_from) / step points per field.
+        """
+        if method not in ("minmax", "lttb"):
+            raise ValueError("method must be 'minmax' or 'lttb'")
+        unknown = set(fields) - set(METRICS)
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+
+        now = self.now
+        if t_to is None:
+            t_to = now + self.step_seconds
+        if t_from is None:
+            t_from = max(0.0, t_to - 86400)
+        if t_to <= t_from:
+            raise ValueError("'to' must be after 'from'")
+
+        span = t_to - t_from
+        step = max(step or span / 500, self.step_seconds)
+        points = int(np.ceil(span / step))
+        if points > max_points:
+            raise ValueError(f"step gives more than {max_points} points")
+
+        res = self.tier_for(step)
+        rows = self._rows(res, t_from, t_to)
+
+        result = {
+            "from": t_from,
+            "to": t_to,
+            "step": step,
+            "now": now,
+            "tier": TIER_NAMES.get(res, "raw"),
+            "rows_read": int(len(rows["t"])),
+            "method": method,
+        }
+
+        if method == "lttb":
+            result["series"] = {
+                name: lttb(rows["t"], rows[f"{name}_mean"], points)
+                for name in fields
+            }
+            return result
+
+        t, series = minmax_buckets(rows, fields, t_from, step)
+        result["t"] = t
+        result["series"] = series
+        return result
+
+
+def minmax_buckets(rows, fields, t_from, step):
+    """Combine tier rows into fixed `step`-second buckets."""
+    if len(rows["t"]) == 0:
+        return [], {name: {agg: [] for agg in AGGREGATES} for name in fields}
+
+    index = ((rows["t"] - t_from) // step).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    weights = rows["n"].astype(np.float64)
+    counts = np.add.reduceat(weights, starts)
+
+    series = {}
+    for name in fields:
+        low = np.minimum.reduceat(rows[f"{name}_min"], starts)
+        high = np.maximum.reduceat(rows[f"{name}_max"], starts)
+        mean = np.add.reduceat(rows[f"{name}_mean"] * weights, starts) / counts
+        series[name] = {
+            "min": np.round(low.astype(np.float64), 3).tolist(),
+            "max": np.round(high.astype(np.float64), 3).tolist(),
+            "mean": np.round(mean, 3).tolist(),
+        }
+
+    t = (t_from + index[starts] * step).tolist()
+    return t, series
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-triangle-three-buckets downsampling of (x, y) to `threshold`
+    points. Returns {"t": [...], "v": [...]}.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return {"t": x.tolist(), "v": np.round(y.astype(np.float64), 3).tolist()}
+
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    picked = [0]
+    a = 0
+    for b in range(threshold - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        nlo, nhi = edges[b + 1], edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+
+        # Point in this bucket with the largest triangle area
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        picked.append(a)
+    picked.append(n - 1)
+
+    return {"t": x[picked].tolist(), "v": np.round(y[picked], 3).tolist()}
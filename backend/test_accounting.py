@@ -0,0 +1,73 @@
+# test_accounting.py
+# Accounting: running totals, the per-day reset and the /metrics text.
+#
+# Usage:
+#   cd backend && python -m unittest test_accounting
+
+import unittest
+
+import numpy as np
+
+from accounting import Accounting
+
+
+def metrics(text):
+    """{"name{labels}": value} of a Prometheus text exposition."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, value = line.rsplit(" ", 1)
+            samples[key] = float(value)
+    return samples
+
+
+class TotalsTest(unittest.TestCase):
+    def setUp(self):
+        self.accounting = Accounting()
+        # Day 0: one vehicle charging at 7.2 kW (0.12 kWh per minute tick)
+        for minute in range(120):
+            hour = minute // 60
+            self.accounting.record(0, "2024-01-01", hour, 0.12, 50.0 + hour * 10,
+                                   60, 4.0 + minute / 100, np.array([0, 0]))
+        self.accounting.record(0, "2024-01-01", 1, 0.0, 60.0, 0, 3.0, np.array([1, 2]))
+
+    def test_totals(self):
+        totals = self.accounting.totals
+        self.assertAlmostEqual(totals[0], 14.4)
+        self.assertAlmostEqual(totals[1], 60 * 0.12 * 50 + 60 * 0.12 * 60)
+        self.assertEqual(totals[2], 7200)
+        self.assertAlmostEqual(totals[3], 5.19)
+        np.testing.assert_array_equal(self.accounting.stops, [1, 2])
+        np.testing.assert_allclose(self.accounting.hourly[0, :3], [7.2, 7.2, 0.0])
+
+    def test_new_day_resets_today_only(self):
+        self.accounting.record(1, "2024-01-02", 0, 0.5, 20.0, 60, 2.0, np.array([0, 1]))
+        self.assertAlmostEqual(self.accounting.totals[0], 14.9)
+        np.testing.assert_allclose(self.accounting.today, [0.5, 10.0, 60, 2.0])
+        np.testing.assert_array_equal(self.accounting.day_stops, [0, 1])
+        np.testing.assert_array_equal(self.accounting.stops, [1, 3])
+        self.assertAlmostEqual(self.accounting.hourly[0].sum(), 0.5)
+        self.assertEqual(self.accounting.date, "2024-01-02")
+
+    def test_copy_is_independent(self):
+        copy = self.accounting.copy()
+        self.accounting.record(0, "2024-01-01", 5, 1.0, 10.0, 60, 1.0, np.array([0, 0]))
+        self.assertAlmostEqual(copy.totals[0], 14.4)
+        self.assertEqual(copy.load, 3.0)
+
+    def test_render(self):
+        text = self.accounting.render(extra=[("ev_fleet_vehicles", "gauge", "Vehicles", 3)])
+        samples = metrics(text)
+        self.assertAlmostEqual(samples["ev_energy_charged_kwh_total"], 14.4)
+        self.assertEqual(samples['ev_stops_total{reason="full"}'], 2)
+        self.assertEqual(samples["ev_building_load_kw"], 3.0)
+        self.assertEqual(samples["ev_fleet_vehicles"], 3)
+        self.assertAlmostEqual(samples['ev_day_peak_load_kw{date="2024-01-01"}'], 5.19)
+        self.assertAlmostEqual(
+            samples['ev_hour_charging_cost_ore{date="2024-01-01",hour="1"}'], 7.2 * 60)
+        self.assertIn("# TYPE ev_energy_charged_kwh_total counter", text)
+        self.assertTrue(text.endswith("\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
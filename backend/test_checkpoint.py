@@ -0,0 +1,133 @@
+# test_checkpoint.py
+# checkpoint.save/load: round trip of the v2 file format and the checks
+# that refuse other files.
+#
+# Usage:
+#   cd backend && python -m unittest test_checkpoint
+
+import os
+import json
+import tempfile
+import unittest
+
+import numpy as np
+
+import checkpoint
+from checkpoint import HEADER_DTYPE, HEADER_SIZE, FORMAT_VERSION
+from fleet import Fleet, COLUMNS
+from shared_state import SimView
+
+
+def sample_fleet(size=5):
+    fleet = Fleet(size, start_percent=30)
+    fleet.kwh[:] = np.linspace(5, 40, size)
+    fleet.percent[:] = np.round(fleet.kwh / fleet.capacity * 100, 2)
+    fleet.temp[1] = 41.5
+    fleet.limit[2] = 3.3
+    fleet.allocated[3] = 2.25
+    fleet.charging[[0, 3]] = True
+    fleet.set_override(4, "force_off")
+    fleet.priority[3] = 7
+    return fleet
+
+
+class RoundTripTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "checkpoint.bin")
+
+    def save(self, fleet, meta=None):
+        state = SimView(13, 45, 4.2, fleet, sim_day=3)
+        return checkpoint.save(self.path, state, log_cursor=17, meta=meta)
+
+    def test_round_trip(self):
+        fleet = sample_fleet()
+        meta = {"strategy": {"mode": "price", "cheap_hours": 6}, "load": {"mode": "priority"}}
+        written = self.save(fleet, meta)
+        self.assertEqual(written, os.path.getsize(self.path))
+        self.assertFalse(os.path.exists(f"{self.path}.tmp"))
+
+        saved = checkpoint.load(self.path)
+        self.assertEqual(
+            (saved.sim_day, saved.sim_hour, saved.sim_min, saved.base_current_load,
+             saved.log_cursor, saved.meta),
+            (3, 13, 45, 4.2, 17, meta),
+        )
+        for name, _ in COLUMNS:
+            with self.subTest(column=name):
+                np.testing.assert_array_equal(getattr(saved.fleet, name), getattr(fleet, name))
+
+        restored = Fleet(5)
+        checkpoint.copy_fleet(saved.fleet, restored)
+        for name, _ in COLUMNS:
+            np.testing.assert_array_equal(getattr(restored, name), getattr(fleet, name))
+        self.assertEqual(restored.vehicle(3), fleet.vehicle(3))
+
+    def test_v2_layout(self):
+        fleet = sample_fleet()
+        self.save(fleet, {"a": 1})
+        with open(self.path, "rb") as f:
+            data = f.read()
+
+        header = np.frombuffer(data, dtype=HEADER_DTYPE, count=1)[0]
+        self.assertEqual(bytes(header["magic"]), b"EVSIMCKP")
+        self.assertEqual(int(header["version"]), FORMAT_VERSION)
+        self.assertEqual(FORMAT_VERSION, 2)
+
+        # Columns back to back after the header, then the JSON trailer
+        offset = HEADER_SIZE
+        for name, dtype in COLUMNS:
+            column = np.frombuffer(data, dtype=dtype, count=fleet.size, offset=offset)
+            np.testing.assert_array_equal(column, getattr(fleet, name))
+            offset += column.nbytes
+        self.assertEqual(json.loads(data[offset:]), {"a": 1})
+
+        # load() maps the columns read-only instead of copying them
+        saved = checkpoint.load(self.path)
+        self.assertIsInstance(saved.fleet.kwh.base, np.memmap)
+        with self.assertRaises(ValueError):
+            saved.fleet.kwh[0] = 0.0
+
+    def test_size_mismatch(self):
+        self.save(sample_fleet(5))
+        with self.assertRaises(ValueError):
+            checkpoint.copy_fleet(checkpoint.load(self.path).fleet, Fleet(4))
+
+
+class InvalidFileTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "checkpoint.bin")
+        checkpoint.save(self.path, SimView(0, 0, 0.0, Fleet(2)))
+        with open(self.path, "rb") as f:
+            self.data = bytearray(f.read())
+
+    def assert_rejected(self, data):
+        with open(self.path, "wb") as f:
+            f.write(data)
+        with self.assertRaises(ValueError):
+            checkpoint.load(self.path)
+
+    def test_missing(self):
+        with self.assertRaises(OSError):
+            checkpoint.load(f"{self.path}.missing")
+
+    def test_too_short(self):
+        self.assert_rejected(self.data[:HEADER_SIZE - 1])
+
+    def test_wrong_magic(self):
+        self.assert_rejected(b"NOTACKPT" + self.data[8:])
+
+    def test_other_version(self):
+        header = np.frombuffer(self.data, dtype=HEADER_DTYPE, count=1).copy()
+        header["version"] = 1
+        self.assert_rejected(header.tobytes() + self.data[HEADER_DTYPE.itemsize:])
+
+    def test_truncated(self):
+        self.assert_rejected(self.data[:-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# test_dashboard.py
+# Smoke test of ev_dashboard against a live server, without a display.
+#
+# The server runs in a subprocess with a paused clock, so only the
+# dashboard's own commands change its state. Qt uses the offscreen
+# platform. Skipped when PyQt5 or matplotlib is not installed.
+#
+# Usage:
+#   cd backend && python -m unittest test_dashboard
+
+import os
+import sys
+import time
+import socket
+import unittest
+import subprocess
+import urllib.request
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+try:
+    from PyQt5.QtWidgets import QApplication
+    import ev_dashboard
+except ImportError:
+    ev_dashboard = None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@unittest.skipIf(ev_dashboard is None, "PyQt5 or matplotlib is not installed")
+class DashboardTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        port = free_port()
+        cls.url = f"http://127.0.0.1:{port}"
+        env = dict(
+            os.environ, PORT=str(port), EV_CLOCK_PAUSED="1",
+            EV_CHECKPOINT_FILE="", EV_LOG_FILE="", EV_TELEMETRY_DIR="",
+        )
+        env.pop("EV_SIM_ROLE", None)
+        cls.server = subprocess.Popen(
+            [sys.executable, "charging_simulation.py"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                urllib.request.urlopen(f"{cls.url}/info", timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or cls.server.poll() is not None:
+                    cls.server.kill()
+                    raise
+                time.sleep(0.2)
+        cls.app = QApplication.instance() or QApplication([])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait(10)
+
+    def setUp(self):
+        self.window = ev_dashboard.ChargingDashboard(self.url)
+        self.window.show()
+        self.addCleanup(self.window.close)
+
+    def wait_for(self, condition, timeout=10):
+        """Run the Qt event loop until condition() is true."""
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("dashboard did not update in time")
+            self.app.processEvents()
+            time.sleep(0.01)
+
+    def test_follows_the_server(self):
+        window = self.window
+        self.wait_for(lambda: window.connection_label.text() == "Live")
+        self.wait_for(lambda: len(window.history.view()[0]) > 0)
+        self.wait_for(lambda: any(window.price_chart.prices))
+
+        window._on_start_clicked()
+        self.wait_for(lambda: window.status_label.text() == "Charging")
+        window._on_stop_clicked()
+        self.wait_for(lambda: window.status_label.text() == "Stopped")
+
+        window.mode_selector.setCurrentText("Load")
+        self.wait_for(lambda: window.mode_badge.text() == "LOAD")
+        window.mode_selector.setCurrentText("Manual")
+        self.wait_for(lambda: window.mode_badge.text() == "MANUAL")
+
+        # One frame of the live chart renders without errors
+        window.live_chart.frame()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+# test_fast_forward.py
+# fast_forward.simulate against the stepped server simulation: same
+# multi-day data, same strategy, same fuse, same results.
+#
+# Usage:
+#   cd backend && python -m unittest test_fast_forward
+
+import os
+import unittest
+
+import numpy as np
+
+os.environ.update(EV_CHECKPOINT_FILE="", EV_TELEMETRY_DIR="", EV_LOG_FILE="")
+
+import charging_simulation as sim  # noqa: E402
+import fast_forward  # noqa: E402
+from accounting import Accounting, ENERGY, COST, PEAK  # noqa: E402
+from data_sources import DataSources, TimeSeries  # noqa: E402
+from sim_clock import VirtualClock  # noqa: E402
+
+sim.create_app(virtual_clock=VirtualClock(60, paused=True, now=lambda: 0.0), start=False)
+
+days = 3
+
+
+def quarter_hour_data(epoch):
+    """Three different days of quarter-hour data; days 0-1 leave < 7.4 kW headroom."""
+    rng = np.random.default_rng(7)
+    steps = days * 96
+    prices = rng.uniform(20, 200, steps).round(2)
+    loads = rng.uniform(0.5, 3.0, steps)
+    loads[:192] += 3.0  # 3.5-6 kW: the fuse caps the charger
+    return DataSources(
+        {"SE3": TimeSeries(prices, epoch, 900)},
+        {"SE3": TimeSeries(loads.round(2), epoch, 900)},
+    )
+
+
+class SteppedComparisonTest(unittest.TestCase):
+    def setUp(self):
+        self.client = sim.app.test_client()
+        self.saved = sim.data, sim.accounting
+        sim.data = quarter_hour_data(sim.data.epoch)
+        sim.accounting = Accounting()
+        sim.day_responses.clear()
+
+    def tearDown(self):
+        sim.data, sim.accounting = self.saved
+        self.client.post("/strategy", json={"mode": "manual"})
+        self.client.post("/discharge", json={"discharging": "on"})
+
+    def stepped(self, mode):
+        """Run the server loop for `days` in strategy `mode` (vehicle 0 only)."""
+        self.client.post("/discharge", json={"discharging": "on"})
+        self.client.post("/strategy", json={"mode": mode, "cheap_hours": 2})
+        sim.accounting = Accounting()
+        for _ in range(days * 24 * 60):
+            sim.advance()
+        return sim.accounting.totals, float(sim.fleet.kwh[0])
+
+    def test_price_and_load_modes(self):
+        self.assertEqual(sim.fleet.size, 1)
+        for mode in ("price", "load"):
+            with self.subTest(mode=mode):
+                totals, kwh = self.stepped(mode)
+                result = fast_forward.simulate(
+                    mode=mode, days=days, data=sim.data, fuse=sim.load_manager.fuse, hours=2
+                )
+                self.assertAlmostEqual(result["final_kWh"], round(kwh, 2))
+                self.assertAlmostEqual(result["energy_charged_kWh"], round(totals[ENERGY], 2))
+                self.assertAlmostEqual(result["cost_ore"], round(totals[COST], 2))
+                self.assertAlmostEqual(result["peak_load_kW"], totals[PEAK])
+                self.assertLessEqual(result["peak_load_kW"], sim.load_manager.fuse)
+
+    def test_days_differ(self):
+        # A week of the built-in profiles repeats day 0; this data does not
+        one = fast_forward.simulate(mode="price", days=1, data=sim.data, start_percent=0)
+        other = fast_forward.simulate(
+            mode="price", days=1, data=sim.data, start_percent=0, first_day=1
+        )
+        self.assertNotEqual(one["cost_ore"], other["cost_ore"])
+
+
+class FuseTest(unittest.TestCase):
+    def test_peak_stays_under_the_fuse(self):
+        for mode in fast_forward.MODES:
+            with self.subTest(mode=mode):
+                result = fast_forward.simulate(mode=mode, days=7)
+                self.assertLessEqual(result["peak_load_kW"], 11.0)
+        uncapped = fast_forward.simulate(mode="price", days=7, fuse=None)
+        self.assertGreater(uncapped["peak_load_kW"], 11.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# test_fleet.py
+# Fleet: copy-on-write snapshots and the per-vehicle commands.
+#
+# Usage:
+#   cd backend && python -m unittest test_fleet
+
+import unittest
+
+import numpy as np
+
+from fleet import Fleet, COLUMNS, OVERRIDE_FORCE_OFF
+
+
+class SnapshotTest(unittest.TestCase):
+    def test_snapshot_is_isolated_from_the_fleet(self):
+        fleet = Fleet(4)
+        frozen = fleet.snapshot()
+        fleet.kwh[:] = 1.0
+        fleet.charging[2] = True
+        self.assertTrue(np.all(frozen.kwh != 1.0))
+        self.assertFalse(frozen.charging.any())
+
+    def test_snapshot_is_read_only(self):
+        frozen = Fleet(3).snapshot()
+        for name, _ in COLUMNS:
+            with self.subTest(column=name):
+                with self.assertRaises(ValueError):
+                    getattr(frozen, name)[0] = 1
+
+    def test_unchanged_columns_are_shared(self):
+        fleet = Fleet(5)
+        first = fleet.snapshot()
+        fleet.charging[1] = True
+        second = fleet.snapshot(first, {"charging"})
+
+        for name, _ in COLUMNS:
+            with self.subTest(column=name):
+                if name == "charging":
+                    self.assertIsNot(second.charging, first.charging)
+                else:
+                    self.assertIs(getattr(second, name), getattr(first, name))
+        self.assertFalse(first.charging[1])
+        self.assertTrue(second.charging[1])
+
+    def test_changed_none_copies_everything(self):
+        fleet = Fleet(2)
+        first = fleet.snapshot()
+        second = fleet.snapshot(first)
+        for name, _ in COLUMNS:
+            self.assertIsNot(getattr(second, name), getattr(first, name))
+
+    def test_summary_reads_a_snapshot(self):
+        fleet = Fleet(4, start_percent=50)
+        fleet.set_charging(0, True)
+        frozen = fleet.snapshot()
+        fleet.set_charging(0, False)
+        self.assertEqual(frozen.summary()["charging"], 1)
+        self.assertEqual(fleet.summary()["charging"], 0)
+
+
+class CommandTest(unittest.TestCase):
+    def test_override_applies_immediately(self):
+        fleet = Fleet(3)
+        fleet.set_override(1, "force_on")
+        self.assertTrue(fleet.charging[1])
+        fleet.set_override(1, "force_off")
+        self.assertFalse(fleet.charging[1])
+        self.assertEqual(fleet.override[1], OVERRIDE_FORCE_OFF)
+        with self.assertRaises(ValueError):
+            fleet.set_override(1, "sometimes")
+
+    def test_rate_takes_the_lowest_cap(self):
+        fleet = Fleet(3, power=7.4)
+        fleet.limit[1] = 3.0
+        fleet.allocated[2] = 1.5
+        np.testing.assert_allclose(fleet.rate(), [7.4, 3.0, 1.5])
+
+    def test_reset(self):
+        fleet = Fleet(2, capacity=50.0)
+        fleet.set_override(0, "force_on")
+        fleet.priority[1] = 5
+        fleet.reset(20)
+        np.testing.assert_allclose(fleet.kwh, 10.0)
+        self.assertFalse(fleet.charging.any())
+        self.assertFalse(fleet.override.any())
+        self.assertFalse(fleet.priority.any())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# test_load_manager.py
+# LoadManager: fuse validation, fair and priority allocation and the
+# incremental charger bookkeeping.
+#
+# Usage:
+#   cd backend && python -m unittest test_load_manager
+
+import unittest
+
+import numpy as np
+
+from fleet import Fleet
+from load_manager import LoadManager
+from strategy import StrategyController
+
+
+class FuseTest(unittest.TestCase):
+    def test_rejects_non_finite_and_non_positive(self):
+        manager = LoadManager(4)
+        for fuse in (float("inf"), float("-inf"), float("nan"), "inf", 0, -3):
+            with self.subTest(fuse=fuse):
+                with self.assertRaises(ValueError):
+                    manager.configure(fuse=fuse)
+        self.assertEqual(manager.fuse, 11.0)
+
+    def test_accepts_finite(self):
+        manager = LoadManager(4)
+        manager.configure(fuse="16")
+        self.assertEqual(manager.fuse, 16.0)
+
+
+class AllocationTest(unittest.TestCase):
+    """How the headroom (fuse - base load) is shared."""
+
+    def setUp(self):
+        self.fleet = Fleet(6, power=7.4)
+        self.fleet.charging[:4] = True
+        self.manager = LoadManager(4)   # 11 kW fuse
+
+    def allocate(self, base_load):
+        self.manager.reload(self.fleet)
+        return self.manager.allocate(self.fleet, base_load)
+
+    def test_fair_shares_equally(self):
+        self.assertAlmostEqual(self.allocate(2.0), 9.0)
+        np.testing.assert_allclose(self.fleet.allocated[:4], 2.25)
+        # Vehicles behind the fuse only
+        self.assertTrue(np.all(np.isinf(self.fleet.allocated[4:])))
+
+    def test_fair_gives_small_demands_what_they_need(self):
+        self.fleet.power[0] = 1.0
+        self.allocate(2.0)
+        np.testing.assert_allclose(self.fleet.rate()[:4], [1.0, 8 / 3, 8 / 3, 8 / 3])
+
+    def test_priority_serves_higher_classes_first(self):
+        self.manager.configure(mode="priority")
+        self.fleet.priority[3] = 9
+        self.fleet.priority[2] = 5
+        self.allocate(2.0)
+        rate = self.fleet.rate()
+        self.assertAlmostEqual(rate[3], 7.4)
+        self.assertAlmostEqual(rate[2], 1.6)
+        np.testing.assert_allclose(rate[:2], 0.0)
+
+    def test_fair_ignores_priorities(self):
+        self.fleet.priority[3] = 9
+        self.allocate(2.0)
+        np.testing.assert_allclose(self.fleet.rate()[:4], 2.25)
+
+    def test_no_headroom(self):
+        self.assertEqual(self.allocate(12.0), 0.0)
+        np.testing.assert_allclose(self.fleet.rate()[:4], 0.0)
+        self.assertEqual(self.manager.info()["headroom_kW"], 0.0)
+
+    def test_everything_fits(self):
+        self.fleet.charging[1:4] = False
+        self.assertAlmostEqual(self.allocate(2.0), 7.4)
+        self.assertAlmostEqual(self.fleet.rate()[0], 7.4)
+
+    def test_follows_the_base_load(self):
+        self.allocate(2.0)
+        self.manager.allocate(self.fleet, 5.0)
+        np.testing.assert_allclose(self.fleet.allocated[:4], 1.5)
+
+
+class IncrementalTest(unittest.TestCase):
+    """Pushed changes keep the groups equal to a full rescan of the fleet."""
+
+    def assert_groups_match(self, manager, fleet):
+        rescanned = LoadManager(manager.chargers, manager.fuse, manager.mode)
+        rescanned.sync(fleet)
+        self.assertEqual(dict(manager._groups), dict(rescanned._groups))
+
+    def test_strategy_and_stops(self):
+        fleet = Fleet(40)
+        manager = LoadManager(25)
+        strategy = StrategyController(mode="schedule", target_percent=90)
+        fleet.kwh[:5] = fleet.capacity[:5] * 0.995  # these fill up soon
+
+        for step in range(24 * 60):
+            hour = step // 60 % 24
+            if step == 600:
+                strategy.configure(mode="price")
+            strategy.apply(hour, fleet, step % 60)
+            manager.chargers_changed(fleet, strategy.changed)
+            manager.allocate(fleet, 2.0)
+            overtemp, full = fleet.tick(60)
+            manager.chargers_changed(fleet, np.flatnonzero(overtemp | full))
+            if step % 97 == 0:
+                self.assert_groups_match(manager, fleet)
+        self.assert_groups_match(manager, fleet)
+
+    def test_command_and_reload(self):
+        fleet = Fleet(10)
+        manager = LoadManager(6)
+        fleet.set_charging(2, True)
+        fleet.priority[2] = 7
+        manager.charger_changed(fleet, 2)
+        self.assert_groups_match(manager, fleet)
+
+        fleet.charging[:] = True
+        fleet.reset()
+        fleet.charging[:4] = True
+        manager.reload(fleet)
+        self.assert_groups_match(manager, fleet)
+
+        # 11 kW fuse - 2 kW base load shared by 4 chargers
+        self.assertAlmostEqual(manager.allocate(fleet, 2.0), 9.0)
+        np.testing.assert_allclose(fleet.allocated[:4], 2.25)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,381 @@
+# test_server.py
+# HTTP tests of charging_simulation against the Flask test client.
+#
+# The server is set up with create_app(start=False) and a paused virtual
+# clock: no simulation thread, checkpoint, log file or telemetry, so
+# nothing changes the state between a test's requests.
+#
+# MultiWorkerTest runs a real gunicorn server (owner + 3 workers) in a
+# subprocess and is skipped when gunicorn is not installed.
+#
+# Usage:
+#   cd backend && python -m unittest test_server
+
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import unittest
+import subprocess
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+os.environ.update(EV_CHECKPOINT_FILE="", EV_TELEMETRY_DIR="", EV_LOG_FILE="")
+
+import charging_simulation as sim  # noqa: E402
+from data_sources import DataSources, TimeSeries  # noqa: E402
+from fleet import COLUMNS  # noqa: E402
+from sim_clock import VirtualClock  # noqa: E402
+
+sim.create_app(virtual_clock=VirtualClock(60, paused=True, now=lambda: 0.0), start=False)
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.client = sim.app.test_client()
+        self.client.post("/discharge", json={"discharging": "on"})
+
+    def info(self):
+        return json.loads(self.client.get("/info").data)
+
+    def test_batch_info_version_matches_info(self):
+        response = self.client.post("/batch", json={"ops": [
+            {"op": "charge", "charging": "on"},
+            {"op": "info"},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        batched = response.get_json()["results"][1]
+
+        info = self.info()
+        self.assertGreater(info["version"], 0)
+        self.assertEqual(batched["version"], info["version"])
+        self.assertEqual(batched, info)
+
+    def test_batch_info_version_after_steps(self):
+        for _ in range(3):
+            sim.advance()
+        response = self.client.post("/batch", json={"ops": [{"op": "info"}]})
+        self.assertEqual(response.get_json()["results"][0]["version"], self.info()["version"])
+
+    def test_invalid_op_applies_nothing(self):
+        before = self.info()
+        cases = (
+            ({"op": "charge", "charging": "yes"}, "Invalid command"),
+            ({"op": "override", "mode": "always"}, "Invalid mode"),
+            ({"op": "priority", "priority": 10}, "priority must be 0-9"),
+            ({"op": "priority", "priority": 2.0}, "priority must be 0-9"),
+            ({"op": "info", "vehicle": sim.fleet.size}, "Unknown vehicle"),
+            ({"op": "info", "vehicle": True}, "Unknown vehicle"),
+            ({"op": "fly"}, "Unknown op: fly"),
+            ("info", "operation must be an object"),
+        )
+        for op, error in cases:
+            with self.subTest(op=op):
+                response = self.client.post("/batch", json={"ops": [
+                    {"op": "charge", "charging": "on"}, op,
+                ]})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.get_json(), {"error": f"ops[1]: {error}"})
+        self.assertEqual(self.info(), before)
+        self.assertFalse(before["ev_battery_charge_start_stopp"])
+
+
+class JsonBodyTest(unittest.TestCase):
+    """Bodies that are valid JSON but not an object answer 400, not 500."""
+
+    def setUp(self):
+        self.client = sim.app.test_client()
+
+    def test_non_object_bodies(self):
+        paths = (
+            "/batch", "/discharge", "/charge", "/override", "/strategy",
+            "/loadmanagement", "/vehicles/0/priority", "/clock/speed", "/simulate",
+        )
+        for path in paths:
+            for body in ([], [{"op": "info"}], "on", 3):
+                with self.subTest(path=path, body=body):
+                    response = self.client.post(path, json=body)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.get_json(), {"error": "Body must be a JSON object"})
+
+    def test_batch_still_validates_ops(self):
+        response = self.client.post("/batch", json={"ops": []})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {"error": "ops must be a non-empty list"})
+
+
+class SnapshotTest(unittest.TestCase):
+    """Snapshots copy only the columns a write changed and match the fleet."""
+
+    def setUp(self):
+        self.client = sim.app.test_client()
+        self.client.post("/discharge", json={"discharging": "on"})
+
+    def tearDown(self):
+        self.client.post("/strategy", json={"mode": "manual"})
+
+    def assert_matches_fleet(self):
+        for name, _ in COLUMNS:
+            np.testing.assert_array_equal(getattr(sim.snapshot.fleet, name), getattr(sim.fleet, name), name)
+
+    def test_unchanged_columns_are_shared(self):
+        before = sim.snapshot.fleet
+        self.client.post("/vehicles/0/priority", json={"priority": 3})
+        after = sim.snapshot.fleet
+        self.assertIs(after.capacity, before.capacity)
+        self.assertIs(after.kwh, before.kwh)
+        self.assertIsNot(after.priority, before.priority)
+        self.assertEqual(after.priority[0], 3)
+
+    def test_snapshot_follows_ticks_and_commands(self):
+        for mode in ("manual", "price", "schedule", "manual"):
+            self.client.post("/strategy", json={"mode": mode, "target_percent": 90})
+            self.client.post("/charge", json={"charging": "on"})
+            for _ in range(5):
+                sim.advance()
+                self.assert_matches_fleet()
+            self.client.post("/override", json={"mode": "force_off"})
+            self.assert_matches_fleet()
+            self.client.post("/override", json={"mode": "auto"})
+
+
+class HistoryParamsTest(unittest.TestCase):
+    """Invalid from/to/step answer 400 instead of being ignored."""
+
+    def test_invalid_numbers(self):
+        client = sim.app.test_client()
+        for name in ("from", "to", "step"):
+            for value in ("abc", "1e", "nan", "inf", ""):
+                with self.subTest(name=name, value=value):
+                    response = client.get(f"/history?{name}={value}")
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.get_json(), {"error": f"{name} must be a number"})
+
+
+class LoadManagementTest(unittest.TestCase):
+    def test_non_finite_fuse(self):
+        client = sim.app.test_client()
+        for body in ('{"fuse_kW": 1e999}', '{"fuse_kW": "inf"}', '{"fuse_kW": "nan"}'):
+            with self.subTest(body=body):
+                response = client.post(
+                    "/loadmanagement", data=body, content_type="application/json"
+                )
+                self.assertEqual(response.status_code, 400)
+        info = client.get("/loadmanagement").get_json()
+        self.assertEqual(info["fuse_kW"], 11.0)
+
+
+class StrategyParamsTest(unittest.TestCase):
+    def test_invalid_values(self):
+        client = sim.app.test_client()
+        before = client.get("/strategy").get_json()
+        for body in ({"mode": "cheap"}, {"target_percent": 101}, {"target_percent": "x"},
+                     {"deadline_hour": 24}, {"cheap_hours": 25}, {"cheap_hours": -1},
+                     {"min_headroom": -0.5}, {"min_headroom": "inf"}):
+            with self.subTest(body=body):
+                response = client.post("/strategy", json=body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.get_json())
+        self.assertEqual(client.get("/strategy").get_json(), before)
+
+    def test_fractional_hours(self):
+        client = sim.app.test_client()
+        before = client.get("/strategy").get_json()
+        for body in ({"cheap_hours": 3.7}, {"cheap_hours": "3.7"}, {"cheap_hours": True},
+                     {"cheap_hours": "nan"}, {"deadline_hour": 6.5}):
+            with self.subTest(body=body):
+                response = client.post("/strategy", json=body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("must be an integer", response.get_json()["error"])
+        self.assertEqual(client.get("/strategy").get_json(), before)
+
+    def test_whole_hours(self):
+        client = sim.app.test_client()
+        before = client.get("/strategy").get_json()
+        try:
+            for value in (4, 4.0, "4"):
+                with self.subTest(value=value):
+                    response = client.post("/strategy", json={"cheap_hours": value})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.get_json()["cheap_hours"], 4)
+        finally:
+            client.post("/strategy", json={"cheap_hours": before["cheap_hours"]})
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+try:
+    import gunicorn  # noqa: F401
+except ImportError:
+    gunicorn = None
+
+
+@unittest.skipIf(gunicorn is None, "gunicorn is not installed")
+class MultiWorkerTest(unittest.TestCase):
+    """Long polls on workers never answer with a state older than `since`."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.port = free_port()
+        # A checkpoint path without a file (written only when the owner stops)
+        cls.tmp = tempfile.TemporaryDirectory()
+        env = dict(
+            os.environ, PORT=str(cls.port), WEB_CONCURRENCY="3",
+            EV_CLOCK_SPEED="100", EV_CLOCK_PAUSED="0",
+            EV_CHECKPOINT_FILE=os.path.join(cls.tmp.name, "checkpoint.bin"),
+            EV_CHECKPOINT_INTERVAL="3600", EV_LOG_FILE="", EV_TELEMETRY_DIR="",
+        )
+        env.pop("EV_SIM_ROLE", None)
+        cls.server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+             "charging_simulation:create_app()"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                cls.get("/info")
+                break
+            except OSError:
+                if time.monotonic() > deadline or cls.server.poll() is not None:
+                    cls.tearDownClass()
+                    raise
+                time.sleep(0.2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait(timeout=10)
+        cls.tmp.cleanup()
+
+    @classmethod
+    def get(cls, path):
+        with urllib.request.urlopen(f"http://127.0.0.1:{cls.port}{path}", timeout=10) as r:
+            return json.loads(r.read())
+
+    def post(self, path, body):
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{self.port}{path}", data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=10) as r:
+            return json.loads(r.read())
+
+    def test_long_poll_is_newer_than_since(self):
+        for _ in range(50):
+            since = self.get("/info")["version"]
+            changes = self.get(f"/info?since={since}&wait=5")
+            self.assertGreater(changes["version"], since)
+
+    def test_owner_errors_keep_their_status(self):
+        # FileNotFoundError in the owner: 404 like in a single process
+        for method, path in (("GET", "/checkpoint"), ("POST", "/restore")):
+            with self.subTest(path=path):
+                request = urllib.request.Request(
+                    f"http://127.0.0.1:{self.port}{path}", method=method
+                )
+                with self.assertRaises(urllib.error.HTTPError) as raised:
+                    urllib.request.urlopen(request, timeout=10)
+                self.assertEqual(raised.exception.code, 404)
+                self.assertEqual(json.loads(raised.exception.read()), {"error": "No checkpoint"})
+
+    def test_long_poll_after_batch(self):
+        self.post("/charge", {"charging": "on"})
+        for _ in range(10):
+            batched = self.post("/batch", {"ops": [
+                {"op": "charge", "charging": "off"},
+                {"op": "info"},
+            ]})["results"][1]
+            self.assertFalse(batched["ev_battery_charge_start_stopp"])
+            changes = self.get(f"/info?since={batched['version']}&wait=5")
+            self.assertGreater(changes["version"], batched["version"])
+            self.assertFalse(changes.get("ev_battery_charge_start_stopp", False))
+            self.post("/charge", {"charging": "on"})
+
+
+def two_day_data():
+    """Hourly data for simulated days 0 and 1: expensive, then cheap."""
+    prices = np.concatenate([np.full(24, 100.0), np.full(24, 10.0)])
+    return DataSources(
+        {"SE3": TimeSeries(prices, sim.data.epoch, 3600)},
+        {"SE3": TimeSeries(np.zeros(48), sim.data.epoch, 3600)},
+    )
+
+
+class DayDataTest(unittest.TestCase):
+    """?date= must fall inside the loaded data."""
+
+    def setUp(self):
+        self.client = sim.app.test_client()
+        self.saved = sim.data
+        sim.data = two_day_data()
+        sim.day_responses.clear()
+
+    def tearDown(self):
+        sim.data = self.saved
+        sim.day_responses.clear()
+
+    def test_dates_in_range(self):
+        for day, price in ((0, 100.0), (1, 10.0)):
+            date = sim.data.date_of(day).isoformat()
+            response = self.client.get(f"/priceperhour?date={date}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.data), [price] * 24)
+
+    def test_dates_out_of_range(self):
+        for path in ("/priceperhour", "/baseload"):
+            for day in (-1, 2, 400):
+                date = sim.data.date_of(day).isoformat()
+                with self.subTest(path=path, date=date):
+                    response = self.client.get(f"{path}?date={date}")
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn(date, response.get_json()["error"])
+
+
+class ScheduleTest(unittest.TestCase):
+    """Hours after midnight are planned with the next day's data."""
+
+    def setUp(self):
+        self.client = sim.app.test_client()
+        self.client.post("/discharge", json={"discharging": "on"})
+        self.saved = sim.data, sim.sim_hour
+        sim.data = two_day_data()
+
+    def tearDown(self):
+        sim.data, sim.sim_hour = self.saved
+        sim.publish_snapshot()
+
+    def test_overnight_hours_use_next_day(self):
+        sim.sim_hour = 22
+        sim.publish_snapshot()
+        plan = self.client.get("/schedule?vehicle=0&target=80&deadline=7").get_json()["plan"]
+        self.assertEqual([(row["day"], row["hour"]) for row in plan][:3], [(0, 22), (0, 23), (1, 0)])
+        for row in plan:
+            self.assertEqual(row["price"], 100.0 if row["day"] == 0 else 10.0)
+            if row["day"] == 0:
+                self.assertEqual(row["energy_kWh"], 0.0)
+
+    def test_invalid_parameters(self):
+        cases = (
+            ("vehicle=x", 400), ("target=high", 400), ("deadline=7.5", 400),
+            ("target=101", 400), ("target=nan", 400), ("deadline=24", 400),
+            (f"vehicle={sim.fleet.size}", 404), ("vehicle=-1", 404),
+        )
+        for query, status in cases:
+            with self.subTest(query=query):
+                response = self.client.get(f"/schedule?{query}")
+                self.assertEqual(response.status_code, status)
+                self.assertIn("error", response.get_json())
+
+
+if __name__ == "__main__":
+    unittest.main()
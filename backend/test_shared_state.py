@@ -0,0 +1,104 @@
+# test_shared_state.py
+# Shared-memory state and the owner/worker command channel.
+#
+# Usage:
+#   cd backend && python -m unittest test_shared_state
+
+import os
+import sys
+import json
+import secrets
+import tempfile
+import unittest
+import subprocess
+
+from shared_state import SharedState, CommandClient, serve_commands
+
+
+class Failure(Exception):
+    pass
+
+
+def handler(name, *args):
+    if name == "echo":
+        return args
+    if name == "missing":
+        raise FileNotFoundError("No checkpoint")
+    if name == "json":
+        return json.loads("{")
+    if name == "key":
+        return {}["vehicle"]
+    if name == "custom":
+        raise Failure("custom failure")
+    raise ValueError(f"Unknown command {name}")
+
+
+class CommandChannelTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        address = os.path.join(cls.tmp.name, "owner.sock")
+        authkey = secrets.token_bytes(16)
+        cls.listener = serve_commands(address, authkey, handler)
+        cls.client = CommandClient(address, authkey)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.listener.close()
+        cls.tmp.cleanup()
+
+    def test_result(self):
+        self.assertEqual(self.client.call("echo", 1, "on"), (1, "on"))
+
+    def test_error_types_cross_the_channel(self):
+        cases = (
+            ("missing", FileNotFoundError, "No checkpoint"),
+            ("json", ValueError, None),       # JSONDecodeError -> ValueError
+            ("key", KeyError, None),
+            ("custom", RuntimeError, "custom failure"),
+            ("nope", ValueError, "Unknown command nope"),
+        )
+        for name, error, message in cases:
+            with self.subTest(name=name):
+                with self.assertRaises(error) as raised:
+                    self.client.call(name)
+                self.assertIs(type(raised.exception), error)
+                if message is not None:
+                    self.assertEqual(str(raised.exception), message)
+
+
+class SharedStateTest(unittest.TestCase):
+    # The worker runs in its own process, as under gunicorn (an attach in
+    # the owner's process would unregister the segment from its tracker)
+    worker = (
+        "import sys, json; from shared_state import SharedState; "
+        "w = SharedState.attach(sys.argv[1]); "
+        "print(json.dumps(w.read(lambda s: [s.sim_hour, s.sim_min, s.sim_day, "
+        "s.base_current_load, s.version, float(s.fleet.kwh[2]), "
+        "float(s.fleet.capacity[3])]))); w.close()"
+    )
+
+    def test_worker_reads_owner_writes(self):
+        name = f"ev-test-{secrets.token_hex(4)}"
+        owner = SharedState.create(4, name=name)
+        try:
+            owner.begin_write()
+            self.assertIsNone(owner.version())  # write in progress
+            owner.fleet.kwh[2] = 12.5
+            owner.end_write(7, 30, 3.25, sim_day=2)
+            self.assertEqual(owner.version(), 2)
+
+            output = subprocess.run(
+                [sys.executable, "-c", self.worker, name], check=True,
+                capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout
+            self.assertEqual(
+                json.loads(output), [7, 30, 2, 3.25, 1, 12.5, float(owner.fleet.capacity[3])]
+            )
+        finally:
+            owner.close(unlink=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+# test_sim_clock.py
+# VirtualClock: step schedule at a given speed, pause, single steps and
+# catching up after falling behind. Uses a fake time source.
+#
+# Usage:
+#   cd backend && python -m unittest test_sim_clock
+
+import unittest
+
+from sim_clock import VirtualClock, check_speed
+
+
+class FakeTime:
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+
+def run_step(clock):
+    clock.start_step()
+    clock.end_step()
+
+
+class SpeedTest(unittest.TestCase):
+    def setUp(self):
+        self.time = FakeTime()
+
+    def test_steps_per_second(self):
+        for speed in (1, 10, 250):
+            with self.subTest(speed=speed):
+                clock = VirtualClock(60, speed=speed, now=self.time)
+                self.assertEqual(clock.delay(), 0.0)
+                run_step(clock)
+                self.assertAlmostEqual(clock.delay(), 1 / speed)
+                for _ in range(4):
+                    run_step(clock)
+                self.assertAlmostEqual(clock.due_time(), self.time.t + 5 / speed)
+
+    def test_schedule_does_not_drift(self):
+        clock = VirtualClock(60, speed=2, now=self.time)
+        for _ in range(10):
+            self.time.t = clock.due_time() + 0.01  # every step a little late
+            run_step(clock)
+        self.assertAlmostEqual(clock.lag, 0.01)
+        self.assertAlmostEqual(clock.due_time(), 105.0)
+        self.assertEqual(clock.resets, 0)
+
+    def test_reanchors_when_far_behind(self):
+        clock = VirtualClock(60, speed=1, now=self.time, max_lag=1.0)
+        run_step(clock)
+        self.time.t += 30
+        run_step(clock)
+        self.assertEqual(clock.resets, 1)
+        self.assertAlmostEqual(clock.delay(), 1.0)
+
+    def test_set_speed_keeps_steps_already_run(self):
+        clock = VirtualClock(60, speed=1, now=self.time)
+        for _ in range(3):
+            run_step(clock)
+        self.time.t += 3
+        clock.set_speed(100)
+        self.assertEqual(clock.steps, 3)
+        self.assertAlmostEqual(clock.delay(), 0.0)
+        run_step(clock)
+        self.assertAlmostEqual(clock.delay(), 0.01)
+
+    def test_invalid_speed(self):
+        for speed in (0, 0.5, 10001, "fast", float("nan")):
+            with self.subTest(speed=speed):
+                with self.assertRaises(ValueError):
+                    check_speed(speed)
+        clock = VirtualClock(60, speed=5, now=self.time)
+        with self.assertRaises(ValueError):
+            clock.set_speed(0)
+        self.assertEqual(clock.speed, 5)
+
+    def test_effective_speed(self):
+        clock = VirtualClock(60, speed=10, now=self.time)
+        self.assertIsNone(clock.info()["effective_speed"])
+        for _ in range(20):
+            run_step(clock)
+        self.time.t += 2
+        self.assertEqual(clock.info()["effective_speed"], 10.0)
+
+
+class PauseTest(unittest.TestCase):
+    def setUp(self):
+        self.time = FakeTime()
+        self.clock = VirtualClock(60, paused=True, now=self.time)
+        self.changes = []
+        self.clock.listeners.append(lambda: self.changes.append(self.clock.info()))
+
+    def test_paused_clock_waits(self):
+        self.assertIsNone(self.clock.delay())
+        self.assertEqual(self.clock.info()["effective_speed"], 0.0)
+
+    def test_single_steps(self):
+        self.clock.step(2)
+        self.assertEqual(self.clock.delay(), 0.0)
+        run_step(self.clock)
+        self.assertEqual(self.clock.info()["pending_steps"], 1)
+        run_step(self.clock)
+        self.assertIsNone(self.clock.delay())
+        self.assertEqual(self.clock.steps, 2)
+        self.assertEqual(len(self.changes), 1)
+
+    def test_invalid_steps(self):
+        for count in (0, -1, 1.5, "2", True):
+            with self.subTest(count=count):
+                with self.assertRaises(ValueError):
+                    self.clock.step(count)
+        self.clock.resume()
+        with self.assertRaises(ValueError):
+            self.clock.step()
+
+    def test_resume_drops_pending_and_restarts_the_schedule(self):
+        self.clock.step(5)
+        self.time.t += 1000
+        self.clock.resume()
+        self.assertEqual(self.clock.pending, 0)
+        self.assertEqual(self.clock.delay(), 0.0)
+        run_step(self.clock)
+        self.assertEqual(self.clock.resets, 0)
+        self.assertAlmostEqual(self.clock.delay(), 1.0)
+
+    def test_pause_stops_the_schedule(self):
+        self.clock.resume()
+        run_step(self.clock)
+        self.clock.pause()
+        self.time.t += 50
+        self.assertIsNone(self.clock.delay())
+        self.assertEqual([c["paused"] for c in self.changes], [False, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# test_telemetry.py
+# TelemetryStore: rollup tiers, queries, LTTB and reopening a store after
+# a restart.
+#
+# Usage:
+#   cd backend && python -m unittest test_telemetry
+
+import tempfile
+import unittest
+
+import numpy as np
+
+from telemetry import ROLLUPS, TelemetryStore, lttb
+
+
+def tick(store, i):
+    store.append(soc=i % 100, load=i % 7, price=i % 13, charging=i % 2,
+                 fleet_soc=50, fleet_kw=i % 11)
+
+
+class RollupTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_no_tier_copies_the_raw_ticks(self):
+        store = TelemetryStore(self.directory.name)
+        self.assertTrue(all(res > store.step_seconds for res in ROLLUPS))
+
+    def test_rollups_match_the_raw_ticks(self):
+        store = TelemetryStore(self.directory.name)
+        for i in range(3 * 1440 + 100):
+            tick(store, i)
+        raw = store.query(0, 3 * 86400, 60)
+        self.assertEqual(raw["tier"], "raw")
+        soc = np.array(raw["series"]["soc"]["mean"]).reshape(3, 1440)
+
+        for step, tier in ((900, "quarter"), (3600, "hour"), (86400, "day")):
+            with self.subTest(tier=tier):
+                result = store.query(0, 3 * 86400, step)
+                self.assertEqual(result["tier"], tier)
+                self.assertEqual(result["rows_read"], 3 * 86400 // step)
+                per_bucket = soc.reshape(-1, step // 60)
+                series = result["series"]["soc"]
+                np.testing.assert_allclose(series["min"], per_bucket.min(axis=1))
+                np.testing.assert_allclose(series["max"], per_bucket.max(axis=1))
+                np.testing.assert_allclose(series["mean"], per_bucket.mean(axis=1), atol=1e-3)
+
+    def test_open_bucket_is_queried(self):
+        store = TelemetryStore(self.directory.name)
+        for i in range(90):
+            tick(store, i)
+        result = store.query(0, 7200, 3600)
+        self.assertEqual(result["t"], [0, 3600])
+        self.assertEqual(result["series"]["soc"]["max"], [59.0, 89.0])
+
+    def test_invalid_queries(self):
+        store = TelemetryStore(self.directory.name)
+        for query in (dict(method="avg"), dict(fields=["speed"]),
+                      dict(t_from=100, t_to=100), dict(t_from=0, t_to=10 ** 9, step=60)):
+            with self.subTest(query=query):
+                with self.assertRaises(ValueError):
+                    store.query(**query)
+
+    def test_restart_keeps_the_open_buckets(self):
+        # 1500 ticks: a day bucket and an hour bucket are still open
+        reference = TelemetryStore(tempfile.mkdtemp(dir=self.directory.name))
+        store = TelemetryStore(self.directory.name)
+        for i in range(1500):
+            tick(reference, i)
+            tick(store, i)
+            if i == 700:
+                store.flush()
+                store = TelemetryStore(self.directory.name)
+
+        for step in (900, 3600, 86400):
+            with self.subTest(step=step):
+                expected = reference.query(0, 1500 * 60, step)
+                got = store.query(0, 1500 * 60, step)
+                self.assertEqual(got["tier"], expected["tier"])
+                self.assertEqual(got["t"], expected["t"])
+                self.assertEqual(got["series"], expected["series"])
+        day = store.query(0, 86400, 86400)["series"]["soc"]
+        self.assertEqual(day["max"], [99.0])
+
+    def test_restart_appends_a_bucket_lost_on_close(self):
+        store = TelemetryStore(self.directory.name)
+        for i in range(61):
+            tick(store, i)
+        store.flush()
+        # Simulate a crash after the raw row but before the hour row
+        hour = store.rollups[3600]
+        hour._length[0] = 0
+        hour.flush()
+
+        store = TelemetryStore(self.directory.name)
+        self.assertEqual(len(store.rollups[3600]), 1)
+        self.assertEqual(int(store.rollups[3600].arrays["n"][0]), 60)
+        rows = store._rows(3600, 0, 7200)
+        np.testing.assert_array_equal(rows["n"], [60, 1])
+
+
+class LttbTest(unittest.TestCase):
+    def test_keeps_ends_and_spikes(self):
+        x = np.arange(1000, dtype=np.float64)
+        y = np.zeros(1000)
+        y[437] = 50.0
+        y[811] = -20.0
+        result = lttb(x, y, 50)
+        self.assertEqual(len(result["t"]), 50)
+        self.assertEqual(result["t"][0], 0.0)
+        self.assertEqual(result["t"][-1], 999.0)
+        self.assertIn(437.0, result["t"])
+        self.assertIn(811.0, result["t"])
+        self.assertEqual(result["t"], sorted(result["t"]))
+
+    def test_short_series_unchanged(self):
+        x = np.arange(10, dtype=np.float64)
+        y = x * 1.5
+        self.assertEqual(lttb(x, y, 20), {"t": x.tolist(), "v": y.tolist()})
+
+    def test_store_query(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = TelemetryStore(directory)
+            for i in range(1440):
+                tick(store, i)
+            result = store.query(0, 86400, 86400 / 100, method="lttb", fields=["load"])
+            self.assertEqual(list(result["series"]), ["load"])
+            self.assertEqual(len(result["series"]["load"]["t"]), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+# writer_queue.py
+# Single-writer command queue for the simulation state.
+#
+# Only one thread (the simulation loop) ever changes the state. Request
+# threads hand their commands to it through this queue and wait for the
+# result; the loop runs them between ticks instead of sleeping. Readers
+# never queue: they use the last published snapshot.
+
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class WriterQueue:
+    """Commands for the writer thread, run in arrival order."""
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self.writer = None  # thread that drains the queue
+
+    def bind(self):
+        """Make the calling thread the writer."""
+        self.writer = threading.current_thread()
+
+    def submit(self, fn, *args):
+        """
+        Run fn(*args) on the writer thread and return its result (or raise
+        its exception). Runs inline when called from the writer itself or
+        when no writer is running.
+        """
+        writer = self.writer
+        if writer is None or writer is threading.current_thread() or not writer.is_alive():
+            return fn(*args)
+
+        future = Future()
+        self._queue.put((future, fn, args))
+        return future.result()
+
+    def run_until(self, deadline):
+        """Writer: run queued commands until time.monotonic() >= deadline."""
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if not self.run_next(remaining):
+                return
+
+    def run_next(self, timeout=None):
+        """
+        Writer: wait up to `timeout` seconds (None: forever) for one command
+        and run it. Returns False if none arrived.
+        """
+        try:
+            future, fn, args = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        self._run(future, fn, args)
+        return True
+
+    def _run(self, future, fn, args):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
@@ -24,6 +24,19 @@ export async function fetchInfo() {
   return safeJson(resp); // {sim_time_hour, base_current_load, battery_capacity_kWh, ev_battery_charge_start_stopp}
 }
 
+// Long poll: waits up to waitSeconds for a newer state than the last one
+// seen, gets only the changed fields and returns the merged /info state.
+let infoState = {};
+export async function pollInfo(waitSeconds = 10) {
+  const params =
+    infoState.version === undefined
+      ? {}
+      : { since: infoState.version, wait: waitSeconds };
+  const resp = await axios.get(`${BASE_URL}/info`, { params });
+  infoState = { ...infoState, ...safeJson(resp) };
+  return infoState;
+}
+
 export async function fetchBatteryPercent() {
   const resp = await axios.get(`${BASE_URL}/charge`);
   return safeJson(resp); // number or simple JSON
@@ -44,3 +57,28 @@ export async function apiDischarge() {
   const resp = await axios.post(`${BASE_URL}/discharge`, { discharging: "on" });
   return safeJson(resp);
 }
+
+// Apply several operations atomically in one request, e.g.
+// [{ op: "charge", charging: "on" }, { op: "info" }] -> [result, result]
+export async function apiBatch(ops) {
+  const resp = await axios.post(`${BASE_URL}/batch`, { ops });
+  return safeJson(resp).results;
+}
+
+// ---- push updates (Server-Sent Events) ----
+// Calls onInfo(info) with the merged /info state whenever it changes.
+// Returns a function that closes the stream.
+export function subscribeInfo(onInfo) {
+  const source = new EventSource(`${BASE_URL}/stream`);
+  let info = {};
+
+  const handle = (event) => {
+    const msg = JSON.parse(event.data);
+    info = msg.type === "state" ? msg.data : { ...info, ...msg.data };
+    onInfo(info);
+  };
+  source.addEventListener("state", handle);
+  source.addEventListener("delta", handle);
+
+  return () => source.close();
+}
@@ -4,15 +4,17 @@ import {
   fetchPrices,
   fetchBaseload,
   fetchInfo,
-  apiStartCharging,
+  pollInfo,
   apiStopCharging,
   apiDischarge,
+  apiBatch,
 } from "../api/evApi";
 import CarScene from "./CarScene";
 
 const BATTERY_CAPACITY_KWH = 46.3;
 const MAX_HOURS = 24;
 const POLL_MS = 2000; // 1 simulated hour ≈ 2 real seconds
+const POLL_WAIT_S = 10; // longest /info long poll
 
 // Dual SVG chart for price & load (24h)
 function PriceChart({ prices, loads, currentHour, themeMode }) {
@@ -297,7 +299,8 @@ export default function Dashboard() {
     }
     pollInFlightRef.current = true;
     try {
-      const info = await fetchInfo();
+      // Returns as soon as the state changes (or after POLL_WAIT_S)
+      const info = await pollInfo(POLL_WAIT_S);
 
       const h = info.sim_time_hour ?? 0;
       const m = info.sim_time_min ?? 0;
@@ -393,19 +396,23 @@ export default function Dashboard() {
         }
       }
 
+      // Send the decision and read the result back in one request
+      const ops = [];
       if (shouldCharge && !isCharging) {
-        await apiStartCharging();
+        ops.push({ op: "charge", charging: "on" });
         isCharging = true;
         setCharging(true);
         setLogs((prev) => [...prev, " Starting charging..."]);
       } else if (!shouldCharge && isCharging) {
-        await apiStopCharging();
+        ops.push({ op: "charge", charging: "off" });
         isCharging = false;
         setCharging(false);
         setLogs((prev) => [...prev, " Stopping charging..."]);
       }
+      ops.push({ op: "info" });
 
-      const info2 = await fetchInfo();
+      const results = await apiBatch(ops);
+      const info2 = results[results.length - 1];
       kWh = info2.battery_capacity_kWh ?? kWh;
       maxKWh =
         info2.battery_max_capacity_kWh ?? maxKWh ?? BATTERY_CAPACITY_KWH;
@@ -500,9 +507,10 @@ export default function Dashboard() {
 
   async function manualStart() {
     try {
-      await apiStartCharging();
-
-      const info = await fetchInfo();
+      const [, info] = await apiBatch([
+        { op: "charge", charging: "on" },
+        { op: "info" },
+      ]);
       const h = info.sim_time_hour ?? simHour;
       const maxKWh =
         info.battery_max_capacity_kWh ??
@@ -526,9 +534,10 @@ export default function Dashboard() {
 
   async function manualStop() {
     try {
-      await apiStopCharging();
-
-      const info = await fetchInfo();
+      const [, info] = await apiBatch([
+        { op: "charge", charging: "off" },
+        { op: "info" },
+      ]);
       const h = info.sim_time_hour ?? simHour;
       const maxKWh =
         info.battery_max_capacity_kWh ??